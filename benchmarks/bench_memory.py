@@ -0,0 +1,50 @@
+"""
+Micro-benchmark: WorkingMemory fact indexing and top-k retrieval.
+
+Fills a WorkingMemory with synthetic facts and times ``set_fact`` and
+``search`` (top 5 under a 300-token budget, as task_tool uses it) at several
+sizes, next to the cost of emitting every fact with ``to_context_block()``.
+
+    python benchmarks/bench_memory.py [queries]
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from context.memory import WorkingMemory  # noqa: E402
+
+SIZES = (1_000, 10_000, 50_000)
+VOCABULARY = [f"term{i}" for i in range(20_000)] + ["report", "data", "result"] * 500
+
+
+def fill(size: int, rng: random.Random) -> tuple[WorkingMemory, float]:
+    memory = WorkingMemory()
+    start = time.perf_counter()
+    for i in range(size):
+        memory.set_fact(f"fact-{i}", " ".join(rng.choices(VOCABULARY, k=30)))
+    return memory, (time.perf_counter() - start) / size
+
+
+def main() -> None:
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = random.Random(0)
+    print(f"{'facts':>7} {'set us':>8} {'search ms':>10} {'dump ms':>9}")
+    for size in SIZES:
+        memory, per_set = fill(size, rng)
+        texts = [" ".join(rng.choices(VOCABULARY, k=12)) for _ in range(queries)]
+        start = time.perf_counter()
+        for text in texts:
+            memory.search(text, top_k=5, max_tokens=300)
+        per_search = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        memory.to_context_block()
+        dump = time.perf_counter() - start
+        print(f"{size:>7} {per_set * 1e6:>8.1f} {per_search * 1e3:>10.3f} {dump * 1e3:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
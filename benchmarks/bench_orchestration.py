@@ -0,0 +1,249 @@
+"""
+Offline orchestration benchmarks: Python-side overhead of the graph, with no network.
+
+The supervisor and subagents are driven by a scripted fake chat model, and the
+web and code tools are backed by stub clients, so every number here is time
+spent in this package (prompt assembly, history compaction, tool dispatch,
+reducers, VirtualFS) rather than waiting on a provider.
+
+Reported, for each TODO count (default 10, 100, 1000):
+
+- full graph run: wall time, throughput in TODO items/s, per supervisor step
+  and per task_tool call overhead
+- state merge: cost of folding one step's deltas into state with the
+  AgentState reducers
+- VirtualFS: snapshot() of the whole tree and pop_changes() after one write
+
+    python benchmarks/bench_orchestration.py [--sizes 10,100,1000] [--batch 10] [--json]
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("OPENROUTER_API_KEY", "bench-not-a-real-key")
+# Keep the numbers deterministic and local.
+os.environ.setdefault("TOKEN_COUNTER", "approx")
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from agent.graph import build_graph  # noqa: E402
+from agent.state import append_logs, merge_artifacts, merge_token_usage, upsert_todo  # noqa: E402
+from tools.code_tools import make_code_tools  # noqa: E402
+from tools.code_workers import ExecResult  # noqa: E402
+from tools.file_tools import VirtualFS  # noqa: E402
+from tools.web_tools import make_web_tools  # noqa: E402
+
+
+# --------------------------------------------------------------------------- #
+# Fakes
+# --------------------------------------------------------------------------- #
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose reply is computed by ``respond(messages)``; tools are ignored."""
+
+    respond: Callable[[list[BaseMessage]], AIMessage]
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self.respond(messages))])
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class StubSearchClient:
+    def search(self, query: str, max_results: int = 5) -> dict:
+        return {"results": [
+            {"title": f"{query} {i}", "url": f"https://example.com/{i}", "content": "stub " * 40}
+            for i in range(max_results)
+        ]}
+
+
+class StubScrapeClient:
+    def scrape_url(self, url: str, params: dict | None = None) -> dict:
+        return {"markdown": f"# {url}\n\n" + "stub paragraph. " * 80}
+
+
+class StubWorkerPool:
+    timeout = 30.0
+
+    def run(self, code: str) -> ExecResult:
+        return ExecResult(stdout="ok\n", stderr="", returncode=0)
+
+
+def stub_web_tools() -> list:
+    return make_web_tools(search_client=StubSearchClient(), scrape_client=StubScrapeClient())
+
+
+def stub_code_tools(fs: VirtualFS | None = None) -> list:
+    return make_code_tools(pool=StubWorkerPool())
+
+
+_ids = itertools.count()
+
+
+def _call(name: str, args: dict) -> dict:
+    return {"name": name, "id": f"call-{next(_ids)}", "type": "tool_call", "args": args}
+
+
+def supervisor_script(todo_count: int, batch: int) -> Callable:
+    """Plan ``todo_count`` items, dispatch them ``batch`` per step, then finish."""
+    ids = [f"t{i}" for i in range(todo_count)]
+    plan = [
+        {"id": todo_id, "description": f"Research item {todo_id}", "status": "pending", "result": None}
+        for todo_id in ids
+    ]
+    steps = [AIMessage(content="", tool_calls=[_call("update_todo", {"items": plan})])]
+    for start in range(0, todo_count, batch):
+        steps.append(AIMessage(content="", tool_calls=[
+            _call("task_tool", {
+                "todo_id": todo_id,
+                "task_description": f"Research item {todo_id}",
+                "tool_names": ["search_internet", "write_file"],
+                "context": "",
+            })
+            for todo_id in ids[start:start + batch]
+        ]))
+    steps.append(AIMessage(content="All items researched."))
+    script = iter(steps)
+    return lambda messages: next(script)
+
+
+def subagent_respond(messages: list[BaseMessage]) -> AIMessage:
+    """Search once, then report; a ToolMessage last means the search already ran."""
+    if isinstance(messages[-1], ToolMessage):
+        return AIMessage(content="Found three relevant sources; summary written.")
+    return AIMessage(content="", tool_calls=[_call("search_internet", {"query": "benchmark topic"})])
+
+
+# --------------------------------------------------------------------------- #
+# Benchmarks
+# --------------------------------------------------------------------------- #
+
+
+def bench_graph(todo_count: int, batch: int) -> dict:
+    supervisor = ScriptedChatModel(respond=supervisor_script(todo_count, batch))
+    subagent = ScriptedChatModel(respond=subagent_respond)
+    steps = 2 + -(-todo_count // batch)
+    with patch("agent.supervisor.ChatOpenAI", lambda **kwargs: supervisor), \
+            patch("agent.subagent.ChatOpenAI", lambda **kwargs: subagent), \
+            patch("tools.registry.make_web_tools", stub_web_tools), \
+            patch("tools.registry.make_code_tools", stub_code_tools):
+        graph = build_graph()
+        start = time.perf_counter()
+        result = graph.invoke(
+            {"objective": "Benchmark run"}, config={"recursion_limit": 2 * steps + 10}
+        )
+        elapsed = time.perf_counter() - start
+    done = sum(1 for item in result["todo"] if item["status"] == "done")
+    if done != todo_count:
+        raise RuntimeError(f"expected {todo_count} done items, got {done}")
+    return {
+        "seconds": elapsed,
+        "todos_per_second": todo_count / elapsed,
+        "ms_per_supervisor_step": elapsed / steps * 1e3,
+        "ms_per_task": elapsed / todo_count * 1e3,
+    }
+
+
+def _timeit(fn: Callable[[], object], min_seconds: float = 0.2) -> float:
+    """Mean seconds per call of ``fn``, repeated for at least ``min_seconds``."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs
+
+
+def bench_state_merge(todo_count: int, batch: int) -> dict:
+    todo = [
+        {"id": f"t{i}", "description": f"item {i}", "status": "pending", "result": None}
+        for i in range(todo_count)
+    ]
+    logs = [
+        {"todo_id": f"t{i}", "prompt": "p", "tools": [], "result": "r", "tokens_used": 10}
+        for i in range(todo_count)
+    ]
+    artifacts = {f"notes/{i}.md": "x" * 2000 for i in range(todo_count)}
+    todo_delta = [{"id": f"t{i}", "status": "done", "result": "r"} for i in range(batch)]
+    log_delta = logs[:batch]
+    artifact_delta = {f"notes/{i}.md": "y" * 2000 for i in range(batch)}
+
+    def merge_step():
+        upsert_todo(todo, todo_delta)
+        append_logs(logs, log_delta)
+        merge_artifacts(artifacts, artifact_delta)
+        merge_token_usage({"total_used": 0, "per_subagent_limit": 4096}, {"total_used": 100})
+
+    return {"us_per_step_merge": _timeit(merge_step) * 1e6}
+
+
+def bench_vfs(todo_count: int, file_bytes: int = 2000) -> dict:
+    fs = VirtualFS()
+    for i in range(todo_count):
+        fs.write(f"notes/{i}.md", "x" * file_bytes)
+    fs.pop_changes()
+
+    def one_write_then_sync():
+        fs.write("notes/0.md", "y" * file_bytes)
+        fs.pop_changes()
+
+    return {
+        "us_snapshot": _timeit(fs.snapshot) * 1e6,
+        "us_write_and_pop_changes": _timeit(one_write_then_sync) * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated TODO counts")
+    parser.add_argument("--batch", type=int, default=10, help="task_tool calls per supervisor step")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = {
+        size: {
+            **bench_graph(size, args.batch),
+            **bench_state_merge(size, args.batch),
+            **bench_vfs(size),
+        }
+        for size in sizes
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"offline orchestration benchmark (batch={args.batch}, scripted LLM, stub tools)")
+    header = (
+        f"{'todos':>6} {'run s':>8} {'todos/s':>9} {'ms/step':>9} {'ms/task':>9} "
+        f"{'merge us':>9} {'snap us':>9} {'sync us':>9}"
+    )
+    print(header)
+    for size, r in results.items():
+        print(
+            f"{size:>6} {r['seconds']:>8.2f} {r['todos_per_second']:>9.1f} "
+            f"{r['ms_per_supervisor_step']:>9.2f} {r['ms_per_task']:>9.2f} "
+            f"{r['us_per_step_merge']:>9.1f} {r['us_snapshot']:>9.1f} "
+            f"{r['us_write_and_pop_changes']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: shared LLM rate limiter against a local fake provider.
+
+Starts an OpenAI-compatible endpoint that serves at most ``--slots`` requests
+at a time (50 ms each) and answers the rest with 429 + Retry-After. Many
+threads then call it through ChatOpenAI, once with a plain pooled client and
+once with the rate-limited shared client, and the script reports throughput
+against the provider ceiling and the number of 429s drawn.
+
+    python benchmarks/bench_rate_limit.py [--calls 400] [--callers 64] [--slots 8]
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from agent.clients import http_limits, shared_http_client  # noqa: E402
+from agent.rate_limit import get_rate_limiter  # noqa: E402
+
+SERVICE_SECONDS = 0.05
+
+
+class FakeProvider(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, slots: int) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.active = 0
+        self.throttled = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            admitted = server.active < server.slots
+            server.active += admitted
+            server.throttled += not admitted
+        if not admitted:
+            self._reply(429, {"error": {"message": "rate limited"}}, retry_after="0.05")
+            return
+        time.sleep(SERVICE_SECONDS)
+        with server.lock:
+            server.active -= 1
+        self._reply(200, {
+            "id": "cmpl", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "pong"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+        })
+
+    def _reply(self, status: int, payload: dict, retry_after: str | None = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if retry_after:
+            self.send_header("Retry-After", retry_after)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def run(label: str, http_client, args) -> None:
+    from langchain_openai import ChatOpenAI
+
+    server = FakeProvider(args.slots)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm = ChatOpenAI(
+        model=f"fake/{label}", base_url=server.base_url, api_key="bench",
+        http_client=http_client, max_retries=50,
+    )
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.callers) as pool:
+        list(pool.map(lambda _: llm.invoke("ping"), range(args.calls)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    ceiling = args.slots / SERVICE_SECONDS
+    print(f"{label:>9} {args.calls / elapsed:9.1f} {ceiling:9.1f} {server.throttled:7d}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--callers", type=int, default=64)
+    parser.add_argument("--slots", type=int, default=8)
+    args = parser.parse_args()
+    from openai import DefaultHttpxClient
+
+    print(f"{'client':>9} {'calls/s':>9} {'ceiling':>9} {'429s':>7}")
+    run("plain", DefaultHttpxClient(limits=http_limits()), args)
+    run("limited", shared_http_client(), args)
+    print(f"limiter: {get_rate_limiter().stats()['fake/limited']}")
+
+
+if __name__ == "__main__":
+    main()
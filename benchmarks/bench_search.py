@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: grep_files / glob_files over a large VirtualFS.
+
+Writes synthetic notes (random words, 30 lines each), then times the first
+grep (which hashes every queued file into the trigram index) and the slowest
+write made while it runs, regex searches with literals the index can use, a
+search without any, and a glob.
+
+    python benchmarks/bench_search.py [files]
+"""
+from __future__ import annotations
+import random
+import string
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from tools.file_tools import VirtualFS  # noqa: E402
+
+
+def _ms(fn, repeat: int = 5) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main() -> None:
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(20_000)]
+    fs = VirtualFS()
+    start = time.perf_counter()
+    for i in range(files):
+        lines = (" ".join(rng.choices(words, k=12)) for _ in range(30))
+        fs.write(f"notes/n{i}.md", "\n".join(lines))
+    fs.write("notes/incident.md", "summary\nThe error code E4711 appeared at 12:03\n")
+    write_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = threading.Thread(target=fs.grep, args=("warm-up",))
+    first.start()
+    slowest = 0.0
+    while first.is_alive():
+        begin = time.perf_counter()
+        fs.write("notes/scratch.md", f"scratch {begin}")
+        slowest = max(slowest, time.perf_counter() - begin)
+        time.sleep(0.01)
+    index_s = time.perf_counter() - start
+
+    print(f"{files} files: write {write_s:.2f}s, first grep (indexing) {index_s:.2f}s, "
+          f"slowest write meanwhile {slowest * 1e3:.2f} ms")
+    for label, pattern in [
+        ("literal", r"error code E\d+"),
+        ("word pair", f"{words[5]} {words[77]}"),
+        ("alternation", r"E47(11|12)"),
+        ("no literal", r"\d{4}"),
+    ]:
+        print(f"  grep {label:<12} {_ms(lambda: fs.grep(pattern)):8.2f} ms")
+    print(f"  glob {'notes/n99*':<12} {_ms(lambda: fs.glob('notes/n99*')):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Startup benchmark: wall time of ``import agent.graph`` in a fresh interpreter.
+
+Each sample runs a new ``python -c`` so nothing is cached in-process. Also
+lists the slowest top-level imports (from ``-X importtime``) and whether the
+heavy SDKs were pulled in, which they should not be until a tool or LLM
+client is first used.
+
+    python benchmarks/bench_startup.py [samples] [module]
+"""
+from __future__ import annotations
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES = ("langchain_openai", "openai", "tavily", "firecrawl")
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def time_import(module: str) -> float:
+    code = (
+        "import time; start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)"
+    )
+    return float(_run(code).stdout.strip())
+
+
+def slowest_imports(module: str, top: int = 8) -> list[tuple[int, str]]:
+    """(cumulative microseconds, module) for the slowest imports directly under ``module``."""
+    rows = []
+    for line in _run(f"import {module}", "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and name.startswith("   ") and not name.startswith("     "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def loaded_heavy_modules(module: str) -> list[str]:
+    code = f"import sys, {module}\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return [m for m in _run(code).stdout.strip().split(",") if m]
+
+
+def main() -> None:
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    module = sys.argv[2] if len(sys.argv) > 2 else "agent.graph"
+    times = [time_import(module) for _ in range(samples)]
+    print(f"import {module} over {samples} fresh interpreters")
+    print(f"  median: {statistics.median(times) * 1e3:8.1f} ms")
+    print(f"  min:    {min(times) * 1e3:8.1f} ms")
+    print(f"  heavy SDKs loaded at import: {', '.join(loaded_heavy_modules(module)) or 'none'}")
+    print("  slowest direct imports (cumulative):")
+    for micros, name in slowest_imports(module):
+        print(f"    {micros / 1e3:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: per-subagent setup overhead with and without the executor cache.
+
+"before" rebuilds a ChatOpenAI client and compiles a create_react_agent graph
+for every subagent, as task_tool used to. "after" goes through
+SubagentExecutorCache, so only the first lookup per tool set pays that cost.
+Nothing is sent over the network.
+
+    python benchmarks/bench_subagent_setup.py [iterations]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("OPENROUTER_API_KEY", "bench-not-a-real-key")
+
+from langchain_openai import ChatOpenAI  # noqa: E402
+from langgraph.prebuilt import create_react_agent  # noqa: E402
+from agent.clients import OPENROUTER_BASE_URL  # noqa: E402
+from agent.subagent import SubagentExecutorCache  # noqa: E402
+from tools.file_tools import VirtualFS  # noqa: E402
+from tools.registry import ToolRegistry  # noqa: E402
+
+TOOL_SETS = [
+    ["search_internet", "write_file"],
+    ["web_scrape", "write_file"],
+    ["execute_code", "read_file", "write_file"],
+]
+
+
+def bench_uncached(registry: ToolRegistry, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        tool_names = TOOL_SETS[i % len(TOOL_SETS)]
+        llm = ChatOpenAI(
+            model="anthropic/claude-haiku-4.5",
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.environ["OPENROUTER_API_KEY"],
+        )
+        create_react_agent(model=llm, tools=registry.get_tools(tool_names), prompt="bench")
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_cached(registry: ToolRegistry, iterations: int) -> float:
+    cache = SubagentExecutorCache(registry)
+    start = time.perf_counter()
+    for i in range(iterations):
+        cache.get(TOOL_SETS[i % len(TOOL_SETS)])
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    registry = ToolRegistry(VirtualFS())
+    before = bench_uncached(registry, iterations)
+    after = bench_cached(registry, iterations)
+    print(f"subagent setup over {iterations} calls ({len(TOOL_SETS)} tool sets)")
+    print(f"  before (fresh client + graph): {before * 1e3:8.3f} ms/subagent")
+    print(f"  after  (executor cache):       {after * 1e3:8.3f} ms/subagent")
+    print(f"  speedup:                       {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
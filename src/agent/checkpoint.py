@@ -0,0 +1,54 @@
+from __future__ import annotations
+import sqlite3
+from agent.graph import build_graph
+from tools.file_tools import VirtualFS
+from utils.errors import AgentError, ConfigurationError
+
+
+def sqlite_checkpointer(path: str):
+    """Return a LangGraph SqliteSaver writing to the local file ``path``.
+
+    Requires the ``checkpoint`` extra (langgraph-checkpoint-sqlite).
+    """
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise ConfigurationError(
+            "SQLite checkpointing needs langgraph-checkpoint-sqlite; "
+            "install with: pip install 'nua[checkpoint]'"
+        ) from e
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+
+def thread_config(thread_id: str, **config) -> dict:
+    """Graph config that selects the checkpoint thread ``thread_id``."""
+    configurable = {**config.pop("configurable", {}), "thread_id": thread_id}
+    return {**config, "configurable": configurable}
+
+
+def build_durable_graph(path: str):
+    """Build a graph that checkpoints to ``path`` after every supervisor step.
+
+    Returns ``(graph, fs)``; invoke it with ``thread_config(thread_id)``.
+    """
+    fs = VirtualFS()
+    return build_graph(checkpointer=sqlite_checkpointer(path), fs=fs), fs
+
+
+def resume_run(thread_id: str, path: str, **config) -> dict:
+    """Continue a checkpointed run from its last completed supervisor step.
+
+    The VirtualFS is rebuilt from the checkpointed ``artifacts`` before the
+    graph continues, and the saved TODO list comes back with the state, so
+    items already marked done keep their results and are not run again.
+    Returns the final state (immediately, if the run had already finished).
+    """
+    graph, fs = build_durable_graph(path)
+    run_config = thread_config(thread_id, **config)
+    snapshot = graph.get_state(run_config)
+    if not snapshot.values:
+        raise AgentError(f"no checkpoint found for thread '{thread_id}' in {path}")
+    fs.restore(snapshot.values.get("artifacts", {}))
+    if not snapshot.next:
+        return snapshot.values
+    return graph.invoke(None, run_config)
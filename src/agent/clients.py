@@ -0,0 +1,62 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# One bounded connection pool per process, shared by the supervisor and every
+# subagent so repeated LLM calls reuse warm TLS connections. httpx and openai
+# are imported on first use to keep them off the import path. Both clients send
+# LLM requests through the process-wide limiter in ``agent.rate_limit``.
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+
+_lock = threading.Lock()
+_sync_client: httpx.Client | None = None
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def http_limits() -> httpx.Limits:
+    import httpx
+
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+    )
+
+
+def shared_http_client() -> httpx.Client:
+    """Return the process-wide pooled HTTP client for synchronous LLM calls."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            from openai import DefaultHttpxClient
+            from agent.rate_limit import rate_limit_client
+
+            _sync_client = rate_limit_client(DefaultHttpxClient(limits=http_limits()))
+        return _sync_client
+
+
+def shared_async_http_client(loop: asyncio.AbstractEventLoop | None = None) -> httpx.AsyncClient:
+    """Return the pooled async HTTP client for ``loop`` (default: the running loop).
+
+    Async connections cannot cross event loops, so there is one pool per loop.
+    """
+    loop = loop or asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            from openai import DefaultAsyncHttpxClient
+            from agent.rate_limit import rate_limit_client
+
+            client = rate_limit_client(DefaultAsyncHttpxClient(limits=http_limits()))
+            _async_clients[loop] = client
+        return client
@@ -3,31 +3,73 @@ from langgraph.graph import StateGraph, END
 from agent.state import AgentState
 from tools.file_tools import VirtualFS
 from tools.registry import ToolRegistry
-from agent.supervisor import build_supervisor_node, should_continue
+from agent.scheduler import build_async_scheduler_node, build_scheduler_node
+from agent.supervisor import (
+    build_async_supervisor_node,
+    build_supervisor_node,
+    should_continue,
+)
 
 
-def build_graph():
-    fs = VirtualFS()
-    registry = ToolRegistry(fs)
-    supervisor_node = build_supervisor_node(registry)
-
+def _compile(supervisor_node, scheduler, checkpointer=None):
+    # The supervisor plans; the scheduler sends every ready TODO item to its own
+    # run_task node, wave by wave, and only hands control back once nothing is
+    # ready (all done, or failed/blocked).
+    dispatch, run_task = scheduler
     builder = StateGraph(AgentState)
     builder.add_node("supervisor", supervisor_node)
+    builder.add_node("scheduler", lambda state: {})
+    builder.add_node("run_task", run_task)
     builder.set_entry_point("supervisor")
     builder.add_conditional_edges(
         "supervisor",
         should_continue,
-        {"continue": "supervisor", "end": END},
+        {"continue": "supervisor", "schedule": "scheduler", "end": END},
+    )
+    builder.add_conditional_edges("scheduler", dispatch, ["run_task", "supervisor"])
+    builder.add_edge("run_task", "scheduler")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def build_graph(checkpointer=None, fs: VirtualFS | None = None):
+    """Build the supervisor graph.
+
+    Pass a LangGraph checkpointer (see ``agent.checkpoint``) to persist state
+    after every supervisor step, and ``fs`` to share a VirtualFS with the caller.
+    """
+    fs = fs if fs is not None else VirtualFS()
+    registry = ToolRegistry(fs)
+    return _compile(build_supervisor_node(registry), build_scheduler_node(registry), checkpointer)
+
+
+def build_async_graph(checkpointer=None, fs: VirtualFS | None = None):
+    """Build a graph whose supervisor and subagents run natively on the event loop.
+
+    Drive it with ``ainvoke`` / ``astream``; many runs can share one loop.
+    """
+    fs = fs if fs is not None else VirtualFS()
+    registry = ToolRegistry(fs)
+    return _compile(
+        build_async_supervisor_node(registry), build_async_scheduler_node(registry), checkpointer
     )
-    return builder.compile()
 
 
-# Module-level graph instance for LangGraph Studio
-# Import lazily to avoid ChatOpenAI instantiation at import time in tests
+_graph = None
+
+
 def _get_graph():
     import os
     if os.getenv("OPENROUTER_API_KEY"):
         return build_graph()
     return None
 
-graph = _get_graph()
+
+def __getattr__(name: str):
+    # Module-level ``graph`` for LangGraph Studio, built on first access rather
+    # than at import time, so importing this module never creates LLM clients.
+    global _graph
+    if name == "graph":
+        if _graph is None:
+            _graph = _get_graph()
+        return _graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
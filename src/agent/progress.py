@@ -0,0 +1,81 @@
+from __future__ import annotations
+from langchain_core.callbacks.manager import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langgraph.config import get_config, get_stream_writer
+from langgraph.types import StreamWriter
+
+TODO_STATUS_EVENT = "todo_status"
+# Per-run opt-in (config["configurable"]) for streaming subagent tokens and tool calls.
+STREAM_SUBAGENTS_KEY = "stream_subagents"
+# Tool results in progress events are cut to this many characters.
+MAX_EVENT_TEXT = 500
+
+
+def _stream_writer() -> StreamWriter | None:
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        # Outside any runnable, or inside one that is not part of a graph run.
+        return None
+
+
+def progress_writer() -> StreamWriter | None:
+    """Writer for subagent progress, or None unless the run set ``stream_subagents``."""
+    try:
+        configurable = get_config().get("configurable", {})
+    except RuntimeError:
+        return None
+    if not configurable.get(STREAM_SUBAGENTS_KEY):
+        return None
+    return _stream_writer()
+
+
+def _todo_event(todo_id: str, status: str, result: str | None) -> dict:
+    event = {"type": TODO_STATUS_EVENT, "todo_id": todo_id, "status": status}
+    if result is not None:
+        event["result"] = result
+    return event
+
+
+def emit_todo_status(todo_id: str, status: str, result: str | None = None) -> None:
+    """Report a TODO transition to ``stream(stream_mode="custom")`` and ``astream_events``."""
+    event = _todo_event(todo_id, status, result)
+    writer = _stream_writer()
+    if writer is not None:
+        writer(event)
+    try:
+        dispatch_custom_event(TODO_STATUS_EVENT, event)
+    except RuntimeError:
+        pass  # not running inside a graph / runnable
+
+
+async def aemit_todo_status(todo_id: str, status: str, result: str | None = None) -> None:
+    event = _todo_event(todo_id, status, result)
+    writer = _stream_writer()
+    if writer is not None:
+        writer(event)
+    try:
+        await adispatch_custom_event(TODO_STATUS_EVENT, event)
+    except RuntimeError:
+        pass
+
+
+def message_events(todo_id: str, message: BaseMessage) -> list[dict]:
+    """Translate one streamed subagent message into progress events."""
+    if isinstance(message, AIMessageChunk):
+        return [{"type": "subagent_token", "todo_id": todo_id, "content": message.content}] \
+            if isinstance(message.content, str) and message.content else []
+    if isinstance(message, AIMessage):
+        return [
+            {"type": "subagent_tool_call", "todo_id": todo_id, "name": tc["name"], "args": tc["args"]}
+            for tc in message.tool_calls
+        ]
+    if isinstance(message, ToolMessage):
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        return [{
+            "type": "subagent_tool_result",
+            "todo_id": todo_id,
+            "name": message.name,
+            "content": content[:MAX_EVENT_TEXT],
+        }]
+    return []
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from utils.errors import ConfigurationError
+
+
+PROMPT_LAYOUTS = ("stable", "legacy")
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def prompt_layout() -> str:
+    """Prompt layout from PROMPT_LAYOUT: "stable" (cache-friendly prefix) or "legacy"."""
+    layout = os.getenv("PROMPT_LAYOUT", "stable").strip().lower()
+    if layout not in PROMPT_LAYOUTS:
+        raise ConfigurationError(
+            f"PROMPT_LAYOUT must be one of {', '.join(PROMPT_LAYOUTS)}, got '{layout}'"
+        )
+    return layout
+
+
+def cache_control_enabled() -> bool:
+    return os.getenv("PROMPT_CACHE_CONTROL", "").strip().lower() in ("1", "true", "yes")
+
+
+def cached_blocks(*parts: str) -> list[dict]:
+    """Content blocks for ``parts`` with a cache breakpoint after the first one.
+
+    The first part is the stable prefix; everything after it varies per call.
+    """
+    blocks = [{"type": "text", "text": part} for part in parts if part]
+    if blocks:
+        blocks[0]["cache_control"] = CACHE_CONTROL
+    return blocks
+
+
+def mark_cache_breakpoint(message: BaseMessage | tuple) -> BaseMessage | tuple:
+    """Return ``message`` with a cache breakpoint on its text, if it has any."""
+    if isinstance(message, tuple):
+        role, content = message
+        if isinstance(content, str) and content:
+            return role, cached_blocks(content)
+        return message
+    if isinstance(message.content, str) and message.content:
+        return message.model_copy(update={"content": cached_blocks(message.content)})
+    return message
+
+
+@dataclass
+class LLMCallUsage:
+    model: str
+    input_tokens: int
+    cached_input_tokens: int
+    cache_creation_tokens: int
+    output_tokens: int
+    tags: tuple[str, ...] = ()
+
+    @property
+    def uncached_input_tokens(self) -> int:
+        return max(0, self.input_tokens - self.cached_input_tokens)
+
+
+def usage_from_message(message: Any, tags: list[str] | None = None) -> LLMCallUsage | None:
+    """Read cached vs uncached input tokens from an AIMessage's usage metadata."""
+    usage = getattr(message, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return None
+    details = usage.get("input_token_details") or {}
+    metadata = getattr(message, "response_metadata", None) or {}
+    return LLMCallUsage(
+        model=str(metadata.get("model_name", "")),
+        input_tokens=int(usage.get("input_tokens", 0)),
+        cached_input_tokens=int(details.get("cache_read", 0) or 0),
+        cache_creation_tokens=int(details.get("cache_creation", 0) or 0),
+        output_tokens=int(usage.get("output_tokens", 0)),
+        tags=tuple(tags or ()),
+    )
+
+
+class PromptCacheRecorder(BaseCallbackHandler):
+    """Callback handler that records cached vs uncached input tokens per LLM call.
+
+    Keeps the most recent ``maxlen`` calls plus running totals. Attach it with
+    ``ChatOpenAI(callbacks=[recorder])``; it is safe to share across threads.
+    """
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.calls: deque[LLMCallUsage] = deque(maxlen=maxlen)
+        self._totals = {
+            "calls": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "cache_creation_tokens": 0,
+            "output_tokens": 0,
+        }
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, *, tags: list[str] | None = None, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = usage_from_message(getattr(generation, "message", None), tags)
+                if usage is not None:
+                    self.record(usage)
+
+    def record(self, usage: LLMCallUsage) -> None:
+        with self._lock:
+            self.calls.append(usage)
+            self._totals["calls"] += 1
+            for key in ("input_tokens", "cached_input_tokens", "cache_creation_tokens", "output_tokens"):
+                self._totals[key] += getattr(usage, key)
+
+    def totals(self) -> dict:
+        """Aggregate token counts, with ``uncached_input_tokens`` and ``cache_hit_rate``."""
+        with self._lock:
+            totals = dict(self._totals)
+        totals["uncached_input_tokens"] = totals["input_tokens"] - totals["cached_input_tokens"]
+        totals["cache_hit_rate"] = (
+            totals["cached_input_tokens"] / totals["input_tokens"] if totals["input_tokens"] else 0.0
+        )
+        return totals
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [asdict(call) for call in self.calls]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            for key in self._totals:
+                self._totals[key] = 0
+
+
+_recorder = PromptCacheRecorder()
+
+
+def get_prompt_cache_recorder() -> PromptCacheRecorder:
+    """Process-wide recorder attached to the supervisor and subagent models."""
+    return _recorder
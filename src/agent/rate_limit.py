@@ -0,0 +1,396 @@
+"""
+Process-wide rate limiting and adaptive concurrency for LLM calls.
+
+The pooled HTTP clients in ``agent.clients`` route every supervisor and
+subagent request through ``RateLimitedTransport``, which takes a permit from
+the limiter of the request's model before sending it. Per model there are:
+
+- token buckets for requests/min and tokens/min, charged with an estimate up
+  front and corrected from the response's ``usage``;
+- an AIMD concurrency limit that grows by one per window of successful calls
+  and is halved on a 429 (cut by 10% when latency climbs well above its recent
+  floor), at most once per window;
+- a shared pause after a 429 (Retry-After, or exponential backoff), so the
+  OpenAI client's own retries queue here instead of hitting the provider again.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+CHARS_PER_TOKEN = 4
+DEFAULT_OUTPUT_TOKENS = 512
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+USAGE_SCAN_BYTES = 16384
+_TOTAL_TOKENS = re.compile(rb'"total_tokens"\s*:\s*(\d+)')
+
+
+@dataclass
+class RateLimits:
+    """Limits for one model. ``rpm``/``tpm`` of 0 leave that dimension unlimited."""
+
+    rpm: float = 0
+    tpm: float = 0
+    initial_concurrency: int = 8
+    max_concurrency: int = 64
+    # Shrink concurrency when a call takes this many times the recent floor (0 disables).
+    # Off by default: LLM latency mostly follows output length, not provider load.
+    latency_tolerance: float = 0.0
+
+
+class _Bucket:
+    def __init__(self, per_minute: float, now: float) -> None:
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until ``amount`` (capped at the capacity) is available."""
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+
+@dataclass
+class Permit:
+    tokens: int
+    started: float
+
+
+@dataclass
+class ModelLimiter:
+    """Admission control for the calls to one model; safe across threads and event loops."""
+
+    limits: RateLimits
+    clock: Callable[[], float] = time.monotonic
+    in_flight: int = 0
+    paused_until: float = 0.0
+    calls: int = 0
+    throttled: int = 0
+
+    def __post_init__(self) -> None:
+        now = self.clock()
+        self.concurrency = float(max(1, self.limits.initial_concurrency))
+        self._requests = _Bucket(self.limits.rpm, now) if self.limits.rpm > 0 else None
+        self._tokens = _Bucket(self.limits.tpm, now) if self.limits.tpm > 0 else None
+        self._latency_floor: float | None = None
+        self._last_decrease = -math.inf
+        self._consecutive_429 = 0
+        self._cond = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def acquire(self, tokens: int) -> Permit:
+        """Block until a call of about ``tokens`` tokens may be sent."""
+        with self._cond:
+            while True:
+                wait = self._reserve(tokens)
+                if wait == 0:
+                    return Permit(tokens, self.clock())
+                self._cond.wait(wait)
+
+    async def aacquire(self, tokens: int) -> Permit:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                wait = self._reserve(tokens)
+                if wait == 0:
+                    return Permit(tokens, self.clock())
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, wait)
+            except TimeoutError:
+                pass
+
+    def release(
+        self,
+        permit: Permit,
+        status: int | None = None,
+        retry_after: float | None = None,
+        used_tokens: int | None = None,
+    ) -> None:
+        """Return a permit with the outcome of the call (``status`` None if it failed to send)."""
+        now = self.clock()
+        with self._cond:
+            self.in_flight -= 1
+            if used_tokens is not None and self._tokens is not None:
+                self._tokens.level += permit.tokens - used_tokens
+            if status == 429:
+                self.throttled += 1
+                self._consecutive_429 += 1
+                if retry_after is None:
+                    retry_after = min(
+                        BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (self._consecutive_429 - 1)
+                    )
+                self.paused_until = max(self.paused_until, now + retry_after)
+                self._decrease(permit, now, 0.5)
+            elif status is not None and status < 400:
+                self._consecutive_429 = 0
+                self._on_success(permit, now)
+            self._notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency": round(self.concurrency, 2),
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "throttled": self.throttled,
+            }
+
+    def _reserve(self, tokens: int) -> float | None:
+        """Take a permit and return 0, or the seconds to wait (None: until a release)."""
+        now = self.clock()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return None
+        wait = 0.0
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.delay(amount))
+        if wait > 0:
+            return wait
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is not None:
+                bucket.level -= amount
+        self.in_flight += 1
+        self.calls += 1
+        return 0.0
+
+    def _on_success(self, permit: Permit, now: float) -> None:
+        latency = now - permit.started
+        floor = self._latency_floor
+        # The floor follows the fastest recent calls and drifts up 2% per call.
+        self._latency_floor = latency if floor is None else min(latency, floor * 1.02)
+        tolerance = self.limits.latency_tolerance
+        if tolerance > 0 and floor is not None and latency > tolerance * floor:
+            self._decrease(permit, now, 0.9)
+        elif self.in_flight + 1 >= int(self.concurrency):
+            # Only grow while the current limit is actually in use.
+            self.concurrency = min(self.limits.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def _decrease(self, permit: Permit, now: float, factor: float) -> None:
+        # Calls sent before the last decrease report on the old limit; skip them.
+        if permit.started < self._last_decrease:
+            return
+        self.concurrency = max(1.0, self.concurrency * factor)
+        self._last_decrease = now
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        for loop, waiter in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                pass  # loop already closed
+        self._async_waiters.clear()
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+@dataclass
+class RateLimiter:
+    """Per-model limiters; models without an entry in ``per_model`` use ``default``."""
+
+    default: RateLimits = field(default_factory=RateLimits)
+    per_model: dict[str, RateLimits] = field(default_factory=dict)
+    clock: Callable[[], float] = time.monotonic
+
+    def __post_init__(self) -> None:
+        self._models: dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_model(self, model: str) -> ModelLimiter:
+        with self._lock:
+            limiter = self._models.get(model)
+            if limiter is None:
+                limits = self.per_model.get(model, self.default)
+                limiter = self._models[model] = ModelLimiter(limits, self.clock)
+            return limiter
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            models = dict(self._models)
+        return {model: limiter.stats() for model, limiter in models.items()}
+
+
+def limits_from_env() -> tuple[RateLimits, dict[str, RateLimits]]:
+    """Read LLM_RPM, LLM_TPM, LLM_CONCURRENCY, LLM_MAX_CONCURRENCY, LLM_LATENCY_TOLERANCE
+    and per-model overrides from LLM_RATE_LIMITS (``model=rpm/tpm,...``)."""
+    default = RateLimits(
+        rpm=float(os.getenv("LLM_RPM", "0")),
+        tpm=float(os.getenv("LLM_TPM", "0")),
+        initial_concurrency=int(os.getenv("LLM_CONCURRENCY", "8")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+        latency_tolerance=float(os.getenv("LLM_LATENCY_TOLERANCE", "0")),
+    )
+    per_model = {}
+    for entry in os.getenv("LLM_RATE_LIMITS", "").split(","):
+        model, _, values = entry.strip().rpartition("=")
+        if not model:
+            continue
+        rpm, _, tpm = values.partition("/")
+        per_model[model] = RateLimits(
+            rpm=float(rpm or 0),
+            tpm=float(tpm or 0),
+            initial_concurrency=default.initial_concurrency,
+            max_concurrency=default.max_concurrency,
+            latency_tolerance=default.latency_tolerance,
+        )
+    return default, per_model
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter, configured from the environment on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            default, per_model = limits_from_env()
+            _limiter = RateLimiter(default, per_model)
+        return _limiter
+
+
+# --------------------------------------------------------------------------- #
+# HTTP transports
+# --------------------------------------------------------------------------- #
+
+
+def request_cost(request) -> tuple[str, int] | None:
+    """(model, estimated prompt + completion tokens) of an LLM request, else None."""
+    if request.method != "POST":
+        return None
+    try:
+        content = request.content
+        body = json.loads(content)
+    except Exception:  # unread streaming body, or not JSON
+        return None
+    if not isinstance(body, dict) or not isinstance(body.get("model"), str):
+        return None
+    output = body.get("max_completion_tokens") or body.get("max_tokens") or DEFAULT_OUTPUT_TOKENS
+    return body["model"], len(content) // CHARS_PER_TOKEN + int(output)
+
+
+def _outcome(response) -> tuple[int, float | None, int | None]:
+    """(status, Retry-After seconds, total tokens used) of a response."""
+    try:
+        retry_after = max(0.0, float(response.headers["retry-after"]))
+    except (KeyError, ValueError):
+        retry_after = None  # absent, or an HTTP date; fall back to backoff
+    used = None
+    if not _is_event_stream(response):
+        # ``usage`` comes last in the body.
+        found = _TOTAL_TOKENS.findall(response.content[-USAGE_SCAN_BYTES:])
+        used = int(found[-1]) if found else None
+    return response.status_code, retry_after, used
+
+
+def _is_event_stream(response) -> bool:
+    return response.headers.get("content-type", "").startswith("text/event-stream")
+
+
+class RateLimitedTransport:
+    """Wraps an httpx transport so LLM requests wait for, and report back to, the limiter.
+
+    JSON responses are read here so the permit covers the whole call and the
+    token estimate can be corrected from ``usage``; streamed (SSE) responses
+    give the permit back once their headers arrive.
+    """
+
+    def __init__(self, transport, limiter: RateLimiter) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    def handle_request(self, request):
+        cost = request_cost(request)
+        if cost is None:
+            return self._transport.handle_request(request)
+        limiter = self._limiter.for_model(cost[0])
+        permit = limiter.acquire(cost[1])
+        try:
+            response = self._transport.handle_request(request)
+            if not _is_event_stream(response):
+                response.read()
+        except BaseException:
+            limiter.release(permit)
+            raise
+        limiter.release(permit, *_outcome(response))
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+    def __enter__(self):
+        self._transport.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._transport.__exit__(*exc_info)
+
+
+class AsyncRateLimitedTransport:
+    """Async counterpart of RateLimitedTransport."""
+
+    def __init__(self, transport, limiter: RateLimiter) -> None:
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request):
+        cost = request_cost(request)
+        if cost is None:
+            return await self._transport.handle_async_request(request)
+        limiter = self._limiter.for_model(cost[0])
+        permit = await limiter.aacquire(cost[1])
+        try:
+            response = await self._transport.handle_async_request(request)
+            if not _is_event_stream(response):
+                await response.aread()
+        except BaseException:
+            limiter.release(permit)
+            raise
+        limiter.release(permit, *_outcome(response))
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    async def __aenter__(self):
+        await self._transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._transport.__aexit__(*exc_info)
+
+
+def rate_limit_client(client, limiter: RateLimiter | None = None):
+    """Route ``client``'s requests through ``limiter`` (default: the process-wide one).
+
+    The client's own transports are wrapped, so its pool limits and proxy
+    mounts stay as configured.
+    """
+    limiter = limiter or get_rate_limiter()
+    wrap = AsyncRateLimitedTransport if hasattr(client._transport, "handle_async_request") else RateLimitedTransport
+    client._transport = wrap(client._transport, limiter)
+    for pattern, transport in client._mounts.items():
+        if transport is not None:
+            client._mounts[pattern] = wrap(transport, limiter)
+    return client
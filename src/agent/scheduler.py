@@ -0,0 +1,196 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import weakref
+from typing import Literal
+from langgraph.errors import GraphBubbleUp
+from langgraph.types import Send
+from agent.progress import aemit_todo_status, emit_todo_status
+from agent.state import AgentState
+from agent.subagent import (
+    TASK_ERROR_PREFIX, build_task_tool, context_token_budget, is_task_error,
+    split_result_reference,
+)
+from context.compression import compress_text, summarize_text
+from context.tokens import count_tokens
+from tools.registry import ToolRegistry
+
+# Each dependency result handed to a dependent item is cut to this many words,
+# and all of them together to what the subagent's token budget leaves for its
+# context. A trailing "[Full result: <path>]" reference is kept on top of that.
+DEPENDENCY_RESULT_MAX_WORDS = 200
+
+
+def ready_items(todo: list[dict]) -> list[dict]:
+    """Pending items whose dependencies are all done, in TODO order."""
+    done = {item["id"] for item in todo if item.get("status") == "done"}
+    return [
+        item for item in todo
+        if item.get("status") == "pending"
+        and all(dep in done for dep in item.get("depends_on") or [])
+    ]
+
+
+def failed_items(todo: list[dict]) -> list[dict]:
+    return [item for item in todo if item.get("status") == "failed"]
+
+
+def blocked_items(todo: list[dict]) -> list[dict]:
+    """Pending items that can never become ready: a dependency is unknown, failed or blocked."""
+    runnable = {item["id"] for item in todo if item.get("status") == "done"}
+    changed = True
+    while changed:
+        changed = False
+        for item in todo:
+            if item["id"] in runnable or item.get("status") in ("done", "failed"):
+                continue
+            if all(dep in runnable for dep in item.get("depends_on") or []):
+                runnable.add(item["id"])
+                changed = True
+    return [
+        item for item in todo
+        if item["id"] not in runnable and item.get("status") != "failed"
+    ]
+
+
+def dependency_context(item: dict, todo: list[dict], max_tokens: int | None = None) -> str:
+    """The item's own context followed by the (compressed) results of its dependencies.
+
+    With ``max_tokens``, the results split what the item's own context leaves
+    of that budget evenly, each summarized to fit its share.
+    """
+    by_id = {entry["id"]: entry for entry in todo}
+    parts = [item["context"]] if item.get("context") else []
+    sources = [
+        (dep, by_id[dep]) for dep in item.get("depends_on") or []
+        if dep in by_id and by_id[dep].get("result") is not None
+    ]
+    share = None
+    if max_tokens is not None and sources:
+        share = max(0, max_tokens - count_tokens(*parts)) // len(sources)
+    for dep, source in sources:
+        text, reference = split_result_reference(str(source["result"]))
+        heading = f"Result of {dep} ({source.get('description', '')}):"
+        result = compress_text(text, max_words=DEPENDENCY_RESULT_MAX_WORDS)
+        if share is not None:
+            # Three tokens for the newlines around the heading and the reference.
+            room = share - count_tokens(heading, reference) - 3
+            result = summarize_text(result, room) if room > 0 else ""
+        parts.append("\n".join(part for part in (heading, result, reference) if part))
+    return "\n\n".join(parts)
+
+
+class _SchedulerCore:
+    """Turns the ready set into one ``Send`` per item and a task result into a state delta."""
+
+    def __init__(self, registry: ToolRegistry, max_parallel_tasks: int | None) -> None:
+        if max_parallel_tasks is None:
+            max_parallel_tasks = int(os.getenv("SUPERVISOR_MAX_PARALLEL_TASKS", "4"))
+        self.registry = registry
+        self.metrics = registry.metrics
+        self.max_parallel_tasks = max(1, max_parallel_tasks)
+        self.task_tool = build_task_tool(registry)
+
+    def task_args(self, item: dict, todo: list[dict]) -> dict:
+        description = item.get("description", "")
+        available = self.registry.available_tools()
+        # Tool names come from the LLM; unknown ones are dropped, not looked up.
+        tool_names = [name for name in item.get("tools") or available if name in available]
+        budget = context_token_budget(item["id"], description, tool_names)
+        return {
+            "todo_id": item["id"],
+            "task_description": description,
+            "tool_names": tool_names,
+            "context": dependency_context(item, todo, budget),
+        }
+
+    def dispatch(self, state: AgentState) -> list[Send] | Literal["supervisor"]:
+        """One ``run_task`` per ready item, or back to the supervisor once nothing is ready."""
+        todo = list(state.get("todo", []))
+        ready = ready_items(todo)
+        if not ready:
+            return "supervisor"
+        return [Send("run_task", self.task_args(item, todo)) for item in ready]
+
+    @staticmethod
+    def crash_result(error: Exception) -> str:
+        """A task result for a subagent that raised, so its item fails instead of the run."""
+        return f"{TASK_ERROR_PREFIX} subagent crashed — {type(error).__name__}: {error}"
+
+    def finish_task(self, args: dict, result: str) -> dict:
+        # A failed item is not done: its dependents stay blocked until the supervisor replans.
+        status = "failed" if is_task_error(result) else "done"
+        tokens_used = count_tokens(args["task_description"], args["context"], result)
+        updates = {
+            "todo": [{"id": args["todo_id"], "status": status, "result": result}],
+            "subagent_logs": [{
+                "todo_id": args["todo_id"],
+                "prompt": args["task_description"],
+                "tools": args["tool_names"],
+                "result": result,
+                "tokens_used": tokens_used,
+            }],
+            "token_usage": {"total_used": tokens_used},
+        }
+        artifact_changes = self.registry.artifact_changes()
+        if artifact_changes:
+            updates["artifacts"] = artifact_changes
+        return updates
+
+
+def build_scheduler_node(registry: ToolRegistry, max_parallel_tasks: int | None = None):
+    """Return ``(dispatch, run_task)``: the routing function that sends every ready TODO
+    item to its own ``run_task`` node, and that node.
+
+    A subagent that raises fails only its own item. Each item is a separate
+    task in the step, so if the run dies mid-step, the results of the siblings
+    that finished are kept and only the unfinished items rerun on resume.
+    """
+    core = _SchedulerCore(registry, max_parallel_tasks)
+    slots = threading.BoundedSemaphore(core.max_parallel_tasks)
+
+    def run_task(args: dict) -> dict:
+        with slots:
+            emit_todo_status(args["todo_id"], "in_progress")
+            with core.metrics.timer("scheduler_task_seconds"):
+                try:
+                    result = core.task_tool.invoke(args)
+                except GraphBubbleUp:
+                    raise
+                except Exception as e:
+                    result = core.crash_result(e)
+        updates = core.finish_task(args, result)
+        emit_todo_status(args["todo_id"], updates["todo"][0]["status"], result)
+        return updates
+
+    return core.dispatch, run_task
+
+
+def build_async_scheduler_node(registry: ToolRegistry, max_parallel_tasks: int | None = None):
+    """Async counterpart of build_scheduler_node."""
+    core = _SchedulerCore(registry, max_parallel_tasks)
+    # asyncio semaphores belong to one loop; a graph may be driven from several.
+    slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+        weakref.WeakKeyDictionary()
+    )
+
+    async def run_task(args: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        semaphore = slots.get(loop)
+        if semaphore is None:
+            semaphore = slots[loop] = asyncio.Semaphore(core.max_parallel_tasks)
+        async with semaphore:
+            await aemit_todo_status(args["todo_id"], "in_progress")
+            with core.metrics.timer("scheduler_task_seconds"):
+                try:
+                    result = await core.task_tool.ainvoke(args)
+                except GraphBubbleUp:
+                    raise
+                except Exception as e:
+                    result = core.crash_result(e)
+        updates = core.finish_task(args, result)
+        await aemit_todo_status(args["todo_id"], updates["todo"][0]["status"], result)
+        return updates
+
+    return core.dispatch, run_task
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import Literal, Annotated
-from typing_extensions import TypedDict
+from typing_extensions import NotRequired, TypedDict
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
@@ -8,8 +8,13 @@ from langgraph.graph.message import add_messages
 class TodoItem(TypedDict):
     id: str
     description: str
-    status: Literal["pending", "in_progress", "done"]
+    status: Literal["pending", "in_progress", "done", "failed"]
     result: str | None
+    # Scheduling hints: ids that must be done first, the subagent's tools,
+    # and extra context for it. Dependency results are added automatically.
+    depends_on: NotRequired[list[str]]
+    tools: NotRequired[list[str]]
+    context: NotRequired[str]
 
 
 class SubagentLog(TypedDict):
@@ -23,13 +28,80 @@ class SubagentLog(TypedDict):
 class TokenBudget(TypedDict):
     total_used: int
     per_subagent_limit: int
+    cached_input_tokens: NotRequired[int]
+    uncached_input_tokens: NotRequired[int]
+
+
+_SUMMED_USAGE_KEYS = ("total_used", "cached_input_tokens", "uncached_input_tokens")
+
+
+TODO_REMOVE_KEY = "_remove"
+# Fields an update lists under this key are dropped from the item.
+TODO_CLEAR_KEY = "_clear"
+# The optional planning fields; a replan that leaves one out clears it.
+TODO_PLAN_KEYS = ("depends_on", "tools", "context")
+
+
+def upsert_todo(
+    current: list[TodoItem] | None, updates: list[dict] | None
+) -> list[TodoItem]:
+    """Reducer for ``todo``: merge items into the list by ``id``.
+
+    Known ids are updated field by field in place, new ids are appended, and an
+    update carrying ``TODO_REMOVE_KEY`` drops the item. Updates may be partial,
+    e.g. ``{"id": "t1", "status": "done"}``; fields named in ``TODO_CLEAR_KEY``
+    are removed, e.g. ``{"id": "t1", "_clear": ["depends_on"]}``.
+    """
+    merged = {item["id"]: item for item in current or []}
+    for update in updates or []:
+        if update.get(TODO_REMOVE_KEY):
+            merged.pop(update["id"], None)
+            continue
+        existing = merged.get(update["id"])
+        item = {**existing, **update} if existing else dict(update)
+        for key in item.pop(TODO_CLEAR_KEY, None) or []:
+            item.pop(key, None)
+        merged[update["id"]] = item
+    return list(merged.values())
+
+
+def append_logs(
+    current: list[SubagentLog] | None, new: list[SubagentLog] | None
+) -> list[SubagentLog]:
+    """Reducer for ``subagent_logs``: append this step's logs."""
+    return [*(current or []), *(new or [])]
+
+
+def merge_token_usage(current: TokenBudget | None, delta: dict | None) -> TokenBudget:
+    """Reducer for ``token_usage``: add the token counters; a given limit replaces the old one."""
+    merged = {"total_used": 0, "per_subagent_limit": 4096, **(current or {})}
+    delta = delta or {}
+    for key in _SUMMED_USAGE_KEYS:
+        if key in delta:
+            merged[key] = merged.get(key, 0) + delta[key]
+    if "per_subagent_limit" in delta:
+        merged["per_subagent_limit"] = delta["per_subagent_limit"]
+    return merged
+
+
+def merge_artifacts(
+    current: dict[str, str] | None, changes: dict[str, str | None] | None
+) -> dict[str, str]:
+    """Reducer for ``artifacts``: apply a per-step delta where None deletes a path."""
+    merged = dict(current or {})
+    for path, content in (changes or {}).items():
+        if content is None:
+            merged.pop(path, None)
+        else:
+            merged[path] = content
+    return merged
 
 
 class AgentState(TypedDict):
     objective: str
-    todo: list[TodoItem]
-    artifacts: dict[str, str]
-    subagent_logs: list[SubagentLog]
-    token_usage: TokenBudget
+    todo: Annotated[list[TodoItem], upsert_todo]
+    artifacts: Annotated[dict[str, str], merge_artifacts]
+    subagent_logs: Annotated[list[SubagentLog], append_logs]
+    token_usage: Annotated[TokenBudget, merge_token_usage]
     final_output: str | None
     messages: Annotated[list[BaseMessage], add_messages]
@@ -1,13 +1,61 @@
 from __future__ import annotations
+import asyncio
 import os
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
+import re
+import threading
+import weakref
+from langchain_core.messages import AIMessageChunk
+from langchain_core.tools import StructuredTool
 from tools.registry import ToolRegistry
 from context.manager import ContextBudgetAllocator, TokenBudgetExceeded
+from context.compression import summarize_text
+from context.tokens import count_tokens
+from agent.clients import OPENROUTER_BASE_URL, shared_async_http_client, shared_http_client
+from agent.prompt_cache import (
+    cache_control_enabled, cached_blocks, get_prompt_cache_recorder, prompt_layout,
+)
+from agent.progress import message_events, progress_writer
+from utils.cache import LRUCache
+from utils.lazy import LazyImports
 
+# The OpenAI client and prebuilt agent are imported when the first executor is built.
+_lazy = LazyImports(
+    globals(), ChatOpenAI="langchain_openai", create_react_agent="langgraph.prebuilt"
+)
+__getattr__ = _lazy.module_getattr
 
-SUBAGENT_SYSTEM_TEMPLATE = """You are a specialized AI subagent.
+
+# Stable layout: the instructions shared by every subagent come first so
+# providers can cache them as a prefix; per-task fields follow.
+SUBAGENT_SYSTEM_PREFIX = """You are a specialized AI subagent.
+
+Success criteria:
+- Complete the requested task directly and report concrete outcomes.
+- If artifacts (notes, scripts, report) are produced, persist them using write_file.
+- Return a concise final summary that can be merged into the supervisor plan.
+
+Constraints:
+- Stay within task scope; do not attempt unrelated work.
+- Use only the tools listed in "Available tools" below.
+- If required information is missing, state assumptions explicitly in your result.
+
+"""
+
+SUBAGENT_TASK_TEMPLATE = """Available tools:
+{available_tools}
+
+Scope:
+- TODO ID: {todo_id}
+- Task: {task_description}
+
+Task context:
+{context}
+"""
+
+SUBAGENT_SYSTEM_TEMPLATE = SUBAGENT_SYSTEM_PREFIX + SUBAGENT_TASK_TEMPLATE
+
+# Original layout with the per-task scope first; kept for PROMPT_LAYOUT=legacy.
+LEGACY_SUBAGENT_SYSTEM_TEMPLATE = """You are a specialized AI subagent.
 
 Scope:
 - TODO ID: {todo_id}
@@ -30,9 +78,234 @@ Available tools:
 {available_tools}
 """
 
+# The template with its placeholders removed. Counted separately from the
+# per-task fields so its (memoized) token count is only computed once.
+_TEMPLATE_STATIC_TEXT = re.sub(r"\{\w+\}", "", SUBAGENT_SYSTEM_TEMPLATE)
+
+# Where the full text of a summarized subagent result is kept in the virtual FS.
+RESULT_PATH_TEMPLATE = "results/{todo_id}.md"
+FULL_RESULT_REFERENCE = "[Full result: {path}]"
+_FULL_RESULT_RE = re.compile(r"\s*\[Full result: [^\]\n]+\]\s*$")
+# task_tool results starting with this mean the subagent could not run.
+TASK_ERROR_PREFIX = "Error:"
+
+# Each finished task is remembered as a fact of at most MEMORY_FACT_MAX_TOKENS;
+# a new task's context gets the MEMORY_TOP_K most relevant ones that fit in
+# MEMORY_MAX_TOKENS.
+MEMORY_FACT_MAX_TOKENS = 120
+MEMORY_TOP_K = 5
+MEMORY_MAX_TOKENS = 300
+RECALL_HEADING = "Relevant facts from earlier tasks:"
+# Total of one subagent prompt: system prompt, task context and the reserves.
+SUBAGENT_TOKEN_BUDGET = 4096
+
+
+def _available_tools(tool_names: list[str]) -> str:
+    return ", ".join(tool_names) if tool_names else "(none)"
+
+
+def _system_prompt_tokens(todo_id: str, task_description: str, available_tools: str) -> int:
+    """Tokens of the subagent system prompt without its task context."""
+    return count_tokens(_TEMPLATE_STATIC_TEXT, todo_id, task_description, available_tools)
+
+
+def context_token_budget(todo_id: str, task_description: str, tool_names: list[str]) -> int:
+    """Tokens the task context may use so the task fits its budget, leaving
+    room for the facts ``task_tool`` recalls from working memory."""
+    allocator = ContextBudgetAllocator(total_budget=SUBAGENT_TOKEN_BUDGET)
+    room = allocator.context_room(
+        _system_prompt_tokens(todo_id, task_description, _available_tools(tool_names))
+    )
+    recalled = MEMORY_MAX_TOKENS + MEMORY_TOP_K + count_tokens(f"\n\n{RECALL_HEADING}\n")
+    return max(0, room - recalled)
+
+
+class SubagentExecutorCache:
+    """LRU cache of compiled subagent executors keyed by (model, base_url, tool set).
+
+    Executors are compiled without a prompt; the per-task system prompt is sent
+    as the first input message, so every task with the same tool mix reuses the
+    same client and graph. Async callers get executors bound to their event
+    loop's connection pool, held in a separate LRU per loop that is dropped
+    with the loop.
+    """
+
+    def __init__(self, registry: ToolRegistry, maxsize: int = 32) -> None:
+        self._registry = registry
+        self._maxsize = maxsize
+        self._cache: LRUCache[tuple, object] = LRUCache(maxsize=maxsize)
+        self._loop_caches: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LRUCache] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits + sum(c.hits for c in self._live_loop_caches())
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses + sum(c.misses for c in self._live_loop_caches())
+
+    def get(
+        self,
+        tool_names: list[str],
+        model: str | None = None,
+        base_url: str = OPENROUTER_BASE_URL,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ):
+        model = model or os.getenv("SUBAGENT_MODEL", "anthropic/claude-haiku-4.5")
+        key = (model, base_url, tuple(sorted(set(tool_names))))
+        return self._cache_for(loop).get_or_create(
+            key, lambda: self._build(model, base_url, tool_names, loop)
+        )
+
+    def _cache_for(self, loop: asyncio.AbstractEventLoop | None) -> LRUCache:
+        if loop is None:
+            return self._cache
+        with self._lock:
+            cache = self._loop_caches.get(loop)
+            if cache is None:
+                cache = self._loop_caches[loop] = LRUCache(maxsize=self._maxsize)
+            return cache
+
+    def _live_loop_caches(self) -> list[LRUCache]:
+        with self._lock:
+            return list(self._loop_caches.values())
+
+    def _build(self, model: str, base_url: str, tool_names: list[str], loop):
+        tools = self._registry.get_tools(tool_names)
+        llm = _lazy("ChatOpenAI")(
+            model=model,
+            base_url=base_url,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            http_client=shared_http_client(),
+            http_async_client=shared_async_http_client(loop) if loop else None,
+            callbacks=[get_prompt_cache_recorder(), self._registry.metrics_handler],
+            tags=["subagent"],
+        )
+        return _lazy("create_react_agent")(model=llm, tools=tools)
+
+
+def is_task_error(result: str) -> bool:
+    return result.startswith(TASK_ERROR_PREFIX)
+
+
+def split_result_reference(result: str) -> tuple[str, str]:
+    """Split a summarized result into its text and trailing ``[Full result: ...]`` ("" if none)."""
+    match = _FULL_RESULT_RE.search(result)
+    if match is None:
+        return result, ""
+    return result[:match.start()], match.group().strip()
+
+
+def build_task_tool(registry: ToolRegistry, executor_cache: SubagentExecutorCache | None = None):
+    executor_cache = executor_cache or SubagentExecutorCache(registry)
+    result_max_tokens = int(os.getenv("SUBAGENT_RESULT_MAX_TOKENS", "400"))
+    stable_layout = prompt_layout() == "stable"
+    use_cache_control = stable_layout and cache_control_enabled()
+
+    def recall(task_description: str, context: str) -> str:
+        """Context plus the remembered facts relevant to the task that it does not already hold."""
+        facts = [
+            f"- {key}: {value}"
+            for key, value in registry.memory.search(
+                task_description, top_k=MEMORY_TOP_K, max_tokens=MEMORY_MAX_TOKENS
+            )
+            if value[:100] not in context
+        ]
+        if not facts:
+            return context
+        block = f"{RECALL_HEADING}\n" + "\n".join(facts)
+        return f"{context}\n\n{block}" if context else block
+
+    def remember(todo_id: str, task_description: str, result: str) -> None:
+        registry.memory.set_fact(
+            f"{todo_id} ({task_description})", summarize_text(result, MEMORY_FACT_MAX_TOKENS)
+        )
+
+    def build_input(todo_id: str, task_description: str, tool_names: list[str], context: str):
+        """Return the subagent input messages, or an error string if the budget is exceeded."""
+        context = recall(task_description, context)
+        available_tools = _available_tools(tool_names)
+        fields = {
+            "todo_id": todo_id,
+            "task_description": task_description,
+            "context": context,
+            "available_tools": available_tools,
+        }
+        if use_cache_control:
+            system_prompt = cached_blocks(
+                SUBAGENT_SYSTEM_PREFIX, SUBAGENT_TASK_TEMPLATE.format(**fields)
+            )
+        elif stable_layout:
+            system_prompt = SUBAGENT_SYSTEM_TEMPLATE.format(**fields)
+        else:
+            system_prompt = LEGACY_SUBAGENT_SYSTEM_TEMPLATE.format(**fields)
+
+        # Check token budget
+        try:
+            allocator = ContextBudgetAllocator(total_budget=SUBAGENT_TOKEN_BUDGET)
+            allocator.allocate(
+                system_prompt_tokens=_system_prompt_tokens(todo_id, task_description, available_tools),
+                task_context_tokens=count_tokens(context),
+            )
+        except TokenBudgetExceeded as e:
+            return f"{TASK_ERROR_PREFIX} context budget exceeded — {e}"
+
+        return {"messages": [("system", system_prompt), ("user", task_description)]}
+
+    def final_content(result: dict) -> str:
+        messages = result.get("messages", [])
+        if messages:
+            return messages[-1].content
+        return "Subagent completed with no output."
+
+    def fit_result(todo_id: str, result: str) -> str:
+        """Summarize an oversized result; the full text stays in the virtual FS."""
+        if result_max_tokens <= 0 or count_tokens(result) <= result_max_tokens:
+            return result
+        path = RESULT_PATH_TEMPLATE.format(todo_id=re.sub(r"[^\w.-]", "_", todo_id))
+        registry.write_artifact(path, result)
+        reference = "\n\n" + FULL_RESULT_REFERENCE.format(path=path)
+        return summarize_text(result, result_max_tokens - count_tokens(reference)) + reference
+
+    def progress_events(todo_id: str, mode: str, chunk) -> tuple[list[dict], list]:
+        """Events for one ("messages" | "updates") stream item, plus any new full messages."""
+        if mode == "messages":
+            message = chunk[0]
+            return (message_events(todo_id, message) if isinstance(message, AIMessageChunk) else []), []
+        messages = [
+            m for update in chunk.values() if isinstance(update, dict)
+            for m in update.get("messages", [])
+        ]
+        return [e for m in messages for e in message_events(todo_id, m)], messages
+
+    def run_agent(agent, agent_input: dict, todo_id: str) -> str:
+        writer = progress_writer()
+        if writer is None:
+            return final_content(agent.invoke(agent_input))
+        # A client is streaming custom events: forward tokens and tool activity as they happen.
+        last: list = []
+        for mode, chunk in agent.stream(agent_input, stream_mode=["messages", "updates"]):
+            events, messages = progress_events(todo_id, mode, chunk)
+            for event in events:
+                writer(event)
+            last = messages[-1:] or last
+        return final_content({"messages": last})
+
+    async def arun_agent(agent, agent_input: dict, todo_id: str) -> str:
+        writer = progress_writer()
+        if writer is None:
+            return final_content(await agent.ainvoke(agent_input))
+        last: list = []
+        async for mode, chunk in agent.astream(agent_input, stream_mode=["messages", "updates"]):
+            events, messages = progress_events(todo_id, mode, chunk)
+            for event in events:
+                writer(event)
+            last = messages[-1:] or last
+        return final_content({"messages": last})
 
-def build_task_tool(registry: ToolRegistry):
-    @tool
     def task_tool(
         todo_id: str,
         task_description: str,
@@ -48,41 +321,33 @@ def build_task_tool(registry: ToolRegistry):
             tool_names: List of tool names to give the subagent (from registry)
             context: Additional context from the supervisor
         """
-        system_prompt = SUBAGENT_SYSTEM_TEMPLATE.format(
-            todo_id=todo_id,
-            task_description=task_description,
-            context=context,
-            available_tools=", ".join(tool_names) if tool_names else "(none)",
-        )
-
-        # Check token budget
-        try:
-            allocator = ContextBudgetAllocator(total_budget=4096)
-            allocator.allocate(
-                system_prompt_tokens=len(system_prompt.split()),
-                task_context_tokens=len(context.split()),
-            )
-        except TokenBudgetExceeded as e:
-            return f"Error: context budget exceeded — {e}"
-
-        tools = registry.get_tools(tool_names)
-
-        llm = ChatOpenAI(
-            model=os.getenv("SUBAGENT_MODEL", "anthropic/claude-haiku-4.5"),
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
-
-        agent = create_react_agent(
-            model=llm,
-            tools=tools,
-            prompt=system_prompt,
-        )
+        agent_input = build_input(todo_id, task_description, tool_names, context)
+        if isinstance(agent_input, str):
+            return agent_input
+        agent = executor_cache.get(tool_names)
+        with registry.metrics.timer("subagent_seconds"):
+            result = run_agent(agent, agent_input, todo_id)
+        remember(todo_id, task_description, result)
+        return fit_result(todo_id, result)
 
-        result = agent.invoke({"messages": [("user", task_description)]})
-        messages = result.get("messages", [])
-        if messages:
-            return messages[-1].content
-        return "Subagent completed with no output."
+    async def atask_tool(
+        todo_id: str,
+        task_description: str,
+        tool_names: list[str],
+        context: str = "",
+    ) -> str:
+        """Async variant of task_tool; awaits the subagent instead of blocking a thread."""
+        agent_input = build_input(todo_id, task_description, tool_names, context)
+        if isinstance(agent_input, str):
+            return agent_input
+        agent = executor_cache.get(tool_names, loop=asyncio.get_running_loop())
+        with registry.metrics.timer("subagent_seconds"):
+            result = await arun_agent(agent, agent_input, todo_id)
+        remember(todo_id, task_description, result)
+        return fit_result(todo_id, result)
 
-    return task_tool
+    return StructuredTool.from_function(
+        func=task_tool,
+        coroutine=atask_tool,
+        parse_docstring=True,
+    )
@@ -1,155 +1,434 @@
 from __future__ import annotations
 import os
 import json
+import asyncio
+import weakref
+from dataclasses import dataclass, field
+from itertools import groupby
 from typing import Literal
 from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-from agent.state import AgentState
+from agent.state import TODO_CLEAR_KEY, TODO_PLAN_KEYS, TODO_REMOVE_KEY, AgentState
 from tools.registry import ToolRegistry
-from agent.subagent import build_task_tool
+from agent.subagent import build_task_tool, is_task_error
+from context.history import compact_history
+from context.tokens import count_tokens
+from agent.clients import OPENROUTER_BASE_URL, shared_async_http_client, shared_http_client
+from agent.progress import aemit_todo_status, emit_todo_status
+from agent.scheduler import blocked_items, failed_items, ready_items
+from agent.prompt_cache import (
+    cache_control_enabled,
+    cached_blocks,
+    get_prompt_cache_recorder,
+    mark_cache_breakpoint,
+    prompt_layout,
+    usage_from_message,
+)
+from utils.lazy import LazyImports
+
+_lazy = LazyImports(globals(), ChatOpenAI="langchain_openai")
+__getattr__ = _lazy.module_getattr
 
 
 SUPERVISOR_SYSTEM = """You are a Supervisor AI agent. Your job is to:
 1. Decompose the user's objective into a TODO list using update_todo
-2. For each TODO item, call task_tool to create a subagent that completes it
-3. Track results and update the TODO list as items complete
-4. When all TODO items are done, respond with a final summary (do NOT call any tools)
+2. Give each item the ids it depends_on and the tools its subagent needs
+3. The scheduler then runs every item whose dependencies are done as a subagent, passing dependency results along; you are called again when all items are done or some are failed or blocked
+4. Replan with update_todo if items failed or are blocked, or results show the plan must change; set a failed item back to 'pending' (e.g. with a shorter context or fewer tools) to retry it
+5. When all TODO items are done, respond with a final summary (do NOT call any tools)
 
-Always call update_todo first to plan before calling task_tool.
+Always call update_todo first to plan. Use task_tool only for ad-hoc work outside the plan; when you do, include relevant results from previous completed tasks in the context field.
 
-When calling task_tool, include relevant results from previous completed tasks in the context field so subagents can build on prior work.
+Long subagent results are summarized and end with "[Full result: <path>]"; use read_file on that path when you need the details.
 
 Available tools you can assign to subagents via tool_names:
 - "search_internet" — search the web using Tavily
 - "web_scrape" — scrape a webpage using Firecrawl
+- "web_scrape_many" — scrape a list of webpages concurrently using Firecrawl
 - "execute_code" — write and execute Python code
-- "read_file" — read from virtual file system
+- "read_file" — read from virtual file system (whole file, or a line/byte range)
+- "stat_file" — size and line count of a virtual file
+- "grep_files" — regex search across virtual files (matching lines with paths)
+- "glob_files" — list virtual file paths matching a pattern
 - "write_file" — write to virtual file system
 - "edit_file" — edit files in virtual file system
 
-Only use exact tool names from the list above in tool_names.
+Only use exact tool names from the list above in tool_names and in TODO item tools.
 """
 
 
-def build_supervisor_node(registry: ToolRegistry):
-    task_tool = build_task_tool(registry)
-    read_file_tool, write_file_tool, edit_file_tool = registry.get_tools(
-        ["read_file", "write_file", "edit_file"]
-    )
-    shared_file_tools = {
-        "read_file": read_file_tool,
-        "write_file": write_file_tool,
-        "edit_file": edit_file_tool,
-    }
-
-    def estimate_tokens(*chunks: str) -> int:
-        # Keep accounting simple and deterministic for state/log tracking.
-        return sum(len((chunk or "").split()) for chunk in chunks)
-
-    @tool
-    def update_todo(items: list[dict]) -> str:
-        """
-        Update the TODO list. Each item must have: id (str), description (str),
-        status ('pending'|'in_progress'|'done'), result (str|null).
-        """
-        return json.dumps(items)
+@dataclass
+class _SupervisorTurn:
+    """State updates accumulated while processing one supervisor response."""
 
-    supervisor_tools = [update_todo, task_tool, read_file_tool, write_file_tool, edit_file_tool]
+    updates: dict
+    todo: list[dict]
+    todo_delta: dict[str, dict] = field(default_factory=dict)
+    new_logs: list[dict] = field(default_factory=list)
+    usage_delta: dict[str, int] = field(default_factory=dict)
 
-    llm = ChatOpenAI(
-        model=os.getenv("SUPERVISOR_MODEL", "anthropic/claude-sonnet-4.5"),
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENROUTER_API_KEY"),
-    )
-    llm_with_tools = llm.bind_tools(supervisor_tools)
 
-    def supervisor_node(state: AgentState) -> dict:
+def _tool_call_batches(tool_calls: list[dict]):
+    """Group tool calls so each run of consecutive task_tool calls forms one batch."""
+    for is_task, group in groupby(tool_calls, key=lambda tc: tc["name"] == "task_tool"):
+        yield is_task, list(group)
+
+
+@tool
+def update_todo(items: list[dict]) -> str:
+    """
+    Update the TODO list. Each item must have: id (str), description (str),
+    status ('pending'|'in_progress'|'done'|'failed'), result (str|null).
+    Optional: depends_on (list of item ids that must be done first),
+    tools (list of tool names for the item's subagent), context (str);
+    leaving one out of an existing item removes it.
+    """
+    return json.dumps(items)
+
+
+class _SupervisorCore:
+    """Prompt assembly and state merging shared by the sync and async supervisor nodes."""
+
+    def __init__(
+        self,
+        registry: ToolRegistry,
+        max_parallel_tasks: int | None,
+        history_max_tokens: int | None = None,
+        history_keep_turns: int | None = None,
+        history_fold_chunk: int | None = None,
+    ) -> None:
+        if max_parallel_tasks is None:
+            max_parallel_tasks = int(os.getenv("SUPERVISOR_MAX_PARALLEL_TASKS", "4"))
+        if history_max_tokens is None:
+            history_max_tokens = int(os.getenv("SUPERVISOR_HISTORY_MAX_TOKENS", "24000"))
+        if history_keep_turns is None:
+            history_keep_turns = int(os.getenv("SUPERVISOR_HISTORY_KEEP_TURNS", "3"))
+        if history_fold_chunk is None:
+            history_fold_chunk = int(os.getenv("SUPERVISOR_HISTORY_FOLD_CHUNK", "4"))
+        self.registry = registry
+        self.metrics = registry.metrics
+        self.stable_layout = prompt_layout() == "stable"
+        self.use_cache_control = self.stable_layout and cache_control_enabled()
+        self.max_parallel_tasks = max_parallel_tasks
+        self.history_max_tokens = history_max_tokens
+        self.history_keep_turns = history_keep_turns
+        self.history_fold_chunk = max(1, history_fold_chunk)
+        self.task_tool = build_task_tool(registry)
+        file_tools = registry.get_tools(
+            ["read_file", "stat_file", "write_file", "edit_file", "grep_files", "glob_files"]
+        )
+        self.shared_file_tools = {t.name: t for t in file_tools}
+
+        self.supervisor_tools = [update_todo, self.task_tool, *file_tools]
+        self.llm_with_tools = self._bind_llm()
+        self._async_llms: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _bind_llm(self, loop: asyncio.AbstractEventLoop | None = None):
+        llm = _lazy("ChatOpenAI")(
+            model=os.getenv("SUPERVISOR_MODEL", "anthropic/claude-sonnet-4.5"),
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            http_client=shared_http_client(),
+            http_async_client=shared_async_http_client(loop) if loop else None,
+            callbacks=[get_prompt_cache_recorder(), self.registry.metrics_handler],
+            tags=["supervisor"],
+        )
+        return llm.bind_tools(self.supervisor_tools)
+
+    def async_llm(self):
+        """The tool-bound model for the running loop, on that loop's pooled client."""
+        loop = asyncio.get_running_loop()
+        llm = self._async_llms.get(loop)
+        if llm is None:
+            llm = self._async_llms[loop] = self._bind_llm(loop)
+        return llm
+
+    def start_turn(self, state: AgentState) -> tuple[list, _SupervisorTurn]:
         objective = state.get("objective", "")
-        prior_messages = list(state.get("messages", []))
-        todo = list(state.get("todo", []))
+        todo = [dict(item) for item in state.get("todo", [])]
+        todo_block = f"Current TODO list: {json.dumps(todo)}" if todo else ""
+        failed = [item["id"] for item in failed_items(todo)]
+        if failed:
+            todo_block += (
+                f"\nFailed (see their result): {', '.join(failed)}. "
+                "Retry them as 'pending' or replan with update_todo."
+            )
+        blocked = [item["id"] for item in blocked_items(todo)]
+        if blocked:
+            todo_block += (
+                f"\nBlocked by unknown, failed or circular dependencies: {', '.join(blocked)}. "
+                "Replan them with update_todo."
+            )
+        objective_block = f"Objective: {objective}"
 
-        messages = [
-            ("system", SUPERVISOR_SYSTEM),
-            ("user", f"Objective: {objective}"),
-        ] + prior_messages
+        # The full history stays in state; only the prompt copy is compacted.
+        # The stable layout keeps older turns verbatim and folds them in chunks,
+        # so system + objective + history form a prefix that providers can
+        # cache across turns; only the TODO block after it changes every turn.
+        prior_messages = compact_history(
+            list(state.get("messages", [])),
+            max_tokens=self.history_max_tokens,
+            keep_turns=self.history_keep_turns,
+            fixed_tokens=count_tokens(SUPERVISOR_SYSTEM, objective_block, todo_block),
+            shrink_older=not self.stable_layout,
+            fold_chunk=self.history_fold_chunk if self.stable_layout else 1,
+        )
+
+        if self.use_cache_control:
+            messages = [("system", cached_blocks(SUPERVISOR_SYSTEM)), ("user", objective_block)]
+            messages += prior_messages
+            messages[-1] = mark_cache_breakpoint(messages[-1])
+        else:
+            messages = [
+                ("system", SUPERVISOR_SYSTEM),
+                ("user", objective_block),
+            ] + prior_messages
 
         if todo:
-            messages.append(
-                ("user", f"Current TODO list: {json.dumps(todo)}")
+            messages.append(("user", todo_block))
+        return messages, _SupervisorTurn(updates={"messages": []}, todo=todo)
+
+    def record_llm_usage(self, turn: _SupervisorTurn, response) -> None:
+        usage = usage_from_message(response)
+        if usage is not None:
+            turn.usage_delta["cached_input_tokens"] = usage.cached_input_tokens
+            turn.usage_delta["uncached_input_tokens"] = usage.uncached_input_tokens
+
+    def pending_task_calls(self, turn: _SupervisorTurn, task_calls: list[dict]) -> list[dict]:
+        """Drop task calls for TODO items already done (e.g. after resuming a checkpoint)."""
+        done = {item["id"] for item in turn.todo if item.get("status") == "done"}
+        return [tc for tc in task_calls if tc["args"].get("todo_id") not in done]
+
+    def record_skipped_task(self, turn: _SupervisorTurn, tc: dict) -> None:
+        todo_id = tc["args"].get("todo_id")
+        result = next(
+            (item.get("result") for item in turn.todo if item["id"] == todo_id), None
+        )
+        turn.updates["messages"].append(
+            ToolMessage(
+                content=f"TODO '{todo_id}' is already done; not re-run. Result: {result}",
+                tool_call_id=tc["id"],
             )
+        )
 
-        response = llm_with_tools.invoke(messages)
+    def record_task_result(self, turn: _SupervisorTurn, tc: dict, result: str) -> None:
+        todo_id = tc["args"].get("todo_id", "unknown")
+        task_description = tc["args"].get("task_description", "")
+        context = tc["args"].get("context", "")
+        tokens_used = count_tokens(task_description, context, result)
 
-        updates: dict = {"messages": [response]}
+        # Mark the todo item as done, or failed if the subagent could not run
+        status = "failed" if is_task_error(result) else "done"
+        for item in turn.todo:
+            if item["id"] == todo_id:
+                item["status"] = status
+                item["result"] = result
+                turn.todo_delta.setdefault(todo_id, {"id": todo_id}).update(
+                    status=status, result=result
+                )
+        turn.new_logs.append({
+            "todo_id": todo_id,
+            "prompt": task_description,
+            "tools": tc["args"].get("tool_names", []),
+            "result": result,
+            "tokens_used": tokens_used,
+        })
+        turn.updates["messages"].append(
+            ToolMessage(content=result, tool_call_id=tc["id"])
+        )
+
+    def record_tool_call(self, turn: _SupervisorTurn, tc: dict) -> None:
+        if tc["name"] == "update_todo":
+            try:
+                raw = tc["args"].get("items", "[]")
+                if isinstance(raw, list):
+                    new_todo = raw
+                else:
+                    new_todo = json.loads(raw)
+                if isinstance(new_todo, list):
+                    new_todo = [
+                        dict(item) for item in new_todo
+                        if isinstance(item, dict) and "id" in item
+                    ]
+                    kept_ids = {item["id"] for item in new_todo}
+                    for item in turn.todo:
+                        if item["id"] not in kept_ids:
+                            turn.todo_delta[item["id"]] = {
+                                "id": item["id"], TODO_REMOVE_KEY: True
+                            }
+                    for item in new_todo:
+                        delta = dict(item)
+                        # A replanned item drops the hints it no longer lists.
+                        cleared = [key for key in TODO_PLAN_KEYS if key not in item]
+                        if cleared:
+                            delta[TODO_CLEAR_KEY] = cleared
+                        turn.todo_delta[item["id"]] = delta
+                    turn.todo = new_todo
+            except (json.JSONDecodeError, TypeError):
+                pass
+            turn.updates["messages"].append(
+                ToolMessage(content="TODO updated", tool_call_id=tc["id"])
+            )
+        elif tc["name"] in self.shared_file_tools:
+            file_result = self.shared_file_tools[tc["name"]].invoke(tc["args"])
+            if isinstance(file_result, (dict, list)):
+                content = json.dumps(file_result)
+            else:
+                content = str(file_result)
+            turn.updates["messages"].append(
+                ToolMessage(content=content, tool_call_id=tc["id"])
+            )
+
+    def finish_turn(self, state: AgentState, turn: _SupervisorTurn) -> dict:
+        # Every channel below has a reducer in AgentState, so only deltas are sent.
+        updates = turn.updates
+        if turn.todo_delta:
+            updates["todo"] = list(turn.todo_delta.values())
+        if turn.new_logs:
+            updates["subagent_logs"] = turn.new_logs
+            updates["token_usage"] = {
+                "total_used": sum(log["tokens_used"] for log in turn.new_logs)
+            }
+        if turn.usage_delta:
+            updates["token_usage"] = {**updates.get("token_usage", {}), **turn.usage_delta}
+        # Only files touched during this turn are sent; the state reducer merges them.
+        artifact_changes = self.registry.artifact_changes()
+        if artifact_changes:
+            updates["artifacts"] = artifact_changes
+        return updates
+
+
+def build_supervisor_node(
+    registry: ToolRegistry,
+    max_parallel_tasks: int | None = None,
+    history_max_tokens: int | None = None,
+    history_keep_turns: int | None = None,
+    history_fold_chunk: int | None = None,
+):
+    core = _SupervisorCore(
+        registry, max_parallel_tasks, history_max_tokens, history_keep_turns, history_fold_chunk
+    )
+    task_tool = core.task_tool
+    max_parallel_tasks = core.max_parallel_tasks
+
+    def run_task_calls(task_calls: list[dict]) -> list[str]:
+        """Run a batch of task_tool calls, fanning out up to max_parallel_tasks at once.
+
+        Results are returned in the same order as ``task_calls``.
+        """
+        if max_parallel_tasks <= 1 or len(task_calls) <= 1:
+            return [run_one(tc) for tc in task_calls]
+        workers = min(max_parallel_tasks, len(task_calls))
+        with ContextThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_one, tc) for tc in task_calls]
+            return [f.result() for f in futures]
+
+    def run_one(tc: dict) -> str:
+        # Streamed as each subagent starts and finishes, ahead of the step's state update.
+        todo_id = tc["args"].get("todo_id", "unknown")
+        emit_todo_status(todo_id, "in_progress")
+        result = task_tool.invoke(tc["args"])
+        emit_todo_status(todo_id, "failed" if is_task_error(result) else "done", result)
+        return result
+
+    def step(state: AgentState) -> dict:
+        messages, turn = core.start_turn(state)
+        response = core.llm_with_tools.invoke(messages)
+        core.record_llm_usage(turn, response)
+        turn.updates["messages"].append(response)
 
         # Process tool calls
         if hasattr(response, "tool_calls") and response.tool_calls:
-            for tc in response.tool_calls:
-                if tc["name"] == "update_todo":
-                    try:
-                        raw = tc["args"].get("items", "[]")
-                        if isinstance(raw, list):
-                            new_todo = raw
+            for is_task, group in _tool_call_batches(response.tool_calls):
+                if is_task:
+                    pending = core.pending_task_calls(turn, group)
+                    results = dict(zip((tc["id"] for tc in pending), run_task_calls(pending)))
+                    for tc in group:
+                        if tc["id"] in results:
+                            core.record_task_result(turn, tc, results[tc["id"]])
                         else:
-                            new_todo = json.loads(raw)
-                        if isinstance(new_todo, list):
-                            updates["todo"] = new_todo
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-                    updates["messages"].append(
-                        ToolMessage(content="TODO updated", tool_call_id=tc["id"])
-                    )
-                elif tc["name"] == "task_tool":
-                    result = task_tool.invoke(tc["args"])
-                    todo_id = tc["args"].get("todo_id", "unknown")
-                    task_description = tc["args"].get("task_description", "")
-                    context = tc["args"].get("context", "")
-                    tokens_used = estimate_tokens(task_description, context, result)
-
-                    # Mark the todo item as done
-                    updated_todo = list(todo)
-                    for item in updated_todo:
-                        if item["id"] == todo_id:
-                            item["status"] = "done"
-                            item["result"] = result
-                    updates["todo"] = updated_todo
-                    log = {
-                        "todo_id": todo_id,
-                        "prompt": task_description,
-                        "tools": tc["args"].get("tool_names", []),
-                        "result": result,
-                        "tokens_used": tokens_used,
-                    }
-                    updates["subagent_logs"] = state.get("subagent_logs", []) + [log]
-                    token_usage = dict(state.get("token_usage", {}))
-                    token_usage["per_subagent_limit"] = token_usage.get("per_subagent_limit", 4096)
-                    token_usage["total_used"] = token_usage.get("total_used", 0) + tokens_used
-                    updates["token_usage"] = token_usage
-                    updates["artifacts"] = registry.artifacts()
-                    updates["messages"].append(
-                        ToolMessage(content=result, tool_call_id=tc["id"])
-                    )
-                elif tc["name"] in shared_file_tools:
-                    file_result = shared_file_tools[tc["name"]].invoke(tc["args"])
-                    if isinstance(file_result, (dict, list)):
-                        content = json.dumps(file_result)
-                    else:
-                        content = str(file_result)
-                    updates["artifacts"] = registry.artifacts()
-                    updates["messages"].append(
-                        ToolMessage(content=content, tool_call_id=tc["id"])
-                    )
+                            core.record_skipped_task(turn, tc)
+                else:
+                    for tc in group:
+                        core.record_tool_call(turn, tc)
         else:
             # No tool calls — supervisor is done
-            updates["final_output"] = response.content
+            turn.updates["final_output"] = response.content
 
-        return updates
+        return core.finish_turn(state, turn)
+
+    def supervisor_node(state: AgentState) -> dict:
+        with core.metrics.timer("supervisor_step_seconds"):
+            return step(state)
+
+    return supervisor_node
+
+
+def build_async_supervisor_node(
+    registry: ToolRegistry,
+    max_parallel_tasks: int | None = None,
+    history_max_tokens: int | None = None,
+    history_keep_turns: int | None = None,
+    history_fold_chunk: int | None = None,
+):
+    """Async counterpart of build_supervisor_node for driving the graph with ainvoke/astream."""
+    core = _SupervisorCore(
+        registry, max_parallel_tasks, history_max_tokens, history_keep_turns, history_fold_chunk
+    )
+    task_tool = core.task_tool
+    max_parallel_tasks = max(1, core.max_parallel_tasks)
+
+    async def arun_task_calls(task_calls: list[dict]) -> list[str]:
+        """Await a batch of task_tool calls with at most max_parallel_tasks in flight."""
+        semaphore = asyncio.Semaphore(max_parallel_tasks)
+
+        async def run_one(tc: dict) -> str:
+            todo_id = tc["args"].get("todo_id", "unknown")
+            async with semaphore:
+                await aemit_todo_status(todo_id, "in_progress")
+                result = await task_tool.ainvoke(tc["args"])
+            await aemit_todo_status(todo_id, "failed" if is_task_error(result) else "done", result)
+            return result
+
+        return list(await asyncio.gather(*(run_one(tc) for tc in task_calls)))
+
+    async def step(state: AgentState) -> dict:
+        messages, turn = core.start_turn(state)
+        response = await core.async_llm().ainvoke(messages)
+        core.record_llm_usage(turn, response)
+        turn.updates["messages"].append(response)
+
+        if hasattr(response, "tool_calls") and response.tool_calls:
+            for is_task, group in _tool_call_batches(response.tool_calls):
+                if is_task:
+                    pending = core.pending_task_calls(turn, group)
+                    results = dict(
+                        zip((tc["id"] for tc in pending), await arun_task_calls(pending))
+                    )
+                    for tc in group:
+                        if tc["id"] in results:
+                            core.record_task_result(turn, tc, results[tc["id"]])
+                        else:
+                            core.record_skipped_task(turn, tc)
+                else:
+                    for tc in group:
+                        core.record_tool_call(turn, tc)
+        else:
+            turn.updates["final_output"] = response.content
+
+        return core.finish_turn(state, turn)
+
+    async def supervisor_node(state: AgentState) -> dict:
+        with core.metrics.timer("supervisor_step_seconds"):
+            return await step(state)
 
     return supervisor_node
 
 
-def should_continue(state: AgentState) -> Literal["continue", "end"]:
+def should_continue(state: AgentState) -> Literal["continue", "schedule", "end"]:
     if state.get("final_output"):
         return "end"
+    if ready_items(state.get("todo", [])):
+        return "schedule"
     return "continue"
@@ -1,11 +1,19 @@
 from context.manager import ContextBudgetAllocator, TokenBudgetExceeded
-from context.compression import compress_text, compress_tool_results
+from context.compression import compress_text, compress_tool_results, summarize_text
+from context.history import compact_history
 from context.memory import WorkingMemory
+from context.tokens import TokenCounter, count_tokens, get_token_counter, set_token_counter
 
 __all__ = [
     "ContextBudgetAllocator",
     "TokenBudgetExceeded",
     "compress_text",
     "compress_tool_results",
+    "summarize_text",
+    "compact_history",
     "WorkingMemory",
+    "TokenCounter",
+    "count_tokens",
+    "get_token_counter",
+    "set_token_counter",
 ]
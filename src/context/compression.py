@@ -1,4 +1,8 @@
 from __future__ import annotations
+import heapq
+import re
+from collections import Counter
+from context.tokens import count_tokens
 
 
 def compress_text(text: str, max_words: int = 120) -> str:
@@ -16,3 +20,128 @@ def compress_tool_results(results: list[str], max_items: int = 5, max_words_each
     for idx, item in enumerate(selected, start=1):
         lines.append(f"[Result {idx}] {compress_text(item, max_words=max_words_each)}")
     return "\n".join(lines)
+
+
+# Lines, and sentences within a line, are the units the summarizer picks from.
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORD_RE = re.compile(r"[a-z][a-z0-9_'-]+")
+_URL_RE = re.compile(r"https?://[^\s)\]>\"']+")
+_PATH_RE = re.compile(
+    r"(?<![\w/:])(?:\.{0,2}/)?(?:[\w.-]+/)+[\w.-]+|\b[\w-]+\.(?:py|md|txt|json|csv|ya?ml|toml|js|ts|html|sql|log)\b"
+)
+_NUMBER_RE = re.compile(r"\d")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have he her "
+    "his i if in into is it its it's may more most no not of on or our she should so some "
+    "such than that the their them then there these they this those to was we were what "
+    "when where which while who will with would you your also only other over very".split()
+)
+
+
+def _sentences(text: str) -> list[tuple[str, str]]:
+    """Split into (sentence, separator-before) pairs; separators are "\\n" or " "."""
+    units: list[tuple[str, str]] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        for i, sentence in enumerate(_SENTENCE_RE.split(line)):
+            units.append((sentence, " " if i else "\n"))
+    return units
+
+
+def _references(text: str) -> list[str]:
+    """URLs and file paths in ``text``, in order of first appearance."""
+    urls = [url.rstrip(".,;:") for url in _URL_RE.findall(text)]
+    # Paths inside URLs are already covered by the URL itself.
+    stripped = _URL_RE.sub(" ", text)
+    paths = [path.rstrip(".,;:") for path in _PATH_RE.findall(stripped)]
+    return list(dict.fromkeys(urls + paths))
+
+
+def _trim_to_tokens(text: str, max_tokens: int) -> str:
+    words = text.split()
+    while len(words) > 1 and count_tokens(" ".join(words) + " ...") > max_tokens:
+        words = words[: max(1, len(words) * 3 // 4)]
+    trimmed = " ".join(words)
+    while trimmed and count_tokens(trimmed + " ...") > max_tokens:
+        trimmed = trimmed[: len(trimmed) * 3 // 4]
+    return trimmed + " ..." if trimmed else ""
+
+
+def _terms(sentence: str) -> set[str]:
+    return {word for word in _WORD_RE.findall(sentence.lower()) if word not in STOPWORDS}
+
+
+def summarize_text(text: str, max_tokens: int = 300) -> str:
+    """Extractive summary of ``text`` that fits in ``max_tokens``.
+
+    Sentences are picked SumBasic-style: each scores the mean probability of
+    its terms, boosted when it carries numbers, URLs or file paths, and the
+    terms of every picked sentence are down-weighted so repeats lose out.
+    Picked sentences keep their original order; URLs and paths from dropped
+    sentences are listed at the end while they fit. Text already within
+    budget is returned unchanged.
+    """
+    text = text or ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    units = _sentences(text)
+    if not units:
+        return _trim_to_tokens(text, max_tokens)
+    terms = [_terms(sentence) for sentence, _ in units]
+    facts = [
+        len(_references(sentence)) + (1 if _NUMBER_RE.search(sentence) else 0)
+        for sentence, _ in units
+    ]
+    costs = [count_tokens(sentence) + 2 for sentence, _ in units]  # + the "\n... " gap marker
+    frequency = Counter(word for sentence_terms in terms for word in sentence_terms)
+    total = sum(frequency.values()) or 1
+    weight = {word: count / total for word, count in frequency.items()}
+
+    def score(index: int) -> float:
+        mean = sum(weight[w] for w in terms[index]) / len(terms[index]) if terms[index] else 0.0
+        return mean * (1 + 0.5 * facts[index]) * (1.5 if index == 0 else 1.0)
+
+    chosen: set[int] = set()
+    seen: set[str] = set()
+    used = 0
+    # Scores only ever drop, so a stale heap entry is re-scored lazily when it
+    # reaches the top instead of re-scoring every sentence after each pick.
+    heap = [(-score(i), i) for i in range(len(units)) if costs[i] <= max_tokens]
+    heapq.heapify(heap)
+    while heap:
+        _, best = heapq.heappop(heap)
+        current = -score(best)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, best))
+            continue
+        sentence = units[best][0]
+        if sentence in seen or used + costs[best] > max_tokens:
+            continue
+        chosen.add(best)
+        seen.add(sentence)
+        used += costs[best]
+        for word in terms[best]:
+            weight[word] *= weight[word]
+    if not chosen:
+        return _trim_to_tokens(units[max(range(len(units)), key=score)][0], max_tokens)
+
+    parts: list[str] = []
+    for index in sorted(chosen):
+        sentence, separator = units[index]
+        if parts:
+            parts.append(separator if index - 1 in chosen else "\n... ")
+        parts.append(sentence)
+    summary = "".join(parts)
+
+    extra: list[str] = []
+    for ref in _references(text):
+        if ref in summary:
+            continue
+        if count_tokens(summary, "\nAlso referenced: " + ", ".join(extra + [ref])) > max_tokens:
+            break
+        extra.append(ref)
+    if extra:
+        summary += "\nAlso referenced: " + ", ".join(extra)
+    return summary
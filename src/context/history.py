@@ -0,0 +1,136 @@
+from __future__ import annotations
+import json
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from context.compression import compress_text, compress_tool_results
+from context.manager import ContextBudgetAllocator, TokenBudgetExceeded
+from context.tokens import count_tokens
+
+
+def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Group messages so each AI message travels with the ToolMessages answering it."""
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and turns:
+            turns[-1].append(message)
+        else:
+            turns.append([message])
+    return turns
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = count_tokens(content)
+    for tc in getattr(message, "tool_calls", None) or []:
+        tokens += count_tokens(tc["name"], json.dumps(tc["args"], sort_keys=True))
+    return tokens
+
+
+def _shrink(message: BaseMessage, max_words: int) -> BaseMessage:
+    """Compress a message's text and string tool arguments, keeping ids intact."""
+    update: dict = {}
+    if isinstance(message.content, str):
+        compressed = compress_text(message.content, max_words=max_words)
+        if compressed != message.content:
+            update["content"] = compressed
+    if isinstance(message, AIMessage) and message.tool_calls:
+        update["tool_calls"] = [
+            {
+                **tc,
+                "args": {
+                    k: compress_text(v, max_words=max_words) if isinstance(v, str) else v
+                    for k, v in tc["args"].items()
+                },
+            }
+            for tc in message.tool_calls
+        ]
+    return message.model_copy(update=update) if update else message
+
+
+def _summary_line(message: ToolMessage, calls: dict[str, dict]) -> str:
+    call = calls.get(message.tool_call_id, {})
+    args = call.get("args", {})
+    label = call.get("name", "tool")
+    target = args.get("todo_id") or args.get("path")
+    if target:
+        label = f"{label} {target}"
+    return f"{label}: {message.content}"
+
+
+def compact_history(
+    messages: list[BaseMessage],
+    max_tokens: int,
+    keep_turns: int = 3,
+    fixed_tokens: int = 0,
+    max_words_each: int = 60,
+    shrink_older: bool = True,
+    fold_chunk: int = 1,
+) -> list[BaseMessage]:
+    """Fit supervisor history into ``max_tokens`` without breaking tool-call pairing.
+
+    The last ``keep_turns`` turns are kept verbatim. Older turns first have their
+    tool results and tool arguments compressed; if the prompt still does not fit
+    (``fixed_tokens`` covers the system prompt and other fixed parts), the
+    oldest turns are folded, whole, into one summary message. A turn is an AI
+    message plus the ToolMessages answering it, so a tool call and its result
+    are always kept or folded together.
+
+    For provider prefix caching, pass ``shrink_older=False`` and a
+    ``fold_chunk`` > 1: older turns then stay verbatim and are folded in
+    multiples of ``fold_chunk`` turns, so the compacted prefix only changes
+    once every ``fold_chunk`` folds instead of on every call.
+    """
+    turns = _split_turns(list(messages))
+    if len(turns) <= keep_turns:
+        return list(messages)
+    split = len(turns) - keep_turns
+    older = turns[:split]
+    if shrink_older:
+        older = [[_shrink(m, max_words_each) for m in turn] for turn in older]
+    recent = turns[split:]
+
+    allocator = ContextBudgetAllocator(total_budget=max_tokens)
+    turn_tokens = [sum(_message_tokens(m) for m in turn) for turn in older + recent]
+    history_tokens = sum(turn_tokens)
+
+    folded: list[str] = []
+    summary: HumanMessage | None = None
+    summary_tokens = 0
+    folded_turns = 0
+    while older:
+        if folded_turns % fold_chunk == 0:
+            try:
+                allocator.allocate(
+                    system_prompt_tokens=fixed_tokens,
+                    task_context_tokens=history_tokens + summary_tokens,
+                )
+                break
+            except TokenBudgetExceeded:
+                pass
+        turn = older.pop(0)
+        folded_turns += 1
+        history_tokens -= turn_tokens.pop(0)
+        calls = {
+            tc["id"]: tc
+            for m in turn
+            if isinstance(m, AIMessage)
+            for tc in m.tool_calls
+        }
+        for m in turn:
+            if isinstance(m, ToolMessage):
+                folded.append(_summary_line(m, calls))
+            elif isinstance(m.content, str) and m.content.strip():
+                folded.append(f"{m.type}: {m.content}")
+        # Keep the most recent folded results; older ones are the least relevant.
+        packed = compress_tool_results(
+            folded[-10:], max_items=10, max_words_each=max_words_each // 2
+        )
+        summary = HumanMessage(
+            content=f"Summary of earlier steps (compacted):\n{packed or '(no tool results)'}"
+        )
+        summary_tokens = _message_tokens(summary)
+
+    compacted = [summary] if summary is not None else []
+    for turn in older + recent:
+        compacted.extend(turn)
+    return compacted
@@ -27,6 +27,13 @@ class ContextBudgetAllocator:
             "response_generation": self._response_reserve,
         }
 
+    def context_room(self, system_prompt_tokens: int) -> int:
+        """Tokens left for the task context next to the system prompt and the reserves."""
+        return (
+            self.total_budget - system_prompt_tokens
+            - self._tool_results_reserve - self._response_reserve
+        )
+
     def record_usage(self, tokens: int) -> None:
         self.total_used += tokens
 
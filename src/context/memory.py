@@ -1,20 +1,173 @@
 from __future__ import annotations
+import heapq
+import math
+import re
+import threading
+from collections import Counter
 from dataclasses import dataclass, field
+from context.compression import STOPWORDS
+from context.tokens import count_tokens
+
+_TERM_RE = re.compile(r"[a-z0-9][a-z0-9_-]*")
+
+
+def _terms(text: str) -> Counter[str]:
+    return Counter(t for t in _TERM_RE.findall(text.lower()) if t not in STOPWORDS)
 
 
 @dataclass
 class WorkingMemory:
-    """Simple in-process memory store for cross-step facts and notes."""
+    """In-process memory store for cross-step facts and notes.
+
+    Facts are indexed as they are set (an inverted index with BM25 scoring over
+    key and value), so ``search`` only touches the postings of the query's
+    terms instead of scanning every fact, and skips most of a common term's
+    postings once they cannot change the top results.
+    """
 
     _facts: dict[str, str] = field(default_factory=dict)
+    k1: float = 1.2
+    b: float = 0.75
+    _postings: dict[str, dict[str, int]] = field(default_factory=dict, repr=False)
+    _lengths: dict[str, int] = field(default_factory=dict, repr=False)
+    _costs: dict[str, int] = field(default_factory=dict, repr=False)
+    _cost_counts: Counter[int] = field(default_factory=Counter, repr=False)
+    _total_length: int = field(default=0, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        for key, value in list(self._facts.items()):
+            self.set_fact(key, value)
+
+    def __len__(self) -> int:
+        return len(self._facts)
 
     def set_fact(self, key: str, value: str) -> None:
-        self._facts[key] = value
+        with self._lock:
+            if key in self._lengths:
+                self._unindex(key)
+            self._facts[key] = value
+            terms = _terms(f"{key} {value}")
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[key] = tf
+            self._lengths[key] = sum(terms.values())
+            self._total_length += self._lengths[key]
+            self._costs[key] = count_tokens(self._line(key, value))
+            self._cost_counts[self._costs[key]] += 1
 
     def get_fact(self, key: str, default: str = "") -> str:
         return self._facts.get(key, default)
 
-    def to_context_block(self) -> str:
-        if not self._facts:
-            return ""
-        return "\n".join(f"- {k}: {v}" for k, v in self._facts.items())
+    def search(
+        self, query: str, top_k: int = 5, max_tokens: int | None = None
+    ) -> list[tuple[str, str]]:
+        """The ``top_k`` facts most relevant to ``query`` (BM25), best first.
+
+        With ``max_tokens``, facts that would overflow the budget are skipped
+        in favour of lower-ranked ones that still fit.
+        """
+        with self._lock:
+            if not self._lengths:
+                return []
+            terms = [t for t in _terms(query) if t in self._postings]
+            scores, pruned_bound = self._score(terms, top_k)
+            ranked, exact = self._select(scores, top_k, max_tokens, pruned_bound)
+            if not exact:
+                scores, _ = self._score(terms, None)
+                ranked, _ = self._select(scores, top_k, max_tokens)
+            return [(key, self._facts[key]) for key in ranked]
+
+    def _score(self, terms: list[str], top_k: int | None) -> tuple[dict[str, float], float]:
+        """BM25 scores of the facts matching ``terms``, with MaxScore-style pruning.
+
+        Terms are visited rarest first. Once the best contribution the
+        remaining terms could add (``idf * (k1 + 1)`` each) is below the
+        ``top_k``-th score so far, facts those terms alone match can no longer
+        reach the top, so the remaining postings only update existing
+        candidates. Returns the scores and that bound (0.0 if nothing was
+        pruned). With ``top_k`` None every posting is scored.
+        """
+        n = len(self._lengths)
+        average = self._total_length / n or 1.0
+        weighted = []
+        for term in terms:
+            postings = self._postings[term]
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            weighted.append((idf, postings))
+        weighted.sort(key=lambda pair: -pair[0])
+        remaining = [0.0] * (len(weighted) + 1)
+        for i in range(len(weighted) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + weighted[i][0] * (self.k1 + 1)
+        scores: dict[str, float] = {}
+        pruned_bound = 0.0
+        for i, (idf, postings) in enumerate(weighted):
+            if (
+                not pruned_bound and top_k and len(scores) >= top_k
+                and remaining[i] < heapq.nlargest(top_k, scores.values())[-1]
+            ):
+                pruned_bound = remaining[i]
+            if pruned_bound and len(postings) > len(scores):
+                matches = [(key, postings[key]) for key in scores if key in postings]
+            elif pruned_bound:
+                matches = [(key, tf) for key, tf in postings.items() if key in scores]
+            else:
+                matches = postings.items()
+            for key, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores, pruned_bound
+
+    def _select(
+        self, scores: dict[str, float], top_k: int, max_tokens: int | None, bound: float = 0.0
+    ) -> tuple[list[str], bool]:
+        """Keys of the best ``top_k`` facts; with ``max_tokens``, greedily within the budget.
+
+        Also reports whether the choice is final: ``False`` if a fact missing
+        from ``scores`` but scoring up to ``bound`` could still have been picked.
+        """
+        if max_tokens is None:
+            selected = heapq.nlargest(top_k, scores, key=scores.__getitem__)
+            return selected, not bound or (len(selected) == top_k and scores[selected[-1]] > bound)
+        selected: list[str] = []
+        used = 0
+        room = None
+        for key in sorted(scores, key=scores.__getitem__, reverse=True):
+            if room is None and scores[key] <= bound:
+                room = max_tokens - used
+            cost = self._costs[key]
+            if used + cost <= max_tokens:
+                selected.append(key)
+                used += cost
+                if len(selected) == top_k:
+                    break
+        if not bound or (room is None and len(selected) == top_k):
+            return selected, True
+        room = max_tokens - used if room is None else room
+        return selected, room < min(self._cost_counts)
+
+    def to_context_block(
+        self, query: str | None = None, top_k: int = 5, max_tokens: int | None = None
+    ) -> str:
+        """Every fact, or with ``query`` only the relevant ones (see ``search``)."""
+        if query is None:
+            items = list(self._facts.items())
+        else:
+            items = self.search(query, top_k=top_k, max_tokens=max_tokens)
+        return "\n".join(self._line(k, v) for k, v in items)
+
+    @staticmethod
+    def _line(key: str, value: str) -> str:
+        return f"- {key}: {value}"
+
+    def _unindex(self, key: str) -> None:
+        for term in _terms(f"{key} {self._facts[key]}"):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(key)
+        cost = self._costs.pop(key)
+        self._cost_counts[cost] -= 1
+        if not self._cost_counts[cost]:
+            del self._cost_counts[cost]
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import hashlib
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Protocol
+
+from utils.cache import LRUCache
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Approximates the pre-tokenization step of GPT/Claude-style BPE tokenizers:
+# contractions, letter runs, digit groups of up to three, punctuation runs and
+# whitespace each become separate pieces before merging.
+_PIECE_RE = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+"
+)
+
+
+class TokenCounter(Protocol):
+    def count(self, text: str) -> int: ...
+
+
+class WordCountTokenCounter:
+    """Whitespace word count. Cheap, but undercounts code, URLs and numbers."""
+
+    name = "words"
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+
+class ApproxTokenCounter:
+    """Offline tokenizer that estimates BPE token counts without vocabulary files.
+
+    Text is split into BPE pre-tokenization pieces; ASCII words of up to eight
+    letters cost one token and longer ones one per six letters, digits one per
+    group of three, punctuation one per three characters and non-ASCII text one
+    per three UTF-8 bytes. It errs on the side of overcounting.
+    """
+
+    name = "approx"
+
+    def count(self, text: str) -> int:
+        total = 0
+        for piece in _PIECE_RE.findall(text):
+            body = piece.lstrip(" ")
+            if not body:
+                total += 1
+            elif body[0].isdigit() or body.isspace():
+                total += 1
+            elif body[0].isalpha() or body[0] == "'":
+                if body.isascii():
+                    total += 1 if len(body) <= 8 else math.ceil(len(body) / 6)
+                else:
+                    total += math.ceil(len(body.encode()) / 3)
+            else:
+                total += math.ceil(len(body) / 3)
+        return total
+
+
+class TiktokenCounter:
+    """Exact counts via tiktoken. Needs the encoding file to be cached locally."""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding: str = "cl100k_base") -> None:
+        import tiktoken
+
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class CachingTokenCounter:
+    """Memoizes another counter so repeated strings (prompt templates, unchanged
+    TODO JSON) are only tokenized once.
+
+    Strings longer than ``max_key_chars`` are cached under a digest instead of
+    themselves, so large tool outputs are not kept alive by the cache.
+    """
+
+    def __init__(self, counter: TokenCounter, maxsize: int = 4096, max_key_chars: int = 4096) -> None:
+        self.counter = counter
+        self.max_key_chars = max_key_chars
+        self._count = lru_cache(maxsize=maxsize)(counter.count)
+        self._large: LRUCache[bytes, int] = LRUCache(maxsize=maxsize)
+
+    def count(self, text: str) -> int:
+        if len(text) <= self.max_key_chars:
+            return self._count(text)
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        return self._large.get_or_create(digest, lambda: self.counter.count(text))
+
+    def cache_info(self):
+        return self._count.cache_info()
+
+
+def make_token_counter(name: str = "approx") -> CachingTokenCounter:
+    """Build a cached counter by name: "approx" (default), "tiktoken" or "words".
+
+    Falls back to word counts if the requested tokenizer cannot be loaded.
+    """
+    try:
+        if name == "tiktoken":
+            counter: TokenCounter = TiktokenCounter()
+        elif name == "words":
+            counter = WordCountTokenCounter()
+        elif name == "approx":
+            counter = ApproxTokenCounter()
+        else:
+            raise ValueError(f"unknown token counter '{name}'")
+    except Exception as e:
+        logger.warning("Token counter '%s' unavailable (%s); using word counts", name, e)
+        counter = WordCountTokenCounter()
+    return CachingTokenCounter(counter)
+
+
+_default_counter: CachingTokenCounter | None = None
+
+
+def get_token_counter() -> CachingTokenCounter:
+    """Return the process-wide counter, selected by the TOKEN_COUNTER env var."""
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = make_token_counter(os.getenv("TOKEN_COUNTER", "approx"))
+    return _default_counter
+
+
+def set_token_counter(counter: TokenCounter) -> None:
+    """Replace the process-wide counter (wrapped in a cache if it is not one)."""
+    global _default_counter
+    if not isinstance(counter, CachingTokenCounter):
+        counter = CachingTokenCounter(counter)
+    _default_counter = counter
+
+
+def count_tokens(*chunks: str | None) -> int:
+    """Count tokens across chunks; each chunk is memoized independently."""
+    counter = get_token_counter()
+    return sum(counter.count(chunk) for chunk in chunks if chunk)
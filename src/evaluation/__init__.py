@@ -1,5 +1,11 @@
 from evaluation.evaluators import evaluate_run
-from evaluation.metrics import MetricCollector
+from evaluation.metrics import MetricCollector, MetricsCallbackHandler, get_metrics
 from evaluation.verification import validate_final_output
 
-__all__ = ["evaluate_run", "MetricCollector", "validate_final_output"]
+__all__ = [
+    "evaluate_run",
+    "MetricCollector",
+    "MetricsCallbackHandler",
+    "get_metrics",
+    "validate_final_output",
+]
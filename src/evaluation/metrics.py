@@ -1,13 +1,217 @@
 from __future__ import annotations
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from typing import Any, Iterator
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Tags that name the caller of a model; see MetricsCallbackHandler.
+ROLE_TAGS = ("supervisor", "subagent")
+
+
+def _series(name: str, labels: dict[str, str] | None) -> str:
+    """Prometheus-style series key, e.g. ``tool_seconds{tool="web_scrape"}``."""
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{_escape(str(value))}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name: str) -> str:
+    name = re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+    return name if re.match(r"[a-zA-Z_:]", name) else f"_{name}"
+
+
+def _nearest_rank(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+class Histogram:
+    """Count, sum and max of observations, with percentiles over the latest ``reservoir`` samples."""
+
+    def __init__(self, reservoir: int = 2048) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._samples: deque[float] = deque(maxlen=reservoir)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self._samples.append(value)
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile for ``q`` in [0, 1]; 0.0 when empty."""
+        return _nearest_rank(sorted(self._samples), q)
+
+    def summary(self) -> dict[str, float]:
+        ordered = sorted(self._samples)
+        result = {"count": self.count, "sum": self.sum, "max": self.max}
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = _nearest_rank(ordered, q)
+        return result
 
 
 @dataclass
 class MetricCollector:
+    """Counters plus latency histograms, exportable as JSON or Prometheus text.
+
+    Metric names may carry labels, e.g. ``observe("tool_seconds", 0.2, tool="web_scrape")``.
+    All methods are thread-safe.
+    """
+
     counters: dict[str, int] = field(default_factory=dict)
+    histograms: dict[str, Histogram] = field(default_factory=dict)
+    reservoir: int = 2048
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    _families: dict[str, tuple[str, dict[str, str]]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def inc(self, name: str, amount: int = 1, **labels: str) -> None:
+        key = _series(name, labels)
+        with self._lock:
+            self._families.setdefault(key, (name, labels))
+            self.counters[key] = self.counters.get(key, 0) + amount
 
-    def inc(self, name: str, amount: int = 1) -> None:
-        self.counters[name] = self.counters.get(name, 0) + amount
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = _series(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.reservoir)
+                self._families[key] = (name, labels)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Record the wall-clock seconds of the ``with`` block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
 
     def snapshot(self) -> dict[str, int]:
-        return dict(self.counters)
+        with self._lock:
+            return dict(self.counters)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {key: h.summary() for key, h in self.histograms.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format: counters, and histograms as summaries."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, h.summary()) for key, h in self.histograms.items())
+            families = dict(self._families)
+
+        lines: list[str] = []
+        typed: set[str] = set()
+        for key, value in counters:
+            name, labels = families[key]
+            name = _metric_name(name)
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{_series(name, labels)} {value}")
+        for key, summary in summaries:
+            name, labels = families[key]
+            name = _metric_name(name)
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} summary")
+            for q in QUANTILES:
+                quantile_labels = {**labels, "quantile": f"{q:g}"}
+                lines.append(
+                    f"{_series(name, quantile_labels)} {summary[f'p{round(q * 100)}']:.6g}"
+                )
+            lines.append(f"{_series(name + '_sum', labels)} {summary['sum']:.6g}")
+            lines.append(f"{_series(name + '_count', labels)} {summary['count']}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self._families.clear()
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times chat model and tool runs into a MetricCollector via LangChain callbacks.
+
+    Records ``llm_call_seconds{model, role}`` (role comes from a ROLE_TAGS tag),
+    ``tool_seconds{tool}`` and ``tool_errors_total{tool}`` / ``llm_errors_total``.
+    """
+
+    def __init__(self, metrics: MetricCollector) -> None:
+        self.metrics = metrics
+        self._started: dict[UUID, tuple[float, str, dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str, labels: dict[str, str]) -> None:
+        with self._lock:
+            self._started[run_id] = (time.perf_counter(), name, labels)
+
+    def _finish(self, run_id: UUID, error_counter: str | None = None) -> None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, name, labels = started
+        self.metrics.observe(name, time.perf_counter() - start, **labels)
+        if error_counter:
+            self.metrics.inc(error_counter, **labels)
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, tags=None, metadata=None, **kwargs: Any
+    ) -> None:
+        labels = {"model": str((metadata or {}).get("ls_model_name", "unknown"))}
+        role = next((tag for tag in tags or () if tag in ROLE_TAGS), None)
+        if role:
+            labels["role"] = role
+        self._start(run_id, "llm_call_seconds", labels)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "llm_errors_total")
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, "tool_seconds", {"tool": str((serialized or {}).get("name", "unknown"))})
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "tool_errors_total")
+
+
+_metrics = MetricCollector()
+
+
+def get_metrics() -> MetricCollector:
+    """Process-wide collector used when a ToolRegistry is not given its own."""
+    return _metrics
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate
+
+
+def _line_starts(data: str | bytes) -> array:
+    """Offsets (in ``data``'s own units) at which each line starts."""
+    newline = "\n" if isinstance(data, str) else b"\n"
+    starts = array("Q", [0])
+    starts.extend(accumulate(len(line) + 1 for line in data.split(newline)[:-1]))
+    if starts[-1] == len(data):
+        starts.pop()  # nothing after the final newline (or an empty blob)
+    return starts
+
+
+@dataclass
+class _Blob:
+    size: int  # UTF-8 bytes
+    refs: int
+    text: str | None = None  # in memory
+    mapped: mmap.mmap | None = None  # spilled to a temp file
+    # Line start offsets, in characters of ``text`` or bytes of ``mapped``
+    # (the same for ASCII), so a line range is a single slice.
+    lines: array | None = None
+
+    @property
+    def ascii(self) -> bool:
+        return self.text is not None and len(self.text) == self.size
+
+    def slice(self, start: int, end: int | None) -> str:
+        if self.text is not None:
+            return self.text[start:end]
+        return str(memoryview(self.mapped)[start:end], "utf-8")
+
+
+class BlobStore:
+    """Reference-counted, content-addressed text blobs with a memory cap.
+
+    Identical content is stored once under its SHA-256. When the in-memory
+    blobs exceed ``max_memory_bytes``, the largest ones (of at least
+    ``spill_min_bytes``) are written to anonymous temp files and memory-mapped,
+    so their pages can be dropped by the OS instead of growing the heap.
+    ``view`` exposes a spilled blob without copying it.
+
+    Each blob carries a line-start index built once when it is stored, so
+    ``read_lines`` and (for ASCII or spilled blobs) ``read_byte_range`` cost
+    O(range) rather than O(blob).
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int | None = None,
+        spill_min_bytes: int | None = None,
+        spill_dir: str | None = None,
+    ) -> None:
+        if max_memory_bytes is None:
+            max_memory_bytes = int(float(os.getenv("VFS_MEMORY_LIMIT_MB", "256")) * 1024 * 1024)
+        if spill_min_bytes is None:
+            spill_min_bytes = int(float(os.getenv("VFS_SPILL_MIN_KB", "64")) * 1024)
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_min_bytes = max(1, spill_min_bytes)
+        self.spill_dir = spill_dir or os.getenv("VFS_SPILL_DIR") or None
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self._blobs: dict[str, _Blob] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def put(self, text: str) -> str:
+        """Store ``text`` (or add a reference to an identical blob); returns its digest."""
+        data = text.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            blob = self._blobs.get(digest)
+            if blob is not None:
+                blob.refs += 1
+                return digest
+            self._blobs[digest] = _Blob(size=len(data), refs=1, text=text, lines=_line_starts(text))
+            self.memory_bytes += len(data)
+            if self.memory_bytes > self.max_memory_bytes:
+                self._spill()
+        return digest
+
+    def get(self, digest: str) -> str:
+        with self._lock:
+            blob = self._blobs[digest]
+            if blob.text is not None:
+                return blob.text
+            return str(memoryview(blob.mapped), "utf-8")
+
+    def view(self, digest: str) -> memoryview:
+        """UTF-8 bytes of the blob; zero-copy for spilled blobs."""
+        with self._lock:
+            blob = self._blobs[digest]
+            if blob.mapped is not None:
+                return memoryview(blob.mapped).toreadonly()
+            return memoryview(blob.text.encode()).toreadonly()
+
+    def read_lines(self, digest: str, offset: int = 0, limit: int | None = None) -> str:
+        """Lines ``offset`` to ``offset + limit`` (0-based), newlines included."""
+        with self._lock:
+            blob = self._blobs[digest]
+            starts = blob.lines
+            offset = max(0, offset)
+            if offset >= len(starts):
+                return ""
+            stop = len(starts) if limit is None else offset + max(0, limit)
+            end = starts[stop] if stop < len(starts) else None
+            return blob.slice(starts[offset], end)
+
+    def read_byte_range(self, digest: str, offset: int = 0, limit: int | None = None) -> str:
+        """UTF-8 bytes ``offset`` to ``offset + limit``; characters cut at the edges are dropped."""
+        with self._lock:
+            blob = self._blobs[digest]
+            offset = max(0, offset)
+            end = blob.size if limit is None else min(blob.size, offset + max(0, limit))
+            if offset >= end:
+                return ""
+            if blob.ascii:
+                return blob.text[offset:end]
+            raw = memoryview(blob.mapped) if blob.mapped is not None else blob.text.encode()
+            return str(raw[offset:end], "utf-8", "ignore")
+
+    def size(self, digest: str) -> int:
+        return self._blobs[digest].size
+
+    def line_count(self, digest: str) -> int:
+        return len(self._blobs[digest].lines)
+
+    def is_spilled(self, digest: str) -> bool:
+        return self._blobs[digest].mapped is not None
+
+    def release(self, digest: str) -> bool:
+        """Drop one reference; returns True if that freed the blob."""
+        with self._lock:
+            blob = self._blobs[digest]
+            blob.refs -= 1
+            if blob.refs > 0:
+                return False
+            del self._blobs[digest]
+            if blob.mapped is None:
+                self.memory_bytes -= blob.size
+                return True
+            self.spilled_bytes -= blob.size
+            try:
+                blob.mapped.close()
+            except BufferError:
+                pass  # a view is still alive; the mapping goes with it
+            return True
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "memory_bytes": self.memory_bytes,
+                "spilled_bytes": self.spilled_bytes,
+            }
+
+    def _spill(self) -> None:
+        candidates = sorted(
+            (b for b in self._blobs.values() if b.text is not None and b.size >= self.spill_min_bytes),
+            key=lambda b: b.size,
+            reverse=True,
+        )
+        for blob in candidates:
+            if self.memory_bytes <= self.max_memory_bytes:
+                break
+            # The file is already unlinked; the mapping keeps its pages reachable.
+            data = blob.text.encode()
+            with tempfile.TemporaryFile(dir=self.spill_dir) as handle:
+                handle.write(data)
+                handle.flush()
+                blob.mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if not blob.ascii:
+                blob.lines = _line_starts(data)  # re-index in bytes
+            blob.text = None
+            self.memory_bytes -= blob.size
+            self.spilled_bytes += blob.size
@@ -1,27 +1,147 @@
 from __future__ import annotations
+import atexit
+import hashlib
+import os
 import subprocess
-import sys
 import textwrap
+import threading
 from langchain_core.tools import tool
+from tools.code_workers import (
+    CodeWorkerPool,
+    ExecLimits,
+    ExecResult,
+    finish_capture,
+    limited_command,
+    start_capture,
+)
+from tools.file_tools import VirtualFS
 
+CODE_TIMEOUT_SECONDS = 30
+OUTPUT_PATH_TEMPLATE = "outputs/exec-{digest}.txt"
+
+_default_pool: CodeWorkerPool | None = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_limits() -> ExecLimits:
+    """Per-job limits from CODE_OUTPUT_MAX_BYTES, CODE_OUTPUT_SPILL_MAX_MB,
+    CODE_MEMORY_LIMIT_MB and CODE_CPU_LIMIT_SECONDS (0 disables each;
+    with CODE_OUTPUT_MAX_BYTES 0 all output is returned)."""
+    return ExecLimits(
+        max_output_bytes=int(os.getenv("CODE_OUTPUT_MAX_BYTES", "16384")),
+        spill_max_bytes=int(float(os.getenv("CODE_OUTPUT_SPILL_MAX_MB", "16")) * 1024 * 1024),
+        memory_limit_mb=int(os.getenv("CODE_MEMORY_LIMIT_MB", "2048")),
+        cpu_limit_seconds=int(os.getenv("CODE_CPU_LIMIT_SECONDS", str(CODE_TIMEOUT_SECONDS))),
+    )
+
+
+def get_default_pool() -> CodeWorkerPool | None:
+    """Return the process-wide warm worker pool, or None if pooling is disabled.
+
+    Configured by CODE_WORKERS (pool size, 0 disables), CODE_WORKER_PRELOAD
+    (comma-separated modules to pre-import), CODE_WORKER_MAX_JOBS and
+    CODE_WORKER_MAX_RSS_MB (recycling thresholds); job limits come from
+    ``get_default_limits``.
+    """
+    global _default_pool
+    if not hasattr(os, "fork"):
+        return None
+    size = int(os.getenv("CODE_WORKERS", "2"))
+    if size < 1:
+        return None
+    with _default_pool_lock:
+        if _default_pool is None:
+            preload = [m.strip() for m in os.getenv("CODE_WORKER_PRELOAD", "").split(",") if m.strip()]
+            _default_pool = CodeWorkerPool(
+                size=size,
+                preload=preload,
+                max_jobs_per_worker=int(os.getenv("CODE_WORKER_MAX_JOBS", "100")),
+                max_rss_mb=int(os.getenv("CODE_WORKER_MAX_RSS_MB", "512")),
+                timeout=CODE_TIMEOUT_SECONDS,
+                limits=get_default_limits(),
+            )
+            _default_pool.warm()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def _run_in_subprocess(code: str, limits: ExecLimits | None = None) -> ExecResult:
+    limits = limits or get_default_limits()
+    proc = subprocess.Popen(
+        limited_command(code, limits),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+        start_new_session=True,
+    )
+    stdout = start_capture(proc.stdout, limits)
+    stderr = start_capture(proc.stderr, limits)
+    timed_out = False
+    try:
+        proc.wait(timeout=CODE_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        proc.kill()
+        proc.wait()
+    stdout_text, stdout_spill = finish_capture(*stdout)
+    stderr_text, stderr_spill = finish_capture(*stderr)
+    if timed_out:
+        for path in (stdout_spill, stderr_spill):
+            if path:
+                os.unlink(path)
+        return ExecResult(stdout="", stderr="", returncode=-1, timed_out=True)
+    return ExecResult(
+        stdout=stdout_text,
+        stderr=stderr_text,
+        returncode=proc.returncode,
+        stdout_spill=stdout_spill,
+        stderr_spill=stderr_spill,
+    )
+
+
+def _save_full_output(result: ExecResult, fs: VirtualFS | None) -> str | None:
+    """Move spilled output into ``fs``; returns its path, or None without a spill."""
+    streams = []
+    for label, path in (("", result.stdout_spill), ("STDERR:\n", result.stderr_spill)):
+        if not path:
+            continue
+        try:
+            with open(path, "rb") as handle:
+                streams.append(label + handle.read().decode("utf-8", errors="replace"))
+        finally:
+            os.unlink(path)
+    if not streams or fs is None:
+        return None
+    content = "\n".join(streams)
+    path = OUTPUT_PATH_TEMPLATE.format(digest=hashlib.sha256(content.encode()).hexdigest()[:12])
+    fs.write(path, content)
+    return path
+
+
+def make_code_tools(pool: CodeWorkerPool | None = None, fs: VirtualFS | None = None) -> list:
+    """Build execute_code. With ``fs``, output that was cut down is kept there in full."""
 
-def make_code_tools() -> list:
     @tool
     def execute_code(code: str) -> str:
         """Write and execute Python code. Returns stdout + stderr. CodeAct style."""
         try:
-            result = subprocess.run(
-                [sys.executable, "-c", textwrap.dedent(code)],
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
+            worker_pool = pool or get_default_pool()
+            source = textwrap.dedent(code)
+            if worker_pool is not None:
+                result = worker_pool.run(source)
+                timeout = worker_pool.timeout
+            else:
+                result = _run_in_subprocess(source)
+                timeout = CODE_TIMEOUT_SECONDS
+            full_output = _save_full_output(result, None if result.timed_out else fs)
+            if result.timed_out:
+                return f"Error: code execution timed out ({timeout:g}s limit)"
             output = result.stdout
             if result.stderr:
                 output += f"\nSTDERR:\n{result.stderr}"
+            if full_output:
+                output += f"\n\n[Full output: {full_output}]"
             return output or "(no output)"
-        except subprocess.TimeoutExpired:
-            return "Error: code execution timed out (30s limit)"
         except Exception as e:
             return f"Error: {e}"
 
@@ -0,0 +1,473 @@
+"""
+Warm worker pool for execute_code.
+
+Each worker is a long-lived "zygote" interpreter that pre-imports a configurable
+set of modules and then forks a fresh child per job, so jobs start warm but
+never share state. The zygote enforces the per-job timeout and reports its own
+peak RSS; the pool recycles a worker after a number of jobs or once that RSS
+crosses a threshold.
+
+Job output is read from pipes as it is produced and kept bounded (head and
+tail of each stream, see ``OutputCapture``); memory and CPU rlimits apply to
+every job process.
+
+This file doubles as the zygote entry point (``python code_workers.py mod ...``)
+and therefore only imports the standard library.
+"""
+from __future__ import annotations
+import atexit
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+from dataclasses import asdict, dataclass
+from typing import BinaryIO
+
+READ_CHUNK_BYTES = 65536
+
+
+@dataclass
+class ExecResult:
+    stdout: str
+    stderr: str
+    returncode: int
+    timed_out: bool = False
+    # Temp files holding a truncated stream in full (up to ExecLimits.spill_max_bytes).
+    # The caller owns them and must delete them.
+    stdout_spill: str | None = None
+    stderr_spill: str | None = None
+
+
+@dataclass
+class ExecLimits:
+    """Per-job bounds. A value of 0 disables the corresponding limit (or spilling)."""
+
+    max_output_bytes: int = 16384
+    spill_max_bytes: int = 16 * 1024 * 1024
+    memory_limit_mb: int = 2048
+    cpu_limit_seconds: int = 30
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+# --------------------------------------------------------------------------- #
+# Job process side (shared by the zygote and the plain subprocess path)
+# --------------------------------------------------------------------------- #
+
+
+class OutputCapture:
+    """Bounded capture of one output stream.
+
+    Keeps the first and last ``max_bytes // 2`` bytes and only counts what lies
+    between; ``max_bytes`` 0 keeps everything. With a ``spill`` file the whole
+    stream is also written there, up to ``spill_max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int, spill: BinaryIO | None = None, spill_max_bytes: int = 0) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self.total = 0
+        self.spill = spill
+        self.spill_max_bytes = spill_max_bytes
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spilled = 0
+
+    @property
+    def truncated(self) -> bool:
+        return 0 < self.max_bytes < self.total
+
+    def feed(self, data: bytes) -> None:
+        self.total += len(data)
+        if self.spill is not None and self._spilled < self.spill_max_bytes:
+            chunk = data[: self.spill_max_bytes - self._spilled]
+            self.spill.write(chunk)
+            self._spilled += len(chunk)
+        if not self.max_bytes:
+            self._head += data
+            return
+        room = self.max_bytes // 2 - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail += data
+            keep = self.max_bytes - self.max_bytes // 2
+            if len(self._tail) > 2 * keep + READ_CHUNK_BYTES:
+                del self._tail[: len(self._tail) - keep]
+
+    def text(self) -> str:
+        keep = self.max_bytes - self.max_bytes // 2
+        if not self.truncated:
+            return (bytes(self._head) + bytes(self._tail)).decode("utf-8", errors="replace")
+        tail = bytes(self._tail[len(self._tail) - keep:]) if keep else b""
+        omitted = self.total - len(self._head) - len(tail)
+        return (
+            bytes(self._head).decode("utf-8", errors="replace")
+            + f"\n... [{omitted} bytes of output omitted] ...\n"
+            + tail.decode("utf-8", errors="replace")
+        )
+
+
+def apply_limits(limits: ExecLimits) -> None:
+    """Set address-space and CPU rlimits for the current (job) process."""
+    import resource
+
+    wanted = []
+    if limits.memory_limit_mb > 0:
+        size = limits.memory_limit_mb * 1024 * 1024
+        wanted.append((resource.RLIMIT_AS, (size, size)))
+    if limits.cpu_limit_seconds > 0:
+        # The soft limit sends SIGXCPU, the hard one SIGKILL a second later.
+        wanted.append((resource.RLIMIT_CPU, (limits.cpu_limit_seconds, limits.cpu_limit_seconds + 1)))
+    for which, value in wanted:
+        try:
+            resource.setrlimit(which, value)
+        except (ValueError, OSError):
+            pass  # above the inherited hard limit; keep that one
+
+
+# Applies the job's rlimits, then execs the job itself so it runs exactly like
+# ``python -c`` (rlimits survive exec). argv: this directory, limits, code.
+_LIMITS_PRELUDE = """\
+import json, os, sys
+sys.path.insert(0, sys.argv[1])
+from code_workers import ExecLimits, apply_limits
+apply_limits(ExecLimits(**json.loads(sys.argv[2])))
+os.execv(sys.executable, [sys.executable, "-c", sys.argv[3]])
+"""
+
+
+def limited_command(code: str, limits: ExecLimits) -> list[str]:
+    """argv that runs ``code`` like ``python -c`` under ``limits``.
+
+    The rlimits are set by a short prelude in the child rather than by a
+    ``preexec_fn``, which is not safe in a parent that runs threads.
+    """
+    if os.name != "posix":
+        return [sys.executable, "-c", code]
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [sys.executable, "-c", _LIMITS_PRELUDE, here, json.dumps(asdict(limits)), code]
+
+
+def start_capture(stream: BinaryIO, limits: ExecLimits) -> tuple[OutputCapture, threading.Thread]:
+    """Read ``stream`` to EOF on a thread into a new OutputCapture."""
+    spill = None
+    if limits.spill_max_bytes > 0 and limits.max_output_bytes > 0:
+        spill = tempfile.NamedTemporaryFile(prefix="execute_code-", suffix=".out", delete=False)
+    capture = OutputCapture(limits.max_output_bytes, spill, limits.spill_max_bytes)
+
+    def pump() -> None:
+        with stream:
+            while chunk := stream.read(READ_CHUNK_BYTES):
+                capture.feed(chunk)
+
+    thread = threading.Thread(target=pump, daemon=True)
+    thread.start()
+    return capture, thread
+
+
+def finish_capture(capture: OutputCapture, thread: threading.Thread) -> tuple[str, str | None]:
+    """Wait for the reader; return the bounded text and the spill path if it was truncated."""
+    # Output a killed job's escaped grandchildren still hold open is not waited for.
+    thread.join(timeout=1.0)
+    spill = capture.spill
+    if spill is None:
+        return capture.text(), None
+    spill.close()
+    if capture.truncated and not thread.is_alive():
+        return capture.text(), spill.name
+    os.unlink(spill.name)
+    return capture.text(), None
+
+
+# --------------------------------------------------------------------------- #
+# Zygote side
+# --------------------------------------------------------------------------- #
+
+
+def _exec_user_code(code: str) -> int:
+    """Run ``code`` the way ``python -c`` would and return the exit status."""
+    sys.argv = ["-c"]
+    main_module = types.ModuleType("__main__")
+    sys.modules["__main__"] = main_module
+    status = 0
+    try:
+        exec(compile(code, "<string>", "exec"), main_module.__dict__)
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        # Drop this function's frame so the traceback reads like ``python -c``.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    # The caller ends with os._exit, so finish like the interpreter would:
+    # wait for non-daemon threads, then run the atexit handlers.
+    try:
+        threading._shutdown()
+    except BaseException:
+        pass
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return status
+
+
+def _wait_for_child(pid: int, timeout: float) -> tuple[int, int] | None:
+    """Wait up to ``timeout`` seconds; return (status, peak_rss_kb) or None on timeout."""
+    deadline = time.monotonic() + timeout
+    if hasattr(os, "pidfd_open"):
+        pidfd = os.pidfd_open(pid)
+        try:
+            ready, _, _ = select.select([pidfd], [], [], timeout)
+        finally:
+            os.close(pidfd)
+        if not ready:
+            return None
+        _, status, usage = os.wait4(pid, 0)
+        return status, usage.ru_maxrss
+    delay = 0.001
+    while True:
+        waited, status, usage = os.wait4(pid, os.WNOHANG)
+        if waited:
+            return status, usage.ru_maxrss
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.02)
+
+
+def _run_job(job: dict, protocol_fds: tuple[int, ...]) -> dict:
+    limits = ExecLimits(**job["limits"])
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.setsid()
+            for fd in (*protocol_fds, out_r, err_r):
+                os.close(fd)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            os.close(out_w)
+            os.close(err_w)
+            apply_limits(limits)
+            status = _exec_user_code(job["code"])
+        finally:
+            os._exit(status)
+
+    os.close(out_w)
+    os.close(err_w)
+    stdout = start_capture(os.fdopen(out_r, "rb", buffering=0), limits)
+    stderr = start_capture(os.fdopen(err_r, "rb", buffering=0), limits)
+
+    waited = _wait_for_child(pid, job["timeout"])
+    timed_out = waited is None
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        _, status, usage = os.wait4(pid, 0)
+        child_rss_kb = usage.ru_maxrss
+    else:
+        status, child_rss_kb = waited
+
+    stdout_text, stdout_spill = finish_capture(*stdout)
+    stderr_text, stderr_spill = finish_capture(*stderr)
+    return {
+        "stdout": stdout_text,
+        "stderr": stderr_text,
+        "returncode": os.waitstatus_to_exitcode(status),
+        "timed_out": timed_out,
+        "stdout_spill": stdout_spill,
+        "stderr_spill": stderr_spill,
+        "child_rss_kb": child_rss_kb,
+    }
+
+
+def _zygote_main(preload: list[str]) -> None:
+    import resource
+
+    for name in preload:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+    # Keep private copies of the protocol pipes, then point fds 0/1 at
+    # /dev/null so nothing a job does can corrupt the protocol stream.
+    proto_in = os.fdopen(os.dup(0), "r")
+    proto_out = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    protocol_fds = (proto_in.fileno(), proto_out.fileno())
+
+    for line in proto_in:
+        reply = _run_job(json.loads(line), protocol_fds)
+        reply["worker_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        proto_out.write(json.dumps(reply) + "\n")
+        proto_out.flush()
+
+
+# --------------------------------------------------------------------------- #
+# Pool side
+# --------------------------------------------------------------------------- #
+
+
+class _Worker:
+    def __init__(self, preload: tuple[str, ...]) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.jobs = 0
+        self.rss_kb = 0
+
+    def run(self, code: str, timeout: float, limits: ExecLimits) -> ExecResult:
+        job = {"code": code, "timeout": timeout, "limits": asdict(limits)}
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+        # The zygote enforces the job timeout itself; this guard only catches a
+        # zygote that has stopped responding.
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout + 10)
+        line = self.proc.stdout.readline() if ready else ""
+        if not line:
+            raise WorkerCrashed("code worker stopped responding")
+        reply = json.loads(line)
+        self.jobs += 1
+        self.rss_kb = reply["worker_rss_kb"]
+        return ExecResult(
+            stdout=reply["stdout"],
+            stderr=reply["stderr"],
+            returncode=reply["returncode"],
+            timed_out=reply["timed_out"],
+            stdout_spill=reply["stdout_spill"],
+            stderr_spill=reply["stderr_spill"],
+        )
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class CodeWorkerPool:
+    """Pool of warm zygote workers that each fork an isolated child per job."""
+
+    def __init__(
+        self,
+        size: int = 2,
+        preload: tuple[str, ...] | list[str] = (),
+        max_jobs_per_worker: int = 100,
+        max_rss_mb: int = 512,
+        timeout: float = 30.0,
+        limits: ExecLimits | None = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.preload = tuple(preload)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.timeout = timeout
+        self.limits = limits or ExecLimits()
+        self._idle: queue.LifoQueue[_Worker] = queue.LifoQueue()
+        self._spawned = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def warm(self) -> None:
+        """Start every worker now so the first jobs don't pay interpreter startup."""
+        with self._lock:
+            while self._spawned < self.size:
+                self._idle.put(_Worker(self.preload))
+                self._spawned += 1
+
+    def run(self, code: str) -> ExecResult:
+        worker = self._acquire()
+        try:
+            result = worker.run(code, self.timeout, self.limits)
+        except (WorkerCrashed, OSError, ValueError) as e:
+            self._replace(worker)
+            return ExecResult(stdout="", stderr=f"{e}", returncode=-1)
+        if self._should_recycle(worker):
+            self._replace(worker)
+        else:
+            self._release(worker)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._spawned = 0
+
+    def _acquire(self) -> _Worker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("code worker pool is closed")
+            if self._spawned < self.size:
+                self._spawned += 1
+                return _Worker(self.preload)
+        return self._idle.get()
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        return (
+            worker.jobs >= self.max_jobs_per_worker
+            or worker.rss_kb > self.max_rss_mb * 1024
+        )
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            if not self._closed:
+                self._idle.put(worker)
+                return
+        worker.close()
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.close()
+        with self._lock:
+            if self._closed:
+                return
+            # Popen returns immediately; the replacement warms up in the background.
+            self._idle.put(_Worker(self.preload))
+
+
+if __name__ == "__main__":
+    _zygote_main(sys.argv[1:])
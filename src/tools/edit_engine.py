@@ -0,0 +1,163 @@
+from __future__ import annotations
+import re
+from difflib import SequenceMatcher
+
+
+class EditError(ValueError):
+    pass
+
+
+def _validate(edits: list[dict]) -> None:
+    for idx, op in enumerate(edits):
+        if not isinstance(op, dict) or "find" not in op or "replace" not in op:
+            raise EditError(f"edit {idx} must have 'find' and 'replace'")
+        if not op["find"]:
+            raise EditError(f"edit {idx} has an empty 'find'")
+        count = op.get("count")
+        if count is not None and (not isinstance(count, int) or count < 0):
+            raise EditError(f"edit {idx} has an invalid 'count'")
+
+
+def _window(text: str, op: dict) -> tuple[int, int]:
+    """Span of ``text`` an op may match in, narrowed by its 'after'/'before' anchors.
+
+    Returns an empty span if an anchor is missing.
+    """
+    lo, hi = 0, len(text)
+    if op.get("after"):
+        found = text.find(op["after"])
+        if found < 0:
+            return 0, 0
+        lo = found + len(op["after"])
+    if op.get("before"):
+        found = text.find(op["before"], lo)
+        if found < 0:
+            return 0, 0
+        hi = found
+    return lo, hi
+
+
+def apply_edits(text: str, edits: list[dict]) -> tuple[str, list[int]]:
+    """Apply every find/replace in one left-to-right pass over ``text``.
+
+    All ops match against the original text. At each position the earliest op
+    in the list wins and matches never overlap, so one op's replacement is
+    never re-matched by another. Optional per-op keys:
+
+    - ``count``: replace at most this many occurrences.
+    - ``after`` / ``before``: only match after the first occurrence of
+      ``after`` and before the next occurrence of ``before``.
+
+    Returns the new text and the number of replacements made per op.
+    """
+    _validate(edits)
+    counts = [0] * len(edits)
+    remaining = [op.get("count") for op in edits]
+    windows = [_window(text, op) for op in edits]
+
+    def live_ops(pos: int) -> list[int]:
+        return [
+            i for i in range(len(edits))
+            if remaining[i] != 0 and windows[i][1] > pos
+        ]
+
+    def compile_ops(ops: list[int]):
+        # Named groups tell us which op matched; alternation order is priority.
+        if not ops:
+            return None
+        return re.compile(
+            "|".join(f"(?P<e{i}>{re.escape(edits[i]['find'])})" for i in ops)
+        )
+
+    def eligible(i: int, start: int) -> bool:
+        lo, hi = windows[i]
+        return (
+            remaining[i] != 0
+            and lo <= start
+            and start + len(edits[i]["find"]) <= hi
+        )
+
+    ops = live_ops(0)
+    pattern = compile_ops(ops)
+    pieces: list[str] = []
+    copied = 0
+    pos = 0
+    while pattern is not None:
+        match = pattern.search(text, pos)
+        if match is None:
+            break
+        start = match.start()
+        winner = int(match.lastgroup[1:])
+        if not eligible(winner, start):
+            # The regex winner is out of its window or used up; fall back to the
+            # next op in priority order that matches here.
+            winner = next(
+                (i for i in ops if eligible(i, start) and text.startswith(edits[i]["find"], start)),
+                -1,
+            )
+        if winner < 0:
+            pos = start + 1
+        else:
+            end = start + len(edits[winner]["find"])
+            pieces.append(text[copied:start])
+            pieces.append(edits[winner]["replace"])
+            copied = pos = end
+            counts[winner] += 1
+            if remaining[winner] is not None:
+                remaining[winner] -= 1
+        still_live = live_ops(pos)
+        if still_live != ops:
+            ops = still_live
+            pattern = compile_ops(ops)
+    pieces.append(text[copied:])
+    return "".join(pieces), counts
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(old: str, new: str, path: str = "", context: int = 3) -> str:
+    """Unified diff of ``old`` -> ``new`` with ``context`` lines around each hunk.
+
+    Common leading and trailing lines are trimmed before matching, so the cost
+    tracks the size of the change rather than the size of the file.
+    """
+    a = old.splitlines()
+    b = new.splitlines()
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    if prefix == len(a) == len(b):
+        return ""
+
+    offset = max(0, prefix - context)
+    keep_suffix = max(0, suffix - context)
+    a_mid = a[offset:len(a) - keep_suffix]
+    b_mid = b[offset:len(b) - keep_suffix]
+
+    lines = [f"--- a/{path}", f"+++ b/{path}"]
+    matcher = SequenceMatcher(None, a_mid, b_mid, autojunk=False)
+    for group in matcher.get_grouped_opcodes(context):
+        i1, i2 = group[0][1] + offset, group[-1][2] + offset
+        j1, j2 = group[0][3] + offset, group[-1][4] + offset
+        lines.append(f"@@ -{_format_range(i1, i2)} +{_format_range(j1, j2)} @@")
+        for tag, ai1, ai2, bj1, bj2 in group:
+            if tag == "equal":
+                lines.extend(f" {line}" for line in a_mid[ai1:ai2])
+                continue
+            if tag in ("replace", "delete"):
+                lines.extend(f"-{line}" for line in a_mid[ai1:ai2])
+            if tag in ("replace", "insert"):
+                lines.extend(f"+{line}" for line in b_mid[bj1:bj2])
+    return "\n".join(lines)
@@ -1,43 +1,236 @@
 from __future__ import annotations
+import fnmatch
+import re
+import threading
+from typing import Literal
 from langchain_core.tools import tool
+from tools.blob_store import BlobStore
+from tools.edit_engine import EditError, apply_edits, unified_diff
+from tools.search_index import TrigramIndex
+
+# Bounds on what grep_files / glob_files return, to keep tool results small.
+MAX_SEARCH_RESULTS = 50
+MAX_GLOB_RESULTS = 200
+MAX_SNIPPET_CHARS = 200
 
 
 class VirtualFS:
-    def __init__(self) -> None:
-        self._files: dict[str, str] = {}
+    """In-memory file store with change tracking.
+
+    Every mutation bumps a version counter and marks the path dirty, so state
+    sync can ship only what changed since the last ``pop_changes()`` instead of
+    copying every file. Paths map to digests in a content-addressed
+    ``BlobStore``: identical files are stored once, and above the store's
+    memory cap large files are spilled to memory-mapped temp files. A trigram
+    index over the blobs narrows ``grep`` to the files that can match.
+    """
+
+    def __init__(self, blobs: BlobStore | None = None) -> None:
+        self.blobs = blobs if blobs is not None else BlobStore()
+        self.index = TrigramIndex()
+        self._files: dict[str, str] = {}  # path -> digest
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def read(
+        self,
+        path: str,
+        offset: int = 0,
+        limit: int | None = None,
+        unit: Literal["lines", "bytes"] = "lines",
+    ) -> str:
+        """Whole file, or ``limit`` lines (or UTF-8 bytes) starting at 0-based ``offset``."""
+        with self._lock:
+            digest = self._files.get(path)
+            if digest is None:
+                return f"Error: file '{path}' not found"
+            if unit == "bytes":
+                return self.blobs.read_byte_range(digest, offset, limit)
+            if offset == 0 and limit is None:
+                return self.blobs.get(digest)
+            return self.blobs.read_lines(digest, offset, limit)
 
-    def read(self, path: str) -> str:
-        return self._files.get(path, f"Error: file '{path}' not found")
+    def stat(self, path: str) -> dict:
+        with self._lock:
+            digest = self._files.get(path)
+            if digest is None:
+                return {"error": f"file '{path}' not found"}
+            return {
+                "path": path,
+                "size": self.blobs.size(digest),
+                "lines": self.blobs.line_count(digest),
+            }
+
+    def read_bytes(self, path: str) -> memoryview | None:
+        """UTF-8 view of a file, without copying it if it has been spilled; None if missing."""
+        with self._lock:
+            digest = self._files.get(path)
+            return self.blobs.view(digest) if digest is not None else None
 
     def write(self, path: str, content: str) -> dict:
-        self._files[path] = content
+        with self._lock:
+            self._set(path, content)
         return {"path": path, "bytes_written": len(content.encode())}
 
     def edit(self, path: str, edits: list[dict] | str) -> dict:
-        if path not in self._files:
-            return {"error": f"file '{path}' not found"}
-        old = self._files[path]
-        if isinstance(edits, str):
-            self._files[path] = edits
-            diff = f"- {old}\n+ {edits}"
-        else:
-            content = old
-            for op in edits:
-                content = content.replace(op["find"], op["replace"])
-            self._files[path] = content
-            diff = f"- {old}\n+ {content}"
-        return {"path": path, "diff": diff}
+        with self._lock:
+            if path not in self._files:
+                return {"error": f"file '{path}' not found"}
+            old = self.blobs.get(self._files[path])
+            result: dict = {"path": path}
+            if isinstance(edits, str):
+                content = edits
+            else:
+                try:
+                    content, result["matches"] = apply_edits(old, edits)
+                except EditError as e:
+                    return {"error": str(e)}
+            if content != old:
+                self._set(path, content)
+        result["diff"] = unified_diff(old, content, path)
+        return result
+
+    def delete(self, path: str) -> dict:
+        with self._lock:
+            if path not in self._files:
+                return {"error": f"file '{path}' not found"}
+            self._release(self._files.pop(path))
+            self._mark(path)
+        return {"path": path, "deleted": True}
+
+    def restore(self, files: dict[str, str]) -> None:
+        """Replace all contents with ``files`` (e.g. from a checkpoint) without marking them dirty."""
+        with self._lock:
+            digests = {path: self.blobs.put(content) for path, content in files.items()}
+            for digest in digests.values():
+                self.index.add(digest)
+            for digest in self._files.values():
+                self._release(digest)
+            self._files = digests
+            self._dirty.clear()
+            self.version += 1
+
+    def glob(self, pattern: str, max_results: int = MAX_GLOB_RESULTS) -> dict:
+        """Sorted paths matching a shell-style ``pattern`` (``*`` also crosses ``/``)."""
+        match = re.compile(fnmatch.translate(pattern)).match
+        with self._lock:
+            paths = sorted(path for path in self._files if match(path))
+        return {"paths": paths[:max_results], "truncated": len(paths) > max_results}
+
+    def grep(
+        self,
+        pattern: str,
+        path_glob: str | None = None,
+        ignore_case: bool = False,
+        max_results: int = MAX_SEARCH_RESULTS,
+    ) -> dict:
+        """Lines matching the regex ``pattern``, as {"path", "line", "text"} (1-based lines).
+
+        At most one match per line and ``max_results`` overall; long lines are cut to
+        MAX_SNIPPET_CHARS around the match.
+        """
+        try:
+            regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            return {"error": f"invalid pattern: {e}"}
+        in_scope = re.compile(fnmatch.translate(path_glob)).match if path_glob else None
+        self.index.refresh(self.blobs.get)
+        candidates = self.index.candidates(pattern)
+        with self._lock:
+            files = sorted(
+                (path, digest) for path, digest in self._files.items()
+                if (candidates is None or digest in candidates)
+                and (in_scope is None or in_scope(path))
+            )
+
+        matches: list[dict] = []
+        for path, digest in files:
+            try:
+                text = self.blobs.get(digest)
+            except KeyError:
+                continue  # deleted since the listing
+            line_no, last, last_line = 1, 0, 0
+            for found in regex.finditer(text):
+                line_no += text.count("\n", last, found.start())
+                last = found.start()
+                if line_no == last_line:
+                    continue
+                last_line = line_no
+                if len(matches) == max_results:
+                    return {"matches": matches, "truncated": True}
+                matches.append({"path": path, "line": line_no, "text": _snippet(text, found)})
+        return {"matches": matches, "truncated": False}
 
     def snapshot(self) -> dict[str, str]:
-        """Return a copy of all virtual files for state synchronization."""
-        return dict(self._files)
+        """Return a copy of all virtual files for state synchronization.
+
+        Spilled files are read back into memory; prefer ``pop_changes()``.
+        """
+        with self._lock:
+            return {path: self.blobs.get(digest) for path, digest in self._files.items()}
+
+    def pop_changes(self) -> dict[str, str | None]:
+        """Return paths changed since the last call and clear the dirty set.
+
+        Deleted paths map to None.
+        """
+        with self._lock:
+            changes = {
+                path: self.blobs.get(self._files[path]) if path in self._files else None
+                for path in self._dirty
+            }
+            self._dirty.clear()
+        return changes
+
+    def _set(self, path: str, content: str) -> None:
+        digest = self.blobs.put(content)
+        old = self._files.get(path)
+        self._files[path] = digest
+        self.index.add(digest)
+        if old is not None:
+            self._release(old)
+        self._mark(path)
+
+    def _release(self, digest: str) -> None:
+        if self.blobs.release(digest):
+            self.index.discard(digest)
+
+    def _mark(self, path: str) -> None:
+        self.version += 1
+        self._dirty.add(path)
+
+
+def _snippet(text: str, found: re.Match) -> str:
+    start = text.rfind("\n", 0, found.start()) + 1
+    end = text.find("\n", found.end())
+    end = len(text) if end == -1 else end
+    if end - start > MAX_SNIPPET_CHARS:
+        start = max(start, found.start() - MAX_SNIPPET_CHARS // 4)
+        end = min(end, start + MAX_SNIPPET_CHARS)
+    return text[start:end].strip()
 
 
 def make_file_tools(fs: VirtualFS) -> list:
     @tool
-    def read_file(path: str) -> str:
-        """Read a file from the virtual file system."""
-        return fs.read(path)
+    def read_file(
+        path: str,
+        offset: int = 0,
+        limit: int | None = None,
+        unit: Literal["lines", "bytes"] = "lines",
+    ) -> str:
+        """Read a file from the virtual file system.
+
+        Reads the whole file by default. For large files, pass ``offset`` (0-based)
+        and ``limit`` to read only that many lines, or with unit="bytes" that many
+        UTF-8 bytes. Use stat_file first to get the size and line count.
+        """
+        return fs.read(path, offset, limit, unit)
+
+    @tool
+    def stat_file(path: str) -> dict:
+        """Return a virtual file's size in bytes and its number of lines."""
+        return fs.stat(path)
 
     @tool
     def write_file(path: str, content: str) -> dict:
@@ -46,7 +239,30 @@ def make_file_tools(fs: VirtualFS) -> list:
 
     @tool
     def edit_file(path: str, edits: list[dict] | str) -> dict:
-        """Edit a file: pass a list of find/replace dicts or a full replacement string."""
+        """Edit a file: pass a list of find/replace dicts or a full replacement string.
+
+        Each dict needs "find" and "replace"; optional "count" limits the number of
+        replacements and "after"/"before" restrict matches to the text between those
+        anchors. All edits are applied in one pass against the original content.
+        Returns a unified diff and the number of matches per edit.
+        """
         return fs.edit(path, edits)
 
-    return [read_file, write_file, edit_file]
+    @tool
+    def grep_files(
+        pattern: str, path_glob: str | None = None, ignore_case: bool = False
+    ) -> dict:
+        """Search virtual files for a regex and return matching lines.
+
+        Returns up to 50 {"path", "line", "text"} matches (lines are 1-based) and
+        whether the list was truncated. Narrow it with path_glob, e.g. "notes/*.md".
+        Follow up with read_file(path, offset=line - 1, limit=...) for context.
+        """
+        return fs.grep(pattern, path_glob, ignore_case)
+
+    @tool
+    def glob_files(pattern: str) -> dict:
+        """List virtual file paths matching a shell-style pattern such as "results/*.md"."""
+        return fs.glob(pattern)
+
+    return [read_file, stat_file, write_file, edit_file, grep_files, glob_files]
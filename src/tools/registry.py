@@ -1,24 +1,77 @@
 from __future__ import annotations
+import threading
+from typing import Callable
+from langchain_core.tools import BaseTool
 from tools.file_tools import VirtualFS, make_file_tools
 from tools.code_tools import make_code_tools
 from tools.web_tools import make_web_tools
+from context.memory import WorkingMemory
+from evaluation.metrics import MetricCollector, MetricsCallbackHandler, get_metrics
 
 
 class ToolRegistry:
-    def __init__(self, fs: VirtualFS) -> None:
+    """Tools by name, each built by its factory the first time it is requested.
+
+    Factories build a group of related tools at once (e.g. all web tools share
+    one set of clients and caches). Nothing a tool needs, such as an SDK or a
+    worker pool, is created until a subagent or the supervisor asks for it.
+    """
+
+    def __init__(self, fs: VirtualFS, metrics: MetricCollector | None = None) -> None:
         self._fs = fs
-        all_tools = (
-            make_file_tools(fs)
-            + make_code_tools()
-            + make_web_tools()
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # Shared by every tool here and by the supervisor/subagent models, so
+        # tool and LLM latencies land in the same collector.
+        self.metrics_handler = MetricsCallbackHandler(self.metrics)
+        # Facts learned by earlier subagents; task_tool retrieves the relevant ones.
+        self.memory = WorkingMemory()
+        self._tools: dict[str, BaseTool] = {}
+        self._factories: dict[str, Callable[[], list[BaseTool]]] = {}
+        self._lock = threading.Lock()
+        self.register_factory(
+            ["read_file", "stat_file", "write_file", "edit_file", "grep_files", "glob_files"],
+            lambda: make_file_tools(fs),
         )
-        self._tools = {t.name: t for t in all_tools}
+        self.register_factory(["execute_code"], lambda: make_code_tools(fs=fs))
+        self.register_factory(["search_internet", "web_scrape", "web_scrape_many"], make_web_tools)
+
+    def register_factory(self, names: list[str], factory: Callable[[], list[BaseTool]]) -> None:
+        """Register ``factory`` as the lazy source of the tools called ``names``."""
+        with self._lock:
+            for name in names:
+                self._factories[name] = factory
+
+    def register(self, tool: BaseTool) -> None:
+        tool.callbacks = [self.metrics_handler]
+        self._tools[tool.name] = tool
 
     def get_tools(self, names: list[str]):
-        return [self._tools[name] for name in names]  # raises KeyError if unknown
+        return [self._get(name) for name in names]  # raises KeyError if unknown
 
     def available_tools(self) -> list[str]:
-        return list(self._tools.keys())
+        return list(dict.fromkeys([*self._factories, *self._tools]))
+
+    def loaded_tools(self) -> list[str]:
+        """Names of the tools whose factories have already run."""
+        return list(self._tools)
 
     def artifacts(self) -> dict[str, str]:
         return self._fs.snapshot()
+
+    def write_artifact(self, path: str, content: str) -> None:
+        self._fs.write(path, content)
+
+    def artifact_changes(self) -> dict[str, str | None]:
+        """Files written or deleted (None) since the previous call."""
+        return self._fs.pop_changes()
+
+    def _get(self, name: str) -> BaseTool:
+        tool = self._tools.get(name)
+        if tool is not None:
+            return tool
+        factory = self._factories[name]
+        with self._lock:
+            if name not in self._tools:
+                for built in factory():
+                    self.register(built)
+        return self._tools[name]
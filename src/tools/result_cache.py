@@ -0,0 +1,173 @@
+from __future__ import annotations
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from utils.cache import LRUCache
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    disk_hits: int = 0
+    coalesced: int = 0
+
+
+class ResultCache:
+    """TTL cache for web tool results with request coalescing.
+
+    Lookups go to an in-memory LRU tier first, then to an optional SQLite file
+    that survives restarts. Concurrent misses for the same key share a single
+    upstream fetch. Values must be JSON-serializable when the disk tier is on.
+    Failed fetches are never cached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = 3600.0,
+        disk_path: str | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._memory: LRUCache[str, tuple[float, Any]] = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._ainflight: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._db: sqlite3.Connection | None = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Any | None:
+        """Return a fresh cached value or None, updating hit/miss counters."""
+        value = self._lookup(key)
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return value
+
+    def put(self, key: str, value: Any, ttl: float | None = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        self._memory.put(key, (expires_at, value))
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(value)),
+                )
+                self._db.commit()
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], ttl: float | None = None) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                self.stats.coalesced += 1
+                owner = False
+        if not owner:
+            return pending.result()
+        try:
+            # Another owner may have finished between our miss and taking the slot.
+            value = self._lookup(key)
+            if value is None:
+                value = fetch()
+                self.put(key, value, ttl)
+            pending.set_result(value)
+            return value
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_fetch(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float | None = None
+    ) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pending = self._ainflight.get((loop, key))
+            if pending is None:
+                pending = self._ainflight[(loop, key)] = loop.create_future()
+                owner = True
+            else:
+                self.stats.coalesced += 1
+                owner = False
+        if not owner:
+            return await asyncio.shield(pending)
+        try:
+            value = self._lookup(key)
+            if value is None:
+                value = await fetch()
+                self.put(key, value, ttl)
+            pending.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as e:
+            pending.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged.
+            pending.exception()
+            raise
+        finally:
+            with self._lock:
+                self._ainflight.pop((loop, key), None)
+
+    def invalidate(self, key: str) -> None:
+        self._memory.pop(key)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def _lookup(self, key: str) -> Any | None:
+        now = self._clock()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                return value
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] <= now:
+            return None
+        value = json.loads(row[1])
+        self._memory.put(key, (row[0], value))
+        with self._lock:
+            self.stats.disk_hits += 1
+        return value
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import hashlib
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from tools.result_cache import ResultCache
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref_src"}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of ``url`` used as the scrape cache key.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters (utm_*, fbclid, ...), and sorts the remaining query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _blob_key(digest: str) -> str:
+    return f"blob:{digest}"
+
+
+class ScrapeCache:
+    """Content-addressed cache for scraped pages.
+
+    A normalized URL maps to the SHA-256 of its markdown, and the markdown is
+    stored once per hash, so mirrors and duplicate pages share one copy.
+    Concurrent scrapes of the same URL are coalesced into one fetch.
+    """
+
+    def __init__(self, ttl: float = 86400.0, maxsize: int = 256, disk_path: str | None = None) -> None:
+        self.pages = ResultCache(maxsize=maxsize * 4, ttl=ttl, disk_path=disk_path)
+        self.blobs = ResultCache(maxsize=maxsize, ttl=ttl, disk_path=disk_path)
+
+    @property
+    def stats(self):
+        return self.pages.stats
+
+    def _store(self, content: str) -> str:
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        self.blobs.put(_blob_key(digest), content)
+        return digest
+
+    def get_or_fetch(self, url: str, fetch: Callable[[], str]) -> str:
+        key = f"url:{normalize_url(url)}"
+        digest = self.pages.get_or_fetch(key, lambda: self._store(fetch()))
+        content = self.blobs.get(_blob_key(digest))
+        if content is None:
+            # The blob was evicted before its URL entry; scrape again.
+            self.pages.invalidate(key)
+            digest = self.pages.get_or_fetch(key, lambda: self._store(fetch()))
+            content = self.blobs.get(_blob_key(digest))
+        return content
+
+    async def aget_or_fetch(self, url: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        key = f"url:{normalize_url(url)}"
+
+        async def fetch_and_store() -> str:
+            return self._store(await fetch())
+
+        digest = await self.pages.aget_or_fetch(key, fetch_and_store)
+        content = self.blobs.get(_blob_key(digest))
+        if content is None:
+            self.pages.invalidate(key)
+            digest = await self.pages.aget_or_fetch(key, fetch_and_store)
+            content = self.blobs.get(_blob_key(digest))
+        return content
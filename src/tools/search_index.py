@@ -0,0 +1,139 @@
+from __future__ import annotations
+import threading
+from typing import Callable
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse
+
+
+def _trigrams(text: str) -> frozenset[str]:
+    text = text.lower()
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def _literal_runs(parsed) -> list[str]:
+    """Literal strings every match of the parsed pattern must contain."""
+    runs: list[str] = []
+    current: list[str] = []
+    for op, arg in parsed:
+        if op is _sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        runs.append("".join(current))
+        current = []
+        if op is _sre_parse.SUBPATTERN:
+            runs.extend(_literal_runs(arg[-1]))
+        elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT) and arg[0] >= 1:
+            runs.extend(_literal_runs(arg[2]))
+        # Alternations, classes, anchors and optional parts require nothing.
+    runs.append("".join(current))
+    return [run for run in runs if len(run) >= 3]
+
+
+def required_trigrams(pattern: str) -> frozenset[str]:
+    """Lower-cased trigrams that any text matching ``pattern`` contains.
+
+    Empty when nothing can be derived (e.g. ``a|b`` or ``\\d+``); callers then
+    have to scan every file.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except Exception:
+        return frozenset()
+    return frozenset().union(*(_trigrams(run) for run in _literal_runs(parsed)))
+
+
+def _signature(trigrams: frozenset[str]) -> tuple[int, bytes]:
+    """Bloom filter over ``trigrams`` with 4-8 bits per trigram and one hash."""
+    bits = max(64, 1 << (len(trigrams) * 4 - 1).bit_length())
+    signature = bytearray(bits // 8)
+    for trigram in trigrams:
+        h = hash(trigram) & (bits - 1)
+        signature[h >> 3] |= 1 << (h & 7)
+    return bits, bytes(signature)
+
+
+class TrigramIndex:
+    """Trigram signatures of blobs, used to skip blobs a regex cannot match.
+
+    Each blob gets a small Bloom filter of its lower-cased trigrams instead of
+    entries in shared posting lists, so adding or dropping a blob is O(1) in
+    the size of the index and memory stays at about one byte per distinct
+    trigram of a blob. Blobs are queued by ``add`` and hashed on the next
+    ``refresh``, so writes stay cheap and each distinct content is indexed once
+    however many paths share it. Queued blobs are candidates for every search
+    until they are hashed.
+    """
+
+    def __init__(self) -> None:
+        self._signatures: dict[str, int] = {}  # digest -> signature size in bits
+        self._by_size: dict[int, dict[str, bytes]] = {}
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures) + len(self._pending)
+
+    def add(self, digest: str) -> None:
+        with self._lock:
+            if digest not in self._signatures:
+                self._pending.add(digest)
+
+    def discard(self, digest: str) -> None:
+        with self._lock:
+            self._pending.discard(digest)
+            bits = self._signatures.pop(digest, None)
+            if bits is not None:
+                del self._by_size[bits][digest]
+
+    def refresh(self, read: Callable[[str], str]) -> None:
+        """Index the queued blobs, reading each through ``read(digest)``.
+
+        Blobs are hashed without holding the index lock, so ``add``,
+        ``discard`` and ``candidates`` (and the file system writes that call
+        them) do not wait for it. If another thread is already refreshing,
+        this returns at once; blobs still queued count as candidates.
+        """
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                queued = list(self._pending)
+            built = []
+            for digest in queued:
+                try:
+                    built.append((digest, *_signature(_trigrams(read(digest)))))
+                except KeyError:
+                    continue  # freed before it was indexed
+            with self._lock:
+                for digest, bits, signature in built:
+                    if digest in self._pending:  # not discarded meanwhile
+                        self._pending.discard(digest)
+                        self._signatures[digest] = bits
+                        self._by_size.setdefault(bits, {})[digest] = signature
+        finally:
+            self._refreshing.release()
+
+    def candidates(self, pattern: str) -> set[str] | None:
+        """Digests that may match ``pattern``, or None if every blob may."""
+        required = required_trigrams(pattern)
+        if not required:
+            return None
+        hashes = [hash(trigram) for trigram in required]
+        result: set[str] = set()
+        with self._lock:
+            # Signatures of one size share the bit positions to probe.
+            for bits, signatures in self._by_size.items():
+                probes = [(h >> 3, 1 << (h & 7)) for h in (h & (bits - 1) for h in hashes)]
+                (first, first_mask), rest = probes[0], probes[1:]
+                result.update(
+                    digest for digest, signature in signatures.items()
+                    if signature[first] & first_mask
+                    and all(signature[i] & mask for i, mask in rest)
+                )
+            # Queued blobs are not hashed yet; they may match.
+            result.update(self._pending)
+        return result
@@ -1,33 +1,180 @@
 from __future__ import annotations
+import asyncio
 import os
-from langchain_core.tools import tool
-from tavily import TavilyClient
-from firecrawl import FirecrawlApp
+import re
+import unicodedata
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from tools.result_cache import ResultCache
+from tools.scrape_cache import ScrapeCache
+from utils.lazy import LazyImports
 
+# The Tavily and Firecrawl SDKs are only imported once a tool first needs a client.
+_lazy = LazyImports(
+    globals(),
+    TavilyClient="tavily",
+    AsyncTavilyClient="tavily",
+    FirecrawlApp="firecrawl",
+    AsyncFirecrawlApp="firecrawl",
+)
+__getattr__ = _lazy.module_getattr
+
+SEARCH_MAX_RESULTS = 5
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used as the search cache key.
+
+    Case, Unicode width variants, repeated whitespace and trailing
+    punctuation do not change what Tavily returns, so they are folded away.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.;, ")
+
+
+def make_search_cache() -> ResultCache:
+    """Search cache configured from SEARCH_CACHE_TTL and SEARCH_CACHE_PATH."""
+    return ResultCache(
+        maxsize=512,
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+        disk_path=os.getenv("SEARCH_CACHE_PATH") or None,
+    )
+
+
+def make_scrape_cache() -> ScrapeCache:
+    """Scrape cache configured from SCRAPE_CACHE_TTL and SCRAPE_CACHE_PATH."""
+    return ScrapeCache(
+        ttl=float(os.getenv("SCRAPE_CACHE_TTL", "86400")),
+        disk_path=os.getenv("SCRAPE_CACHE_PATH") or None,
+    )
+
+
+def _format_search_results(response: dict) -> str:
+    results = response.get("results", [])
+    return "\n\n".join(
+        f"**{r['title']}**\n{r.get('content', '')}\nURL: {r['url']}"
+        for r in results
+    )
+
+
+def _format_scrape_batch(urls: list[str], pages: list[str]) -> str:
+    return "\n\n".join(f"## {url}\n{page}" for url, page in zip(urls, pages))
+
+
+def make_web_tools(
+    search_client=None,
+    async_search_client=None,
+    search_cache: ResultCache | None = None,
+    scrape_client=None,
+    async_scrape_client=None,
+    scrape_cache: ScrapeCache | None = None,
+    max_concurrent_scrapes: int | None = None,
+) -> list:
+    """Build the web tools.
+
+    ``search_client`` / ``async_search_client`` may be any objects with a
+    Tavily-compatible ``search(query, max_results=...)`` method, and the
+    scrape clients any objects with a Firecrawl-compatible
+    ``scrape_url(url, params=...)``. By default the real clients are created
+    on first use and shared by all calls.
+    """
+    search_cache = search_cache or make_search_cache()
+    scrape_cache = scrape_cache or make_scrape_cache()
+    if max_concurrent_scrapes is None:
+        max_concurrent_scrapes = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "8"))
+    max_concurrent_scrapes = max(1, max_concurrent_scrapes)
+    clients: dict = {
+        "sync": search_client,
+        "async": async_search_client,
+        "scrape": scrape_client,
+        "ascrape": async_scrape_client,
+    }
+
+    def search_key(query: str) -> str:
+        return f"{SEARCH_MAX_RESULTS}:{normalize_query(query)}"
 
-def make_web_tools() -> list:
-    @tool
     def search_internet(query: str) -> str:
         """Search the internet using Tavily. Returns top results as text."""
         try:
-            client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-            response = client.search(query, max_results=5)
-            results = response.get("results", [])
-            return "\n\n".join(
-                f"**{r['title']}**\n{r.get('content', '')}\nURL: {r['url']}"
-                for r in results
+            if clients["sync"] is None:
+                clients["sync"] = _lazy("TavilyClient")(api_key=os.getenv("TAVILY_API_KEY"))
+            response = search_cache.get_or_fetch(
+                search_key(query),
+                lambda: clients["sync"].search(query, max_results=SEARCH_MAX_RESULTS),
+            )
+            return _format_search_results(response)
+        except Exception as e:
+            return f"Search error: {e}"
+
+    async def asearch_internet(query: str) -> str:
+        try:
+            if clients["async"] is None:
+                clients["async"] = _lazy("AsyncTavilyClient")(api_key=os.getenv("TAVILY_API_KEY"))
+            response = await search_cache.aget_or_fetch(
+                search_key(query),
+                lambda: clients["async"].search(query, max_results=SEARCH_MAX_RESULTS),
             )
+            return _format_search_results(response)
         except Exception as e:
             return f"Search error: {e}"
 
-    @tool
+    def scrape_one(url: str) -> str:
+        """Scrape through the shared client and cache; raises on failure."""
+        if clients["scrape"] is None:
+            clients["scrape"] = _lazy("FirecrawlApp")(api_key=os.getenv("FIRECRAWL_API_KEY"))
+
+        def fetch() -> str:
+            result = clients["scrape"].scrape_url(url, params={"formats": ["markdown"]})
+            return result.get("markdown", "No content extracted")
+
+        return scrape_cache.get_or_fetch(url, fetch)
+
+    async def ascrape_one(url: str) -> str:
+        if clients["ascrape"] is None:
+            clients["ascrape"] = _lazy("AsyncFirecrawlApp")(api_key=os.getenv("FIRECRAWL_API_KEY"))
+
+        async def fetch() -> str:
+            result = await clients["ascrape"].scrape_url(url, params={"formats": ["markdown"]})
+            return result.get("markdown", "No content extracted")
+
+        return await scrape_cache.aget_or_fetch(url, fetch)
+
     def web_scrape(url: str) -> str:
         """Scrape a webpage using Firecrawl and return its markdown content."""
         try:
-            app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
-            result = app.scrape_url(url, params={"formats": ["markdown"]})
-            return result.get("markdown", "No content extracted")
+            return scrape_one(url)
+        except Exception as e:
+            return f"Scrape error: {e}"
+
+    async def aweb_scrape(url: str) -> str:
+        try:
+            return await ascrape_one(url)
         except Exception as e:
             return f"Scrape error: {e}"
 
-    return [search_internet, web_scrape]
+    def web_scrape_many(urls: list[str]) -> str:
+        """Scrape several webpages concurrently with Firecrawl. Returns each page's
+        markdown under a '## <url>' heading, in the same order as the input."""
+        if not urls:
+            return ""
+        workers = min(max_concurrent_scrapes, len(urls))
+        with ContextThreadPoolExecutor(max_workers=workers) as pool:
+            pages = list(pool.map(web_scrape, urls))
+        return _format_scrape_batch(urls, pages)
+
+    async def aweb_scrape_many(urls: list[str]) -> str:
+        semaphore = asyncio.Semaphore(max_concurrent_scrapes)
+
+        async def bounded(url: str) -> str:
+            async with semaphore:
+                return await aweb_scrape(url)
+
+        pages = await asyncio.gather(*(bounded(url) for url in urls))
+        return _format_scrape_batch(urls, pages)
+
+    return [
+        StructuredTool.from_function(func=search_internet, coroutine=asearch_internet),
+        StructuredTool.from_function(func=web_scrape, coroutine=aweb_scrape),
+        StructuredTool.from_function(func=web_scrape_many, coroutine=aweb_scrape_many),
+    ]
@@ -1,4 +1,5 @@
+from utils.cache import LRUCache
 from utils.errors import AgentError, ConfigurationError, ToolExecutionError
 from utils.logging import get_logger
 
-__all__ = ["AgentError", "ConfigurationError", "ToolExecutionError", "get_logger"]
+__all__ = ["AgentError", "ConfigurationError", "LRUCache", "ToolExecutionError", "get_logger"]
@@ -0,0 +1,42 @@
+from __future__ import annotations
+import importlib
+from typing import Any
+
+
+class LazyImports:
+    """Module-level names that are imported on first use.
+
+    Keeps heavy SDKs off the import path of modules that only sometimes need
+    them. Usage inside a module::
+
+        _lazy = LazyImports(globals(), ChatOpenAI="langchain_openai")
+        __getattr__ = _lazy.module_getattr
+
+        llm = _lazy("ChatOpenAI")(model=...)
+
+    A resolved name is stored in the module's globals, so ``mock.patch`` on
+    ``module.ChatOpenAI`` works exactly as it would for an eager import.
+    """
+
+    def __init__(self, namespace: dict[str, Any], **targets: str) -> None:
+        self._namespace = namespace
+        self._targets = targets
+
+    def __call__(self, name: str) -> Any:
+        try:
+            return self._namespace[name]
+        except KeyError:
+            pass
+        if name not in self._targets:
+            raise AttributeError(name)
+        value = getattr(importlib.import_module(self._targets[name]), name)
+        self._namespace[name] = value
+        return value
+
+    def module_getattr(self, name: str) -> Any:
+        try:
+            return self(name)
+        except AttributeError:
+            raise AttributeError(
+                f"module {self._namespace.get('__name__')!r} has no attribute {name!r}"
+            ) from None
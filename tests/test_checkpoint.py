@@ -0,0 +1,144 @@
+"""
+Crash/resume tests for SQLite checkpointing, with mocked LLMs and no network.
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agent.checkpoint import build_durable_graph, resume_run, thread_config
+from utils.errors import AgentError
+
+
+class ProcessDied(BaseException):
+    """Stands in for the process being killed; the scheduler only turns Exceptions into failed items."""
+
+
+def make_todo(id, desc, status="pending", result=None):
+    return {"id": id, "description": desc, "status": status, "result": result}
+
+
+def task_call(call_id, todo_id):
+    return {
+        "name": "task_tool",
+        "id": call_id,
+        "type": "tool_call",
+        "args": {
+            "todo_id": todo_id,
+            "task_description": f"do {todo_id}",
+            "tool_names": ["read_file"],
+            "context": "",
+        },
+    }
+
+
+def first_step():
+    return AIMessage(content="", tool_calls=[
+        {
+            "name": "update_todo", "id": "u1", "type": "tool_call",
+            "args": {"items": [make_todo("t1", "first"), make_todo("t2", "second")]},
+        },
+        {
+            "name": "write_file", "id": "w1", "type": "tool_call",
+            "args": {"path": "notes.md", "content": "draft"},
+        },
+        task_call("c1", "t1"),
+    ])
+
+
+def mock_llm(side_effect):
+    llm = MagicMock()
+    llm.bind_tools.return_value = llm
+    llm.invoke.side_effect = side_effect
+    return llm
+
+
+def mock_subagent(result):
+    subagent = MagicMock()
+    subagent.invoke.return_value = {"messages": [MagicMock(content=result)]}
+    return subagent
+
+
+def test_resume_skips_done_todos_and_restores_files(tmp_path):
+    db = str(tmp_path / "runs.sqlite")
+    llm = mock_llm([first_step(), AIMessage(content="Finished.")])
+    # t1 runs from the supervisor's own task_tool call; the process dies while
+    # the scheduler is running t2.
+    first_subagent = MagicMock()
+    first_subagent.invoke.side_effect = [
+        {"messages": [MagicMock(content="t1 result")]},
+        ProcessDied(),
+    ]
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=first_subagent):
+        graph, _ = build_durable_graph(db)
+        with pytest.raises(ProcessDied):
+            graph.invoke({"objective": "Two steps"}, thread_config("run-1"))
+    assert first_subagent.invoke.call_count == 2
+
+    # Resuming re-enters the scheduler: only t2 may run.
+    resumed = mock_llm([AIMessage(content="Finished.")])
+    second_subagent = mock_subagent("t2 result")
+    with patch("agent.supervisor.ChatOpenAI", return_value=resumed), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=second_subagent):
+        result = resume_run("run-1", db, recursion_limit=10)
+
+    assert result["final_output"] == "Finished."
+    assert second_subagent.invoke.call_count == 1
+    todo = {item["id"]: item for item in result["todo"]}
+    assert todo["t1"]["result"] == "t1 result"
+    assert todo["t2"]["result"] == "t2 result"
+    assert [log["todo_id"] for log in result["subagent_logs"]] == ["t1", "t2"]
+    assert result["artifacts"] == {"notes.md": "draft"}
+    # The resumed supervisor is prompted with the checkpointed TODO list.
+    first_prompt = resumed.invoke.call_args_list[0].args[0]
+    assert any("t1 result" in str(m) for m in first_prompt)
+
+
+def test_resume_restores_virtual_fs(tmp_path):
+    db = str(tmp_path / "runs.sqlite")
+    llm = mock_llm([first_step(), RuntimeError("process died")])
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=mock_subagent("ok")):
+        graph, _ = build_durable_graph(db)
+        with pytest.raises(RuntimeError):
+            graph.invoke({"objective": "Write"}, thread_config("run-2"))
+
+    reader = mock_llm([
+        AIMessage(content="", tool_calls=[{
+            "name": "read_file", "id": "r1", "type": "tool_call",
+            "args": {"path": "notes.md"},
+        }]),
+        AIMessage(content="done"),
+    ])
+    with patch("agent.supervisor.ChatOpenAI", return_value=reader), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent"):
+        result = resume_run("run-2", db, recursion_limit=10)
+
+    read_result = [m for m in result["messages"] if getattr(m, "tool_call_id", None) == "r1"]
+    assert read_result[0].content == "draft"
+
+
+def test_resume_of_finished_run_returns_saved_state(tmp_path):
+    db = str(tmp_path / "runs.sqlite")
+    llm = mock_llm([AIMessage(content="Nothing to do.")])
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm):
+        graph, _ = build_durable_graph(db)
+        graph.invoke({"objective": "Idle"}, thread_config("run-3"))
+
+    again = mock_llm([AssertionError("must not be called")])
+    with patch("agent.supervisor.ChatOpenAI", return_value=again):
+        result = resume_run("run-3", db)
+    assert result["final_output"] == "Nothing to do."
+    again.invoke.assert_not_called()
+
+
+def test_resume_unknown_thread_raises(tmp_path):
+    with patch("agent.supervisor.ChatOpenAI"):
+        with pytest.raises(AgentError):
+            resume_run("missing", str(tmp_path / "runs.sqlite"))
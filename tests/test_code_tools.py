@@ -24,3 +24,141 @@ def test_execute_runtime_error():
     execute = next(t for t in tools if t.name == "execute_code")
     result = execute.invoke({"code": "raise ValueError('oops')"})
     assert "oops" in result or "ValueError" in result
+
+
+import pytest
+from tools.code_workers import CodeWorkerPool
+
+
+@pytest.fixture
+def pool():
+    worker_pool = CodeWorkerPool(size=1, preload=["json"], max_jobs_per_worker=3, timeout=1)
+    yield worker_pool
+    worker_pool.close()
+
+
+def test_pool_reuses_warm_worker_but_isolates_jobs(pool):
+    first = pool.run("import os, sys; leaked = 1; print(os.getppid(), 'json' in sys.modules)")
+    second = pool.run("import os; print(os.getppid(), 'leaked' in globals())")
+    zygote_a, preloaded = first.stdout.split()
+    zygote_b, leaked = second.stdout.split()
+    assert zygote_a == zygote_b
+    assert preloaded == "True"
+    assert leaked == "False"
+
+
+def test_pool_recycles_worker_after_max_jobs(pool):
+    pids = [pool.run("import os; print(os.getppid())").stdout for _ in range(4)]
+    assert len(set(pids[:3])) == 1
+    assert pids[3] != pids[0]
+
+
+def test_pool_enforces_timeout_and_keeps_worker(pool):
+    result = pool.run("while True: pass")
+    assert result.timed_out
+    assert pool.run("print('still alive')").stdout == "still alive\n"
+
+
+def test_pool_reports_exit_status_like_python_c(pool):
+    assert pool.run("import sys; sys.exit(3)").returncode == 3
+    failed = pool.run("raise ValueError('oops')")
+    assert failed.returncode == 1
+    assert 'File "<string>", line 1' in failed.stderr
+    assert "code_workers.py" not in failed.stderr
+    assert failed.stderr.startswith("Traceback (most recent call last):\n  File \"<string>\"")
+    syntax = pool.run("def (")
+    assert "SyntaxError" in syntax.stderr and "code_workers.py" not in syntax.stderr
+
+
+THREAD_AND_ATEXIT = """
+import atexit, threading, time
+atexit.register(lambda: print("bye"))
+def work():
+    time.sleep(0.1)
+    print("thread done")
+threading.Thread(target=work).start()
+"""
+
+
+def test_pool_finishes_threads_and_atexit_like_python_c(pool, monkeypatch):
+    pooled = make_code_tools(pool=pool)[0].invoke({"code": THREAD_AND_ATEXIT})
+    monkeypatch.setenv("CODE_WORKERS", "0")
+    plain = make_code_tools()[0].invoke({"code": THREAD_AND_ATEXIT})
+    assert pooled == plain == "thread done\nbye\n"
+
+
+def test_execute_code_uses_given_pool(pool):
+    execute = make_code_tools(pool=pool)[0]
+    assert execute.invoke({"code": "while True: pass"}) == "Error: code execution timed out (1s limit)"
+
+
+from tools.code_tools import _run_in_subprocess
+from tools.code_workers import ExecLimits, OutputCapture
+from tools.file_tools import VirtualFS
+
+FLOOD = "import sys\nfor i in range(200000): print(f'line {i}')\nprint('the end')"
+
+
+def test_output_capture_keeps_head_and_tail():
+    capture = OutputCapture(max_bytes=10)
+    for chunk in (b"abc", b"defgh", b"-" * 100_000, b"vwxyz"):
+        capture.feed(chunk)
+    assert capture.truncated
+    assert capture.total == 100_013
+    assert capture.text() == "abcde\n... [100003 bytes of output omitted] ...\nvwxyz"
+
+
+def test_output_capture_with_zero_max_bytes_keeps_everything():
+    capture = OutputCapture(max_bytes=0)
+    for chunk in (b"abc", b"-" * 100_000, b"xyz"):
+        capture.feed(chunk)
+    assert not capture.truncated
+    assert capture.text() == "abc" + "-" * 100_000 + "xyz"
+
+
+@pytest.fixture
+def bounded_pool():
+    limits = ExecLimits(max_output_bytes=1000, memory_limit_mb=256)
+    worker_pool = CodeWorkerPool(size=1, timeout=10, limits=limits)
+    yield worker_pool
+    worker_pool.close()
+
+
+def test_pool_bounds_runaway_output_and_spills_it_to_the_fs(bounded_pool):
+    fs = VirtualFS()
+    result = make_code_tools(pool=bounded_pool, fs=fs)[0].invoke({"code": FLOOD})
+    assert result.startswith("line 0\nline 1\n")
+    assert "bytes of output omitted" in result
+    assert "the end" in result
+    assert len(result) < 1200
+    path = result.rsplit("[Full output: ", 1)[1].rstrip("]")
+    full = fs.read(path)
+    assert full.startswith("line 0\n") and full.endswith("line 199999\nthe end\n")
+
+
+def test_pool_applies_memory_limit(bounded_pool):
+    result = bounded_pool.run("x = bytearray(512 * 1024 * 1024)")
+    assert result.returncode == 1
+    assert "MemoryError" in result.stderr
+    assert bounded_pool.run("print('ok')").stdout == "ok\n"
+
+
+def test_subprocess_path_bounds_output_and_applies_limits():
+    limits = ExecLimits(max_output_bytes=1000, spill_max_bytes=0, memory_limit_mb=256)
+    flood = _run_in_subprocess(FLOOD, limits)
+    assert "bytes of output omitted" in flood.stdout
+    assert flood.stdout.endswith("the end\n")
+    assert flood.stdout_spill is None
+    oom = _run_in_subprocess("x = bytearray(512 * 1024 * 1024)", limits)
+    assert "MemoryError" in oom.stderr
+
+
+def test_subprocess_path_with_zero_max_bytes_returns_all_output():
+    limits = ExecLimits(max_output_bytes=0, memory_limit_mb=256)
+    flood = _run_in_subprocess(FLOOD, limits)
+    assert flood.returncode == 0
+    assert flood.stdout.startswith("line 0\n") and flood.stdout.endswith("line 199999\nthe end\n")
+    assert flood.stdout_spill is None
+    failed = _run_in_subprocess("import sys\nprint(sys.argv)\n1 / 0", limits)
+    assert failed.stdout == "['-c']\n"
+    assert failed.stderr.startswith('Traceback (most recent call last):\n  File "<string>", line 3')
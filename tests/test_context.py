@@ -33,3 +33,86 @@ def test_remaining_budget():
     allocator = ContextBudgetAllocator(total_budget=4096)
     allocator.record_usage(1000)
     assert allocator.remaining == 3096
+
+def test_context_room_fits_allocate():
+    allocator = ContextBudgetAllocator(total_budget=4096)
+    room = allocator.context_room(system_prompt_tokens=300)
+    allocator.allocate(system_prompt_tokens=300, task_context_tokens=room)
+    with pytest.raises(TokenBudgetExceeded):
+        allocator.allocate(system_prompt_tokens=300, task_context_tokens=room + 1)
+
+
+def test_approx_counter_does_not_undercount_code_and_urls():
+    from context.tokens import ApproxTokenCounter, WordCountTokenCounter
+
+    approx = ApproxTokenCounter()
+    words = WordCountTokenCounter()
+    for text in [
+        "def area(r):\n    return 3.14159 * r ** 2",
+        "See https://docs.python.org/3/library/re.html?highlight=findall#re.findall",
+    ]:
+        assert approx.count(text) > 1.5 * words.count(text)
+    assert approx.count("The quick brown fox") == 4
+
+
+def test_caching_counter_memoizes_repeated_strings():
+    from context.tokens import CachingTokenCounter
+
+    calls = []
+
+    class Recording:
+        def count(self, text):
+            calls.append(text)
+            return len(text)
+
+    counter = CachingTokenCounter(Recording())
+    assert counter.count("same prefix") == counter.count("same prefix")
+    assert calls == ["same prefix"]
+    assert counter.cache_info().hits == 1
+
+
+def test_caching_counter_keys_large_strings_by_digest():
+    import gc
+    import weakref
+    from context.tokens import CachingTokenCounter
+
+    class Text(str):
+        pass
+
+    calls = []
+
+    class Recording:
+        def count(self, text):
+            calls.append(len(text))
+            return len(text)
+
+    counter = CachingTokenCounter(Recording(), max_key_chars=100)
+    big = Text("x" * 10_000)
+    ref = weakref.ref(big)
+    assert counter.count(big) == counter.count("x" * 10_000) == 10_000
+    assert calls == [10_000]
+    del big
+    gc.collect()
+    assert ref() is None  # the cache does not hold the text itself
+
+
+def test_make_token_counter_falls_back_to_word_counts():
+    from context.tokens import make_token_counter
+
+    counter = make_token_counter("no-such-tokenizer")
+    assert counter.count("three little words") == 3
+
+
+def test_count_tokens_uses_pluggable_counter():
+    from context import tokens
+
+    class Fixed:
+        def count(self, text):
+            return 7
+
+    previous = tokens.get_token_counter()
+    tokens.set_token_counter(Fixed())
+    try:
+        assert tokens.count_tokens("a", "", None, "b") == 14
+    finally:
+        tokens.set_token_counter(previous)
@@ -1,4 +1,6 @@
-from context.compression import compress_text, compress_tool_results
+import pytest
+
+from context.compression import compress_text, compress_tool_results, summarize_text
 from context.memory import WorkingMemory
 
 
@@ -16,8 +18,203 @@ def test_compress_tool_results_limits_items():
     assert "[Result 4]" not in packed
 
 
+def test_summarize_text_fits_budget_and_keeps_facts():
+    from context.tokens import count_tokens
+
+    filler = "The analysis looked at several general aspects of the wider market. "
+    text = (
+        "Python 3.12 shipped in October 2023 with a 5% speedup. " + filler * 30
+        + "Release notes: https://docs.python.org/3/whatsnew/3.12.html\n" + filler * 20
+        + "Benchmarks were saved to reports/bench.csv."
+    )
+    summary = summarize_text(text, max_tokens=80)
+    assert count_tokens(summary) <= 80
+    assert "5% speedup" in summary
+    assert "https://docs.python.org/3/whatsnew/3.12.html" in summary
+    assert "reports/bench.csv" in summary
+    # Repeated boilerplate is picked at most once.
+    assert summary.count(filler.strip()) <= 1
+
+
+def test_summarize_text_returns_short_text_unchanged():
+    assert summarize_text("Done in 3 steps.", max_tokens=50) == "Done in 3 steps."
+
+
+def test_summarize_text_trims_a_single_oversized_sentence():
+    from context.tokens import count_tokens
+
+    summary = summarize_text("x" * 5000, max_tokens=20)
+    assert summary.endswith(" ...")
+    assert count_tokens(summary) <= 20
+
+
 def test_working_memory_context_block():
     memory = WorkingMemory()
     memory.set_fact("url", "https://example.com")
     assert memory.get_fact("url") == "https://example.com"
     assert "- url: https://example.com" in memory.to_context_block()
+
+
+def test_working_memory_search_ranks_relevant_facts():
+    memory = WorkingMemory()
+    memory.set_fact("pricing", "Competitor pricing starts at $20 per seat per month")
+    memory.set_fact("stack", "The backend is written in Go with a Postgres database")
+    memory.set_fact("team", "The support team works in three time zones")
+    for i in range(50):
+        memory.set_fact(f"note-{i}", f"unrelated observation number {i}")
+
+    keys = [key for key, _ in memory.search("compare seat pricing of competitors", top_k=2)]
+    assert keys[0] == "pricing"
+    assert "stack" not in keys
+    block = memory.to_context_block("which database does the backend use", top_k=1)
+    assert block == "- stack: The backend is written in Go with a Postgres database"
+
+
+def test_working_memory_reindexes_updated_facts_and_respects_budget():
+    memory = WorkingMemory()
+    memory.set_fact("db", "Postgres")
+    memory.set_fact("db", "SQLite file on local disk")
+    assert memory.search("postgres") == []
+    assert memory.search("sqlite") == [("db", "SQLite file on local disk")]
+    assert len(memory) == 1
+
+    memory.set_fact("long", "sqlite " + "detail " * 200)
+    assert [key for key, _ in memory.search("sqlite", max_tokens=30)] == ["db"]
+
+
+def _exhaustive_bm25(facts, query, k1=1.2, b=0.75):
+    import math
+
+    from context.memory import _terms
+
+    docs = {key: _terms(f"{key} {value}") for key, value in facts.items()}
+    average = sum(sum(terms.values()) for terms in docs.values()) / len(docs)
+    scores = {}
+    for term in _terms(query):
+        containing = [key for key, terms in docs.items() if term in terms]
+        idf = math.log(1 + (len(docs) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for key in containing:
+            tf = docs[key][term]
+            norm = k1 * (1 - b + b * sum(docs[key].values()) / average)
+            scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+def test_working_memory_search_matches_exhaustive_bm25():
+    import random
+
+    from context.tokens import count_tokens
+
+    rng = random.Random(7)
+    facts = {f"solar-{i}": f"solar panel efficiency measured at site {i}" for i in range(20)}
+    facts["animal"] = "a zebra was seen near the lab"
+    vocabulary = ["solar", "panel", "wind", "grid", "storage", "zebra", "battery", "cost"]
+    for i in range(200):
+        facts[f"note-{i}"] = " ".join(rng.choices(vocabulary, k=rng.randint(1, 12)))
+    memory = WorkingMemory()
+    for key, value in facts.items():
+        memory.set_fact(key, value)
+
+    keys = [key for key, _ in memory.search("zebra solar panel efficiency", top_k=5)]
+    assert len(keys) == 5 and "solar-0" in keys
+    for query in ("zebra solar panel efficiency", "grid storage cost", "battery", "wind zebra"):
+        scores = _exhaustive_bm25(facts, query)
+        for top_k in (1, 5, 30):
+            got = [key for key, _ in memory.search(query, top_k=top_k)]
+            expected = sorted(scores.values(), reverse=True)[:top_k]
+            assert [scores[key] for key in got] == pytest.approx(expected)
+
+        budget, expected = 40, []
+        for key in sorted(scores, key=scores.__getitem__, reverse=True):
+            cost = count_tokens(f"- {key}: {facts[key]}")
+            if len(expected) < 5 and cost <= budget:
+                expected.append(scores[key])
+                budget -= cost
+        got = [key for key, _ in memory.search(query, top_k=5, max_tokens=40)]
+        assert [scores[key] for key in got] == pytest.approx(expected)
+
+
+def _tool_turn(i: int, result_words: int = 400):
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    call_id = f"call-{i}"
+    return [
+        AIMessage(content="", tool_calls=[{
+            "name": "task_tool", "id": call_id, "type": "tool_call",
+            "args": {"todo_id": f"t{i}", "task_description": "research " * 200},
+        }]),
+        ToolMessage(content=f"result {i} " + "detail " * result_words, tool_call_id=call_id),
+    ]
+
+
+def _assert_pairing(messages):
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    seen_calls = set()
+    for message in messages:
+        if isinstance(message, AIMessage):
+            seen_calls.update(tc["id"] for tc in message.tool_calls)
+        if isinstance(message, ToolMessage):
+            assert message.tool_call_id in seen_calls
+
+
+def test_compact_history_keeps_recent_turns_and_fits_budget():
+    from context.history import compact_history, _message_tokens
+
+    history = [m for i in range(20) for m in _tool_turn(i)]
+    compacted = compact_history(history, max_tokens=4000, keep_turns=2, fixed_tokens=300)
+
+    assert compacted[-4:] == history[-4:]
+    assert compacted[0].content.startswith("Summary of earlier steps")
+    assert "task_tool t" in compacted[0].content
+    _assert_pairing(compacted)
+    total = sum(_message_tokens(m) for m in compacted)
+    assert total + 300 + 1024 <= 4000
+    assert len(compacted) > 5  # only as many turns as needed were folded
+
+
+def test_compact_history_shrinks_older_turns_when_under_budget():
+    from context.history import compact_history
+
+    history = [m for i in range(4) for m in _tool_turn(i, result_words=100)]
+    compacted = compact_history(history, max_tokens=100_000, keep_turns=1)
+
+    assert len(compacted) == len(history)
+    assert [getattr(m, "tool_call_id", None) for m in compacted] == [
+        getattr(m, "tool_call_id", None) for m in history
+    ]
+    assert compacted[1].content.endswith(" ...")
+    assert compacted[0].tool_calls[0]["args"]["task_description"].endswith(" ...")
+    assert compacted[-2:] == history[-2:]
+    _assert_pairing(compacted)
+
+
+def test_compact_history_returns_short_history_unchanged():
+    from context.history import compact_history
+
+    history = _tool_turn(0)
+    assert compact_history(history, max_tokens=10, keep_turns=3) == history
+
+
+def test_compact_history_stable_mode_keeps_prefix_across_turns():
+    from context.history import compact_history
+
+    def compact(turns):
+        history = [m for i in range(turns) for m in _tool_turn(i)]
+        return compact_history(
+            history, max_tokens=12000, keep_turns=2, fixed_tokens=300,
+            shrink_older=False, fold_chunk=4,
+        )
+
+    def folded(compacted, turns):
+        return turns - (len(compacted) - 1) // 2
+
+    # Older turns stay verbatim and are folded in chunks of four, so adding a
+    # turn usually appends to the prompt instead of rewriting its prefix.
+    first, second, third = compact(21), compact(22), compact(23)
+    assert first[0].content.startswith("Summary of earlier steps")
+    assert folded(first, 21) == folded(second, 22) == folded(third, 23) == 8
+    assert second[:len(first)] == first
+    assert third[:len(second)] == second
+    assert first[1] == _tool_turn(8)[0]
+    _assert_pairing(third)
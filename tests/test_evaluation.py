@@ -24,3 +24,59 @@ def test_evaluate_run_returns_expected_keys():
     )
     assert "objective_coverage" in result
     assert result["artifact_count"] == 1
+
+
+def test_metric_collector_histogram_percentiles_and_exports():
+    import json
+
+    metrics = MetricCollector()
+    for ms in range(1, 101):
+        metrics.observe("tool_seconds", ms / 1000, tool="web_scrape")
+    metrics.inc("tool_errors_total", tool="web_scrape")
+    with metrics.timer("supervisor_step_seconds"):
+        pass
+
+    summary = metrics.to_dict()["histograms"]['tool_seconds{tool="web_scrape"}']
+    assert summary["count"] == 100
+    assert (summary["p50"], summary["p95"], summary["p99"]) == (0.05, 0.095, 0.099)
+    assert json.loads(metrics.to_json())["counters"] == {'tool_errors_total{tool="web_scrape"}': 1}
+
+    text = metrics.to_prometheus()
+    assert "# TYPE tool_seconds summary" in text
+    assert 'tool_seconds{quantile="0.95",tool="web_scrape"} 0.095' in text
+    assert 'tool_seconds_count{tool="web_scrape"} 100' in text
+    assert "# TYPE tool_errors_total counter" in text
+    assert "supervisor_step_seconds_count 1" in text
+
+
+def test_metrics_callback_handler_times_llm_and_tool_runs():
+    import pytest
+    from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import tool
+    from evaluation.metrics import MetricsCallbackHandler
+
+    metrics = MetricCollector()
+    handler = MetricsCallbackHandler(metrics)
+
+    @tool
+    def flaky(x: int) -> int:
+        """Fail on negative input."""
+        if x < 0:
+            raise ValueError("negative")
+        return x
+
+    flaky.callbacks = [handler]
+    llm = FakeMessagesListChatModel(
+        responses=[AIMessage(content="hi")], callbacks=[handler], tags=["subagent"]
+    )
+    llm.invoke("hello")
+    flaky.invoke({"x": 1})
+    with pytest.raises(ValueError):
+        flaky.invoke({"x": -1})
+
+    histograms = metrics.to_dict()["histograms"]
+    llm_series = [key for key in histograms if key.startswith("llm_call_seconds")]
+    assert len(llm_series) == 1 and 'role="subagent"' in llm_series[0]
+    assert histograms['tool_seconds{tool="flaky"}']["count"] == 2
+    assert metrics.snapshot() == {'tool_errors_total{tool="flaky"}': 1}
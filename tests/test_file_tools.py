@@ -1,5 +1,6 @@
 # tests/test_file_tools.py
 import pytest
+from tools.blob_store import BlobStore
 from tools.file_tools import VirtualFS, make_file_tools
 
 def test_write_and_read():
@@ -57,3 +58,276 @@ def test_virtualfs_snapshot_returns_copy():
     snap["a.txt"] = "changed"
 
     assert fs.read("a.txt") == "A"
+
+
+def test_virtualfs_pop_changes_tracks_dirty_and_deleted_paths():
+    fs = VirtualFS()
+    fs.write("a.txt", "A")
+    fs.write("b.txt", "B")
+    assert fs.pop_changes() == {"a.txt": "A", "b.txt": "B"}
+    assert fs.pop_changes() == {}
+
+    fs.edit("a.txt", [{"find": "A", "replace": "AA"}])
+    fs.delete("b.txt")
+    version = fs.version
+    assert fs.pop_changes() == {"a.txt": "AA", "b.txt": None}
+    assert fs.version == version
+    assert fs.delete("b.txt") == {"error": "file 'b.txt' not found"}
+
+
+def test_edit_applies_all_ops_in_one_pass_and_reports_matches():
+    fs = VirtualFS()
+    fs.write("swap.txt", "cat dog cat")
+    result = fs.edit("swap.txt", [
+        {"find": "cat", "replace": "dog"},
+        {"find": "dog", "replace": "cat"},
+        {"find": "bird", "replace": "fish"},
+    ])
+    # Replacements are not re-matched by later ops, so this is a true swap.
+    assert fs.read("swap.txt") == "dog cat dog"
+    assert result["matches"] == [2, 1, 0]
+
+
+def test_edit_supports_count_and_anchors():
+    from tools.edit_engine import apply_edits
+
+    text = "## Intro\nTODO a\nTODO b\n## Notes\nTODO c\n"
+    new, matches = apply_edits(text, [
+        {"find": "TODO", "replace": "DONE", "count": 1},
+        {"find": "TODO", "replace": "NOTE", "after": "## Notes"},
+    ])
+    assert new == "## Intro\nDONE a\nTODO b\n## Notes\nNOTE c\n"
+    assert matches == [1, 1]
+
+    new, matches = apply_edits(text, [
+        {"find": "TODO", "replace": "X", "after": "## Intro", "before": "## Notes"},
+        {"find": "## Missing anchor", "replace": "", "after": "nowhere"},
+    ])
+    assert new == "## Intro\nX a\nX b\n## Notes\nTODO c\n"
+    assert matches == [2, 0]
+
+
+def test_edit_earlier_op_wins_at_same_position():
+    from tools.edit_engine import apply_edits
+
+    new, matches = apply_edits("foobar", [
+        {"find": "foo", "replace": "F"},
+        {"find": "foobar", "replace": "FB"},
+    ])
+    assert (new, matches) == ("Fbar", [1, 0])
+
+    new, matches = apply_edits("foobar foobar", [
+        {"find": "foo", "replace": "F", "count": 1},
+        {"find": "foobar", "replace": "FB"},
+    ])
+    assert (new, matches) == ("Fbar FB", [1, 1])
+
+
+def test_edit_rejects_invalid_ops():
+    fs = VirtualFS()
+    fs.write("doc.txt", "text")
+    assert "error" in fs.edit("doc.txt", [{"find": "", "replace": "x"}])
+    assert "error" in fs.edit("doc.txt", [{"replace": "x"}])
+    assert fs.read("doc.txt") == "text"
+
+
+def test_edit_diff_is_compact_unified_diff():
+    fs = VirtualFS()
+    lines = [f"line {i}" for i in range(5000)]
+    fs.write("big.txt", "\n".join(lines))
+    result = fs.edit("big.txt", [{"find": "line 2500\n", "replace": "changed\n"}])
+
+    diff = result["diff"].splitlines()
+    assert diff[:3] == ["--- a/big.txt", "+++ b/big.txt", "@@ -2498,7 +2498,7 @@"]
+    assert "-line 2500" in diff and "+changed" in diff
+    assert len(diff) == 3 + 7 + 1
+
+
+def test_edit_diff_matches_difflib_output():
+    import difflib
+    from tools.edit_engine import unified_diff
+
+    old = "a\nb\nc\nd\ne\nf\ng\nh\ni\nj\nk\n"
+    new = "a\nB\nc\nd\ne\nf\ng\nh\ni\nJ\nk\nl\n"
+    expected = list(difflib.unified_diff(
+        old.splitlines(), new.splitlines(), "a/x", "b/x", lineterm="", n=3
+    ))
+    assert unified_diff(old, new, "x").splitlines() == expected
+    assert unified_diff(old, old, "x") == ""
+
+
+def test_virtualfs_deduplicates_identical_content():
+    fs = VirtualFS()
+    page = "scraped page " * 1000
+    fs.write("a.md", page)
+    fs.write("b.md", page)
+    assert fs.blobs.stats() == {
+        "blobs": 1, "memory_bytes": len(page.encode()), "spilled_bytes": 0,
+    }
+
+    fs.delete("a.md")
+    assert fs.read("b.md") == page
+    fs.write("b.md", "small")
+    assert fs.blobs.stats()["blobs"] == 1
+    assert fs.blobs.stats()["memory_bytes"] == len("small")
+
+
+def test_virtualfs_spills_large_files_above_memory_cap(tmp_path):
+    fs = VirtualFS(BlobStore(max_memory_bytes=10_000, spill_min_bytes=1_000, spill_dir=str(tmp_path)))
+    small = "tiny"
+    big = "row,value\n" + "ünïcode,42\n" * 2_000
+    fs.write("small.txt", small)
+    fs.write("data.csv", big)
+
+    stats = fs.blobs.stats()
+    assert stats["memory_bytes"] == len(small)
+    assert stats["spilled_bytes"] == len(big.encode())
+    assert fs.read("data.csv") == big
+    view = fs.read_bytes("data.csv")
+    assert isinstance(view, memoryview) and view.readonly
+    assert bytes(view[:9]) == b"row,value"
+    assert fs.pop_changes()["data.csv"] == big
+
+    fs.edit("data.csv", [{"find": "row,value", "replace": "key,value"}])
+    assert fs.read("data.csv").startswith("key,value")
+    assert fs.blobs.stats()["blobs"] == 2
+    fs.delete("data.csv")
+    assert fs.blobs.stats() == {"blobs": 1, "memory_bytes": len(small), "spilled_bytes": 0}
+    assert fs.read_bytes("data.csv") is None
+
+
+def test_virtualfs_restore_releases_previous_blobs():
+    fs = VirtualFS()
+    fs.write("old.txt", "old")
+    fs.restore({"a.txt": "same", "b.txt": "same"})
+    assert fs.snapshot() == {"a.txt": "same", "b.txt": "same"}
+    assert fs.blobs.stats()["blobs"] == 1
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_virtualfs_line_and_byte_ranges(spill, tmp_path):
+    blobs = BlobStore(max_memory_bytes=0 if spill else 10**9, spill_min_bytes=1, spill_dir=str(tmp_path))
+    fs = VirtualFS(blobs)
+    text = "".join(f"line {i} é\n" for i in range(100))
+    fs.write("page.md", text)
+    assert fs.blobs.is_spilled(fs._files["page.md"]) is spill
+
+    assert fs.read("page.md", offset=10, limit=2) == "line 10 é\nline 11 é\n"
+    assert fs.read("page.md", offset=98) == "line 98 é\nline 99 é\n"
+    assert fs.read("page.md", offset=500, limit=5) == ""
+    assert fs.read("page.md") == text
+    # "é" is two bytes; a range that cuts it in half drops the fragment.
+    assert fs.read("page.md", offset=0, limit=8, unit="bytes") == "line 0 "
+    assert fs.read("page.md", offset=0, limit=9, unit="bytes") == "line 0 é"
+    assert fs.stat("page.md") == {"path": "page.md", "size": len(text.encode()), "lines": 100}
+
+
+def test_virtualfs_line_index_follows_edits():
+    fs = VirtualFS()
+    fs.write("notes.txt", "a\nb\nc")
+    assert fs.stat("notes.txt")["lines"] == 3
+    assert fs.read("notes.txt", offset=2, limit=1) == "c"
+
+    fs.edit("notes.txt", [{"find": "b", "replace": "b1\nb2"}])
+    assert fs.stat("notes.txt") == {"path": "notes.txt", "size": 9, "lines": 4}
+    assert fs.read("notes.txt", offset=1, limit=2) == "b1\nb2\n"
+    assert fs.stat("missing.txt") == {"error": "file 'missing.txt' not found"}
+    fs.write("empty.txt", "")
+    assert fs.stat("empty.txt")["lines"] == 0
+
+
+def test_read_file_tool_accepts_ranges():
+    fs = VirtualFS()
+    tools = {t.name: t for t in make_file_tools(fs)}
+    fs.write("log.txt", "".join(f"{i}\n" for i in range(1000)))
+
+    assert tools["read_file"].invoke({"path": "log.txt", "offset": 500, "limit": 3}) == "500\n501\n502\n"
+    assert tools["stat_file"].invoke({"path": "log.txt"})["lines"] == 1000
+
+
+def test_grep_returns_bounded_line_matches():
+    fs = VirtualFS()
+    fs.write("notes/a.md", "intro\nThe error code E4711 appeared\nmore text")
+    fs.write("notes/b.md", "no problems here")
+    fs.write("pages/c.md", "ERROR: e4712 timeout\n")
+    fs.write("notes/many.md", "".join(f"hit {i}\n" for i in range(100)))
+
+    result = fs.grep(r"error code E\d+")
+    assert result == {
+        "matches": [{"path": "notes/a.md", "line": 2, "text": "The error code E4711 appeared"}],
+        "truncated": False,
+    }
+    result = fs.grep(r"e471\d", ignore_case=True)
+    assert [(m["path"], m["line"]) for m in result["matches"]] == [("notes/a.md", 2), ("pages/c.md", 1)]
+    assert [m["path"] for m in fs.grep("e471", path_glob="pages/*")["matches"]] == ["pages/c.md"]
+
+    result = fs.grep(r"hit \d+", max_results=10)
+    assert len(result["matches"]) == 10 and result["truncated"]
+    assert fs.grep("(unclosed")["error"].startswith("invalid pattern")
+
+
+def test_grep_sees_writes_edits_and_deletes():
+    fs = VirtualFS()
+    fs.write("a.txt", "alpha beta")
+    assert fs.grep("beta")["matches"]
+    fs.edit("a.txt", [{"find": "beta", "replace": "gamma"}])
+    assert fs.grep("beta")["matches"] == []
+    assert fs.grep("gamma")["matches"][0]["path"] == "a.txt"
+    fs.write("b.txt", "alpha beta")
+    fs.delete("a.txt")
+    assert [m["path"] for m in fs.grep("alpha")["matches"]] == ["b.txt"]
+    assert len(fs.index) == 1
+
+
+def test_index_refresh_does_not_block_writes_or_searches():
+    import threading
+
+    fs = VirtualFS()
+    fs.write("a.txt", "needle one")
+    hashing, release = threading.Event(), threading.Event()
+
+    def slow_read(digest):
+        hashing.set()
+        assert release.wait(5)
+        return fs.blobs.get(digest)
+
+    refresh = threading.Thread(target=fs.index.refresh, args=(slow_read,))
+    refresh.start()
+    assert hashing.wait(5)
+    found = []
+
+    def write_and_search():
+        fs.write("b.txt", "needle two")
+        fs.delete("a.txt")
+        found.extend(m["path"] for m in fs.grep("needle")["matches"])
+
+    writer = threading.Thread(target=write_and_search)
+    writer.start()
+    writer.join(5)
+    blocked = writer.is_alive()
+    release.set()
+    assert not blocked and found == ["b.txt"]
+    refresh.join(5)
+    assert [m["path"] for m in fs.grep("needle two")["matches"]] == ["b.txt"]
+    assert fs.grep("needle one")["matches"] == []
+    assert len(fs.index) == 1
+
+
+def test_grep_snippet_is_cut_around_match_on_long_lines():
+    fs = VirtualFS()
+    fs.write("page.html", "x" * 5000 + "NEEDLE" + "y" * 5000)
+    text = fs.grep("NEEDLE")["matches"][0]["text"]
+    assert "NEEDLE" in text and len(text) <= 200
+
+
+def test_glob_files_lists_matching_paths():
+    fs = VirtualFS()
+    for path in ["results/t1.md", "results/t2.md", "notes/a.txt", "results/raw/t3.json"]:
+        fs.write(path, "x")
+    tools = {t.name: t for t in make_file_tools(fs)}
+    assert tools["glob_files"].invoke({"pattern": "results/*.md"}) == {
+        "paths": ["results/t1.md", "results/t2.md"], "truncated": False,
+    }
+    assert fs.glob("*.json")["paths"] == ["results/raw/t3.json"]
+    assert fs.glob("*", max_results=2) == {"paths": ["notes/a.txt", "results/raw/t3.json"], "truncated": True}
+    assert tools["grep_files"].invoke({"pattern": "x", "path_glob": "notes/*"})["matches"][0]["path"] == "notes/a.txt"
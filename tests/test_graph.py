@@ -18,3 +18,36 @@ def test_graph_has_supervisor_node():
             from agent.graph import build_graph
             graph = build_graph()
             assert "supervisor" in graph.nodes
+
+
+def test_importing_graph_skips_sdks_and_graph_construction():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    probe = (
+        "import sys, agent.graph as g\n"
+        "heavy = [m for m in ('tavily', 'firecrawl', 'langchain_openai', 'openai') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "assert g._graph is None\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", probe],
+        capture_output=True, text=True,
+        cwd=Path(__file__).resolve().parents[1],
+        env={"PYTHONPATH": "src", "OPENROUTER_API_KEY": "test-key"},
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_module_level_graph_is_built_on_first_access(monkeypatch):
+    import agent.graph as graph_module
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "_graph", None)
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        first = graph_module.graph
+        assert "supervisor" in first.nodes
+        assert graph_module.graph is first
@@ -5,7 +5,7 @@ Integration test — runs the full graph with mocked LLM to avoid real API calls
 import json
 from unittest.mock import patch, MagicMock
 from langchain_core.messages import AIMessage
-from agent.graph import build_graph
+from agent.graph import build_async_graph, build_graph
 from agent.state import AgentState
 
 def make_todo(id, desc, status="pending", result=None):
@@ -73,5 +73,194 @@ def test_full_graph_runs_to_completion():
                 result = graph.invoke(initial_state, config={"recursion_limit": 5})
 
     assert result["final_output"] == "All done! Found the info."
+    assert result["artifacts"] == {}
     assert len(result["subagent_logs"]) == 1
     assert result["subagent_logs"][0]["todo_id"] == "t1"
+
+
+async def test_async_graph_runs_to_completion():
+    from unittest.mock import AsyncMock
+
+    responses = [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "update_todo",
+                    "id": "tc-1",
+                    "args": {"items": [make_todo("t1", "Search for info", "pending")]},
+                    "type": "tool_call",
+                },
+                {
+                    "name": "task_tool",
+                    "id": "tc-2",
+                    "args": {
+                        "todo_id": "t1",
+                        "task_description": "Search for info",
+                        "tool_names": ["search_internet"],
+                        "context": "test",
+                    },
+                    "type": "tool_call",
+                },
+            ],
+        ),
+        AIMessage(content="All done! Found the info."),
+    ]
+
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.ainvoke = AsyncMock(side_effect=responses)
+
+    mock_subagent = MagicMock()
+    mock_subagent.ainvoke = AsyncMock(return_value={
+        "messages": [MagicMock(content="Search result: Python is great")]
+    })
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        with patch("agent.subagent.ChatOpenAI"):
+            with patch("agent.subagent.create_react_agent", return_value=mock_subagent):
+                graph = build_async_graph()
+                result = await graph.ainvoke(
+                    {"objective": "Learn about Python"}, config={"recursion_limit": 5}
+                )
+
+    assert result["final_output"] == "All done! Found the info."
+    assert result["todo"][0]["status"] == "done"
+    assert result["subagent_logs"][0]["result"] == "Search result: Python is great"
+
+
+def test_artifacts_accumulate_across_turns_from_deltas():
+    responses = [
+        AIMessage(content="", tool_calls=[{
+            "name": "write_file", "id": "w1", "type": "tool_call",
+            "args": {"path": "a.md", "content": "first"},
+        }]),
+        AIMessage(content="", tool_calls=[{
+            "name": "write_file", "id": "w2", "type": "tool_call",
+            "args": {"path": "b.md", "content": "second"},
+        }]),
+        AIMessage(content="Wrote both files."),
+    ]
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.side_effect = responses
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        graph = build_graph()
+        result = graph.invoke({"objective": "Write files"}, config={"recursion_limit": 5})
+
+    assert result["artifacts"] == {"a.md": "first", "b.md": "second"}
+
+
+def _streaming_subagent_model():
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessageChunk, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class FakeStreamingModel(BaseChatModel):
+        """Calls read_file once, then streams its answer word by word."""
+
+        @property
+        def _llm_type(self) -> str:
+            return "fake-streaming"
+
+        def _reply(self, messages):
+            if isinstance(messages[-1], ToolMessage):
+                return AIMessage(content="Python is great")
+            return AIMessage(content="", tool_calls=[{
+                "name": "read_file", "id": "rf-1", "type": "tool_call", "args": {"path": "notes.md"},
+            }])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            reply = self._reply(messages)
+            if reply.tool_calls:
+                yield ChatGenerationChunk(message=AIMessageChunk(
+                    content="", tool_call_chunks=[{
+                        "name": "read_file", "id": "rf-1", "index": 0,
+                        "args": json.dumps({"path": "notes.md"}),
+                    }],
+                ))
+                return
+            for i, word in enumerate(reply.content.split(" ")):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + word))
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+    return FakeStreamingModel()
+
+
+def _plan_and_run_responses():
+    return [
+        AIMessage(content="", tool_calls=[
+            {
+                "name": "update_todo", "id": "tc-1", "type": "tool_call",
+                "args": {"items": [make_todo("t1", "Search for info", "pending")]},
+            },
+            {
+                "name": "task_tool", "id": "tc-2", "type": "tool_call",
+                "args": {
+                    "todo_id": "t1", "task_description": "Search for info",
+                    "tool_names": ["read_file"], "context": "",
+                },
+            },
+        ]),
+        AIMessage(content="All done!"),
+    ]
+
+
+def test_stream_surfaces_subagent_progress_and_todo_transitions():
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.side_effect = _plan_and_run_responses()
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        with patch("agent.subagent.ChatOpenAI", return_value=_streaming_subagent_model()):
+            graph = build_graph()
+            chunks = list(graph.stream(
+                {"objective": "Learn about Python"},
+                config={"recursion_limit": 5, "configurable": {"stream_subagents": True}},
+                stream_mode=["custom", "updates"],
+            ))
+
+    custom = [chunk for mode, chunk in chunks if mode == "custom"]
+    assert custom[0] == {"type": "todo_status", "todo_id": "t1", "status": "in_progress"}
+    assert custom[1]["type"] == "subagent_tool_call" and custom[1]["name"] == "read_file"
+    assert custom[2]["type"] == "subagent_tool_result"
+    tokens = [e["content"] for e in custom if e["type"] == "subagent_token"]
+    assert "".join(tokens) == "Python is great" and len(tokens) == 3
+    assert custom[-1] == {
+        "type": "todo_status", "todo_id": "t1", "status": "done", "result": "Python is great",
+    }
+    # Progress arrives before the supervisor step that ran the subagent reports its update.
+    first_update = next(i for i, (mode, _) in enumerate(chunks) if mode == "updates")
+    assert all(mode == "custom" for mode, _ in chunks[:first_update])
+
+
+async def test_astream_events_reports_todo_transitions():
+    from unittest.mock import AsyncMock
+
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.ainvoke = AsyncMock(side_effect=_plan_and_run_responses())
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        with patch("agent.subagent.ChatOpenAI", return_value=_streaming_subagent_model()):
+            graph = build_async_graph()
+            events = [
+                event async for event in graph.astream_events(
+                    {"objective": "Learn about Python"},
+                    config={"recursion_limit": 5},
+                    version="v2",
+                )
+            ]
+
+    transitions = [e["data"]["status"] for e in events if e["event"] == "on_custom_event"]
+    assert transitions == ["in_progress", "done"]
+    streamed = "".join(
+        e["data"]["chunk"].content for e in events if e["event"] == "on_chat_model_stream"
+    )
+    assert "Python is great" in streamed
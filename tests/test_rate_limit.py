@@ -0,0 +1,187 @@
+"""
+Tests for the process-wide LLM rate limiter, against a local fake endpoint.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_openai import ChatOpenAI
+
+from agent.clients import shared_async_http_client, shared_http_client
+from agent.rate_limit import ModelLimiter, RateLimits, get_rate_limiter, limits_from_env
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_429_halves_concurrency_once_and_pauses_for_retry_after():
+    clock = FakeClock()
+    limiter = ModelLimiter(RateLimits(initial_concurrency=8), clock)
+    permits = [limiter.acquire(10) for _ in range(8)]
+    clock.now += 1
+    limiter.release(permits[0], 429, retry_after=2)
+    limiter.release(permits[1], 429)  # sent before the decrease: no second cut
+    assert limiter.concurrency == 4
+    assert limiter.paused_until == clock.now + 2
+    assert limiter.stats()["throttled"] == 2
+
+
+def test_success_grows_concurrency_only_when_saturated():
+    clock = FakeClock()
+    limiter = ModelLimiter(RateLimits(initial_concurrency=2, max_concurrency=3), clock)
+    limiter.release(limiter.acquire(10), 200)
+    assert limiter.concurrency == 2  # one call in flight never hit the limit
+    for _ in range(10):
+        first, second = limiter.acquire(10), limiter.acquire(10)
+        limiter.release(first, 200)
+        limiter.release(second, 200)
+    assert limiter.concurrency == 3
+
+
+def test_latency_spike_shrinks_concurrency():
+    clock = FakeClock()
+    limiter = ModelLimiter(RateLimits(initial_concurrency=10, latency_tolerance=3), clock)
+    permit = limiter.acquire(10)
+    clock.now += 1
+    limiter.release(permit, 200)
+    permit = limiter.acquire(10)
+    clock.now += 5
+    limiter.release(permit, 200)
+    assert limiter.concurrency == pytest.approx(9)
+
+
+def test_varied_latency_without_429s_keeps_concurrency_by_default():
+    import random
+
+    clock = FakeClock()
+    limiter = ModelLimiter(RateLimits(initial_concurrency=8, max_concurrency=8), clock)
+    rng = random.Random(0)
+    for _ in range(50):
+        permits = [limiter.acquire(10) for _ in range(int(limiter.concurrency))]
+        for permit in permits:
+            clock.now += rng.uniform(1, 20)  # short and long completions alike
+            limiter.release(permit, 200)
+    assert limiter.concurrency == 8
+
+
+def test_token_bucket_refunds_unused_tokens_and_waits_when_empty():
+    limiter = ModelLimiter(RateLimits(tpm=60_000))  # 1000 tokens/s
+    limiter.release(limiter.acquire(60_000), 200, used_tokens=1_000)
+    start = time.monotonic()
+    limiter.release(limiter.acquire(59_000), 200)
+    assert time.monotonic() - start < 0.1
+    limiter.acquire(200)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_limits_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_RPM", "100")
+    monkeypatch.setenv("LLM_RATE_LIMITS", "a/model=20/5000, b=30")
+    default, per_model = limits_from_env()
+    assert default.rpm == 100 and default.tpm == 0
+    assert (per_model["a/model"].rpm, per_model["a/model"].tpm) == (20, 5000)
+    assert (per_model["b"].rpm, per_model["b"].tpm) == (30, 0)
+
+
+# --------------------------------------------------------------------------- #
+# Fake OpenAI-compatible endpoint that allows MAX_ACTIVE concurrent requests
+# --------------------------------------------------------------------------- #
+
+MAX_ACTIVE = 4
+
+
+class FakeProvider(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.served = 0
+        self.throttled = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            admitted = server.active < MAX_ACTIVE
+            if admitted:
+                server.active += 1
+            else:
+                server.throttled += 1
+        if not admitted:
+            self.reply(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0.1"})
+            return
+        time.sleep(0.05)
+        with server.lock:
+            server.active -= 1
+            server.served += 1
+        self.reply(200, {
+            "id": "cmpl", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "pong"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+        })
+
+    def reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def provider():
+    server = FakeProvider()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fake_llm(provider, model, **clients):
+    return ChatOpenAI(model=model, base_url=provider.base_url, api_key="test", max_retries=10, **clients)
+
+
+def test_shared_client_backs_off_to_provider_concurrency(provider):
+    llm = fake_llm(provider, "fake/sync", http_client=shared_http_client())
+    with ThreadPoolExecutor(32) as pool:
+        replies = list(pool.map(lambda _: llm.invoke("ping").content, range(32)))
+    assert replies == ["pong"] * 32
+    assert provider.served == 32
+    # Without the limiter the same burst draws about 50 429s.
+    assert provider.throttled < 16
+    stats = get_rate_limiter().stats()["fake/sync"]
+    assert stats["in_flight"] == 0
+    assert stats["concurrency"] <= MAX_ACTIVE + 2
+
+
+async def test_async_shared_client_backs_off_to_provider_concurrency(provider):
+    llm = fake_llm(provider, "fake/async", http_async_client=shared_async_http_client())
+    replies = await asyncio.gather(*(llm.ainvoke("ping") for _ in range(32)))
+    assert [reply.content for reply in replies] == ["pong"] * 32
+    assert provider.throttled < 16
+    assert get_rate_limiter().stats()["fake/async"]["in_flight"] == 0
@@ -36,3 +36,26 @@ def test_all_tools_listed():
     assert "execute_code" in all_names
     assert "search_internet" in all_names
     assert "web_scrape" in all_names
+    assert "web_scrape_many" in all_names
+
+
+def test_tool_factories_run_on_first_use_only():
+    from unittest.mock import MagicMock
+
+    registry = ToolRegistry(VirtualFS())
+    assert registry.loaded_tools() == []
+
+    factory = MagicMock(return_value=[])
+    stub = MagicMock()
+    stub.name = "stub_tool"
+    factory.return_value = [stub]
+    registry.register_factory(["stub_tool"], factory)
+    assert "stub_tool" in registry.available_tools()
+    factory.assert_not_called()
+
+    assert registry.get_tools(["stub_tool", "stub_tool"]) == [stub, stub]
+    factory.assert_called_once()
+
+    registry.get_tools(["web_scrape"])
+    # The whole web group is built together and shares its clients/caches.
+    assert set(registry.loaded_tools()) == {"stub_tool", "search_internet", "web_scrape", "web_scrape_many"}
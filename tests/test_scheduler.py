@@ -0,0 +1,312 @@
+"""
+Tests for the dependency-aware TODO scheduler, with mocked LLMs and no network.
+"""
+import threading
+from unittest.mock import MagicMock, patch
+
+from langchain_core.messages import AIMessage
+
+from langgraph.types import Send
+
+from agent.checkpoint import build_durable_graph, resume_run, thread_config
+from agent.graph import build_async_graph, build_graph
+from agent.scheduler import (
+    DEPENDENCY_RESULT_MAX_WORDS,
+    blocked_items,
+    build_scheduler_node,
+    dependency_context,
+    ready_items,
+)
+from tools.file_tools import VirtualFS
+from tools.registry import ToolRegistry
+
+
+def make_todo(id, desc, status="pending", result=None, **extra):
+    return {"id": id, "description": desc, "status": status, "result": result, **extra}
+
+
+def ids(items):
+    return [item["id"] for item in items]
+
+
+def test_ready_items_waits_for_dependencies():
+    todo = [
+        make_todo("a", "fetch"),
+        make_todo("b", "analyse", depends_on=["a"]),
+        make_todo("c", "other"),
+    ]
+    assert ids(ready_items(todo)) == ["a", "c"]
+    todo[0].update(status="done", result="A")
+    assert ids(ready_items(todo)) == ["b", "c"]
+
+
+def test_ready_items_skips_in_progress_and_done():
+    todo = [make_todo("a", "x", status="in_progress"), make_todo("b", "y", status="done")]
+    assert ready_items(todo) == []
+
+
+def test_blocked_items_detects_unknown_and_circular_dependencies():
+    todo = [
+        make_todo("a", "fetch"),
+        make_todo("b", "needs a", depends_on=["a"]),
+        make_todo("c", "needs ghost", depends_on=["ghost"]),
+        make_todo("d", "needs c", depends_on=["c"]),
+        make_todo("e", "cycle", depends_on=["f"]),
+        make_todo("f", "cycle", depends_on=["e"]),
+    ]
+    assert ids(blocked_items(todo)) == ["c", "d", "e", "f"]
+
+
+def test_dependency_context_includes_compressed_results():
+    long_result = " ".join(f"word{i}" for i in range(DEPENDENCY_RESULT_MAX_WORDS * 3))
+    todo = [
+        make_todo("a", "fetch", status="done", result=long_result),
+        make_todo("b", "analyse", depends_on=["a"], context="Focus on costs."),
+    ]
+    context = dependency_context(todo[1], todo)
+    assert context.startswith("Focus on costs.")
+    assert "Result of a (fetch):" in context
+    assert len(context.split()) < DEPENDENCY_RESULT_MAX_WORDS * 2
+
+
+def test_dependency_context_keeps_full_result_reference():
+    summary = " ".join(f"word{i}" for i in range(300)) + "\n\n[Full result: results/a.md]"
+    todo = [
+        make_todo("a", "fetch", status="done", result=summary),
+        make_todo("b", "analyse", depends_on=["a"]),
+    ]
+    context = dependency_context(todo[1], todo)
+    assert context.endswith("\n[Full result: results/a.md]")
+    assert len(context.split()) < DEPENDENCY_RESULT_MAX_WORDS + 20
+
+
+def research_result(topic: str) -> str:
+    sentences = [
+        f"Source {i} on {topic} reports that adoption grew {10 + i}% in 2024 across "
+        f"mid-sized firms in Europe, North America and Asia, driven by lower costs."
+        for i in range(16)
+    ]
+    return " ".join(sentences) + f"\n\n[Full result: results/{topic}.md]"
+
+
+def test_synthesis_over_many_research_items_fits_the_subagent_budget():
+    from context.tokens import count_tokens
+
+    topics = [f"topic{i}" for i in range(6)]
+    todo = [make_todo(t, f"research {t}", status="done", result=research_result(t)) for t in topics]
+    todo.append(make_todo("final", "synthesise the findings", depends_on=topics,
+                          context="Write for an executive audience."))
+    assert sum(count_tokens(item["result"]) for item in todo[:-1]) > 2400
+
+    subagent = MagicMock()
+    subagent.invoke.return_value = {"messages": [MagicMock(content="Synthesis done.")]}
+    with patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        dispatch, run_task = build_scheduler_node(ToolRegistry(VirtualFS()))
+        (send,) = dispatch({"todo": todo})
+        updates = run_task(send.arg)
+
+    assert updates["todo"][0]["status"] == "done"
+    assert updates["todo"][0]["result"] == "Synthesis done."
+    system = subagent.invoke.call_args.args[0]["messages"][0][1]
+    assert system.count("Result of topic") == 6
+    assert all(f"[Full result: results/{t}.md]" in system for t in topics)
+
+
+def test_blocked_items_includes_dependents_of_failed_items():
+    todo = [
+        make_todo("a", "fetch", status="failed", result="Error: context budget exceeded"),
+        make_todo("b", "needs a", depends_on=["a"]),
+        make_todo("c", "independent"),
+    ]
+    assert ids(blocked_items(todo)) == ["b"]
+    assert ids(ready_items(todo)) == ["c"]
+
+
+def test_dispatch_sends_each_ready_item_or_hands_back():
+    with patch("agent.subagent.ChatOpenAI"), patch("agent.subagent.create_react_agent"):
+        dispatch, _ = build_scheduler_node(ToolRegistry(VirtualFS()))
+    sends = dispatch({"todo": [make_todo("a", "x", tools=["read_file"]), make_todo("b", "y")]})
+    assert all(isinstance(send, Send) and send.node == "run_task" for send in sends)
+    assert [send.arg["todo_id"] for send in sends] == ["a", "b"]
+    assert sends[0].arg["tool_names"] == ["read_file"]
+    assert dispatch({"todo": [make_todo("a", "x", status="done")]}) == "supervisor"
+
+
+def plan_then_finish():
+    llm = MagicMock()
+    llm.bind_tools.return_value = llm
+    llm.invoke.side_effect = [
+        AIMessage(content="", tool_calls=[{
+            "name": "update_todo", "id": "u1", "type": "tool_call",
+            "args": {"items": [
+                make_todo("a", "fetch data", tools=["read_file"]),
+                make_todo("b", "analyse data", depends_on=["a"]),
+                make_todo("c", "write intro"),
+            ]},
+        }]),
+        AIMessage(content="Report ready."),
+    ]
+    return llm
+
+
+def scripted_subagent(prompts, barrier):
+    def run(agent_input):
+        (_, system), (_, task) = agent_input["messages"]
+        prompts[task] = system
+        if task in ("fetch data", "write intro"):
+            barrier.wait()  # both independent items must be in flight together
+        return {"messages": [MagicMock(content=f"{task} result")]}
+    return run
+
+
+def initial_state():
+    return {"objective": "Write a report", "todo": [], "artifacts": {}, "subagent_logs": [],
+            "token_usage": {"total_used": 0, "per_subagent_limit": 4096},
+            "final_output": None, "messages": []}
+
+
+def test_graph_runs_dag_with_one_planning_call():
+    llm = plan_then_finish()
+    prompts: dict[str, str] = {}
+    subagent = MagicMock()
+    subagent.invoke.side_effect = scripted_subagent(prompts, threading.Barrier(2, timeout=5))
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        result = build_graph().invoke(initial_state(), config={"recursion_limit": 10})
+
+    assert result["final_output"] == "Report ready."
+    assert llm.invoke.call_count == 2
+    assert sorted(log["todo_id"] for log in result["subagent_logs"]) == ["a", "b", "c"]
+    assert [log["todo_id"] for log in result["subagent_logs"]][-1] == "b"
+    assert all(item["status"] == "done" for item in result["todo"])
+    assert "Result of a (fetch data):\nfetch data result" in prompts["analyse data"]
+    logs = {log["todo_id"]: log for log in result["subagent_logs"]}
+    assert logs["a"]["tools"] == ["read_file"]
+    assert "search_internet" in logs["c"]["tools"]
+
+
+async def test_async_graph_runs_dag_with_one_planning_call():
+    llm = plan_then_finish()
+    seen: list[str] = []
+
+    async def ainvoke(agent_input):
+        (_, system), (_, task) = agent_input["messages"]
+        seen.append(task)
+        if task == "analyse data":
+            assert "fetch data result" in system
+        return {"messages": [MagicMock(content=f"{task} result")]}
+
+    async def supervisor_ainvoke(messages):
+        return llm.invoke(messages)
+
+    llm.ainvoke = supervisor_ainvoke
+    subagent = MagicMock()
+    subagent.ainvoke.side_effect = ainvoke
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        result = await build_async_graph().ainvoke(initial_state(), config={"recursion_limit": 10})
+
+    assert result["final_output"] == "Report ready."
+    assert llm.invoke.call_count == 2
+    assert sorted(seen[:2]) == ["fetch data", "write intro"]
+    assert seen[2] == "analyse data"
+
+
+def test_error_result_fails_item_and_returns_to_supervisor():
+    llm = MagicMock()
+    llm.bind_tools.return_value = llm
+    llm.invoke.side_effect = [
+        AIMessage(content="", tool_calls=[{
+            "name": "update_todo", "id": "u1", "type": "tool_call",
+            "args": {"items": [
+                make_todo("a", "fetch data", context="background " * 5000),
+                make_todo("b", "analyse data", depends_on=["a"]),
+                make_todo("c", "write intro"),
+            ]},
+        }]),
+        AIMessage(content="Gave up on the data."),
+    ]
+    subagent = MagicMock()
+    subagent.invoke.return_value = {"messages": [MagicMock(content="ok")]}
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        result = build_graph().invoke(initial_state(), config={"recursion_limit": 10})
+
+    todo = {item["id"]: item for item in result["todo"]}
+    assert todo["a"]["status"] == "failed"
+    assert todo["a"]["result"].startswith("Error: context budget exceeded")
+    assert todo["b"]["status"] == "pending"  # never dispatched with the error as input
+    assert todo["c"]["status"] == "done"
+    assert subagent.invoke.call_count == 1
+    replan_prompt = str(llm.invoke.call_args_list[1].args[0])
+    assert "Failed (see their result): a" in replan_prompt
+    assert "dependencies: b" in replan_prompt
+
+
+def test_unknown_tools_are_dropped_and_raising_subagent_fails_its_item():
+    subagent = MagicMock()
+    subagent.invoke.side_effect = RuntimeError("backend unavailable")
+    with patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        dispatch, run_task = build_scheduler_node(ToolRegistry(VirtualFS()))
+        (send,) = dispatch({"todo": [make_todo("a", "search", tools=["web_search", "read_file"])]})
+        assert send.arg["tool_names"] == ["read_file"]
+        updates = run_task(send.arg)
+
+    item = updates["todo"][0]
+    assert item["status"] == "failed"
+    assert item["result"] == "Error: subagent crashed — RuntimeError: backend unavailable"
+
+
+class ProcessDied(BaseException):
+    """Stands in for the process being killed; the scheduler only turns Exceptions into failed items."""
+
+
+def test_crash_keeps_finished_siblings_for_resume(tmp_path):
+    db = str(tmp_path / "runs.sqlite")
+    llm = plan_then_finish()
+    runs: list[str] = []
+
+    def crash_on_intro(agent_input):
+        task = agent_input["messages"][1][1]
+        runs.append(task)
+        if task == "write intro":
+            raise ProcessDied()
+        return {"messages": [MagicMock(content=f"{task} result")]}
+
+    subagent = MagicMock()
+    subagent.invoke.side_effect = crash_on_intro
+    with patch("agent.supervisor.ChatOpenAI", return_value=llm), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        graph, _ = build_durable_graph(db)
+        try:
+            graph.invoke(initial_state(), thread_config("run-dag"))
+        except ProcessDied:
+            pass
+    assert sorted(runs) == ["fetch data", "write intro"]
+
+    resumed = MagicMock()
+    resumed.bind_tools.return_value = resumed
+    resumed.invoke.return_value = AIMessage(content="Report ready.")
+    runs.clear()
+    subagent.invoke.side_effect = lambda agent_input: (
+        runs.append(agent_input["messages"][1][1])
+        or {"messages": [MagicMock(content="ok")]}
+    )
+    with patch("agent.supervisor.ChatOpenAI", return_value=resumed), \
+            patch("agent.subagent.ChatOpenAI"), \
+            patch("agent.subagent.create_react_agent", return_value=subagent):
+        result = resume_run("run-dag", db, recursion_limit=10)
+
+    # "fetch data" finished before the crash; its write was kept and it is not rerun.
+    assert runs == ["write intro", "analyse data"]
+    assert result["final_output"] == "Report ready."
+    assert all(item["status"] == "done" for item in result["todo"])
@@ -0,0 +1,34 @@
+# tests/test_search_index.py
+from tools.search_index import TrigramIndex, required_trigrams
+
+
+def test_required_trigrams_come_from_mandatory_literals():
+    assert required_trigrams("error code") == {
+        "err", "rro", "ror", "or ", "r c", " co", "cod", "ode",
+    }
+    assert required_trigrams(r"E47(11|12)") == {"e47"}
+    assert required_trigrams(r"(?:abc)+x?") == {"abc"}
+    assert required_trigrams(r"foo|bar") == frozenset()
+    assert required_trigrams(r"\d{5}") == frozenset()
+    assert required_trigrams("(unclosed") == frozenset()
+
+
+def test_index_narrows_candidates_and_tracks_removal():
+    texts = {
+        "d1": "The quick brown fox jumps",
+        "d2": "lazy dogs sleep all day",
+        "d3": "QUICK BROWN bread",
+    }
+    index = TrigramIndex()
+    for digest in texts:
+        index.add(digest)
+    # Queued blobs are always candidates until they are hashed.
+    assert index.candidates("lazy dogs sleep") == {"d1", "d2", "d3"}
+    index.refresh(texts.__getitem__)
+
+    assert index.candidates("quick brown") == {"d1", "d3"}
+    assert index.candidates("lazy dogs sleep") == {"d2"}
+    assert index.candidates("a|b") is None
+    index.discard("d1")
+    assert index.candidates("quick brown") == {"d3"}
+    assert len(index) == 2
@@ -33,3 +33,76 @@ def test_subagent_log_structure():
         "tokens_used": 512,
     }
     assert log["tokens_used"] == 512
+
+def test_merge_artifacts_applies_delta_without_mutating_inputs():
+    from agent.state import merge_artifacts
+
+    current = {"keep.md": "k", "old.md": "o"}
+    merged = merge_artifacts(current, {"old.md": None, "new.md": "n"})
+    assert merged == {"keep.md": "k", "new.md": "n"}
+    assert current == {"keep.md": "k", "old.md": "o"}
+    assert merge_artifacts(None, None) == {}
+
+def test_upsert_todo_merges_by_id():
+    from agent.state import TODO_REMOVE_KEY, upsert_todo
+
+    current = [
+        {"id": "a", "description": "A", "status": "pending", "result": None},
+        {"id": "b", "description": "B", "status": "pending", "result": None},
+    ]
+    merged = upsert_todo(current, [
+        {"id": "b", "status": "done", "result": "ok"},
+        {"id": "c", "description": "C", "status": "pending", "result": None},
+        {"id": "a", TODO_REMOVE_KEY: True},
+    ])
+    assert merged == [
+        {"id": "b", "description": "B", "status": "done", "result": "ok"},
+        {"id": "c", "description": "C", "status": "pending", "result": None},
+    ]
+    assert current[1]["status"] == "pending"
+    cleared = upsert_todo(merged, [{"id": "b", "_clear": ["result", "missing"]}])
+    assert cleared[0] == {"id": "b", "description": "B", "status": "done"}
+
+def test_log_and_token_reducers_accumulate_deltas():
+    from agent.state import append_logs, merge_token_usage
+
+    assert append_logs([{"todo_id": "a"}], [{"todo_id": "b"}]) == [{"todo_id": "a"}, {"todo_id": "b"}]
+    usage = merge_token_usage(None, {"total_used": 5})
+    usage = merge_token_usage(usage, {"total_used": 7})
+    assert usage == {"total_used": 12, "per_subagent_limit": 4096}
+    assert merge_token_usage(usage, {"per_subagent_limit": 8192})["per_subagent_limit"] == 8192
+
+def test_parallel_branch_updates_merge_without_lost_writes():
+    from typing import Annotated
+    from typing_extensions import TypedDict
+    from langgraph.graph import StateGraph, START, END
+    from agent.state import append_logs, merge_token_usage, upsert_todo
+
+    class S(TypedDict):
+        todo: Annotated[list, upsert_todo]
+        subagent_logs: Annotated[list, append_logs]
+        token_usage: Annotated[dict, merge_token_usage]
+
+    def branch(todo_id):
+        def node(state):
+            return {
+                "todo": [{"id": todo_id, "status": "done"}],
+                "subagent_logs": [{"todo_id": todo_id}],
+                "token_usage": {"total_used": 10},
+            }
+        return node
+
+    builder = StateGraph(S)
+    for todo_id in ("a", "b"):
+        builder.add_node(todo_id, branch(todo_id))
+        builder.add_edge(START, todo_id)
+        builder.add_edge(todo_id, END)
+    result = builder.compile().invoke({
+        "todo": [{"id": "a", "status": "pending"}, {"id": "b", "status": "pending"}],
+        "subagent_logs": [],
+        "token_usage": {"total_used": 0, "per_subagent_limit": 4096},
+    })
+
+    assert [item["status"] for item in result["todo"]] == ["done", "done"]
+    assert sorted(log["todo_id"] for log in result["subagent_logs"]) == ["a", "b"]
+    assert result["token_usage"]["total_used"] == 20
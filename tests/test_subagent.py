@@ -2,7 +2,7 @@
 from unittest.mock import patch, MagicMock
 from tools.file_tools import VirtualFS
 from tools.registry import ToolRegistry
-from agent.subagent import build_task_tool
+from agent.subagent import SubagentExecutorCache, build_task_tool
 
 def test_task_tool_is_callable():
     fs = VirtualFS()
@@ -36,15 +36,10 @@ def test_task_tool_prompt_contains_required_sections():
     fs = VirtualFS()
     registry = ToolRegistry(fs)
 
-    captured = {}
-
-    def fake_create_react_agent(model, tools, prompt):
-        captured["prompt"] = prompt
-        mock_agent = MagicMock()
-        mock_agent.invoke.return_value = {"messages": [MagicMock(content="ok")]}
-        return mock_agent
+    mock_agent = MagicMock()
+    mock_agent.invoke.return_value = {"messages": [MagicMock(content="ok")]}
 
-    with patch("agent.subagent.create_react_agent", side_effect=fake_create_react_agent):
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
         with patch("agent.subagent.ChatOpenAI"):
             task_tool = build_task_tool(registry)
             task_tool.invoke({
@@ -54,8 +49,225 @@ def test_task_tool_prompt_contains_required_sections():
                 "context": "Focus on assignment constraints",
             })
 
-    prompt = captured["prompt"]
+    role, prompt = mock_agent.invoke.call_args.args[0]["messages"][0]
+    assert role == "system"
     assert "Scope:" in prompt
     assert "Success criteria:" in prompt
     assert "Constraints:" in prompt
     assert "Available tools:" in prompt
+
+
+def test_task_tool_reuses_executor_for_same_tool_set():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+
+    mock_agent = MagicMock()
+    mock_agent.invoke.return_value = {"messages": [MagicMock(content="ok")]}
+
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent) as create:
+        with patch("agent.subagent.ChatOpenAI") as chat_cls:
+            cache = SubagentExecutorCache(registry)
+            task_tool = build_task_tool(registry, executor_cache=cache)
+            for todo_id, tools in [("a", ["read_file", "write_file"]),
+                                   ("b", ["write_file", "read_file"]),
+                                   ("c", ["execute_code"])]:
+                task_tool.invoke({
+                    "todo_id": todo_id,
+                    "task_description": f"Task {todo_id}",
+                    "tool_names": tools,
+                })
+
+    assert create.call_count == 2
+    assert chat_cls.call_count == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+    prompts = [c.args[0]["messages"][0][1] for c in mock_agent.invoke.call_args_list]
+    assert "TODO ID: b" in prompts[1]
+
+
+def test_executor_cache_evicts_least_recently_used():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+
+    with patch("agent.subagent.create_react_agent", side_effect=lambda **kw: MagicMock()) as create:
+        with patch("agent.subagent.ChatOpenAI"):
+            cache = SubagentExecutorCache(registry, maxsize=2)
+            first = cache.get(["read_file"])
+            cache.get(["write_file"])
+            assert cache.get(["read_file"]) is first
+            cache.get(["execute_code"])  # evicts write_file
+            cache.get(["write_file"])
+
+    assert create.call_count == 4
+
+
+async def test_task_tool_ainvoke_awaits_subagent():
+    from unittest.mock import AsyncMock
+
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+
+    mock_agent = MagicMock()
+    mock_agent.ainvoke = AsyncMock(return_value={"messages": [MagicMock(content="async done")]})
+
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
+        with patch("agent.subagent.ChatOpenAI"):
+            task_tool = build_task_tool(registry)
+            result = await task_tool.ainvoke({
+                "todo_id": "task-1",
+                "task_description": "Search for Python info",
+                "tool_names": ["search_internet"],
+            })
+
+    assert result == "async done"
+    mock_agent.ainvoke.assert_awaited_once()
+    mock_agent.invoke.assert_not_called()
+
+
+def _system_prompt_for(registry, **task):
+    mock_agent = MagicMock()
+    mock_agent.invoke.return_value = {"messages": [MagicMock(content="ok")]}
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
+        with patch("agent.subagent.ChatOpenAI"):
+            build_task_tool(registry).invoke({"tool_names": ["read_file"], "context": "", **task})
+    return mock_agent.invoke.call_args.args[0]["messages"][0][1]
+
+
+def test_stable_layout_shares_static_prefix_across_tasks():
+    from agent.subagent import SUBAGENT_SYSTEM_PREFIX
+
+    registry = ToolRegistry(VirtualFS())
+    first = _system_prompt_for(registry, todo_id="a", task_description="Find X")
+    second = _system_prompt_for(registry, todo_id="b", task_description="Find Y")
+    assert first.startswith(SUBAGENT_SYSTEM_PREFIX)
+    assert second.startswith(SUBAGENT_SYSTEM_PREFIX)
+    assert "TODO ID: a" in first and "TODO ID: b" in second
+
+
+def test_cache_control_marks_static_prefix(monkeypatch):
+    from agent.subagent import SUBAGENT_SYSTEM_PREFIX
+
+    monkeypatch.setenv("PROMPT_CACHE_CONTROL", "1")
+    blocks = _system_prompt_for(
+        ToolRegistry(VirtualFS()), todo_id="a", task_description="Find X"
+    )
+    assert blocks[0] == {
+        "type": "text", "text": SUBAGENT_SYSTEM_PREFIX, "cache_control": {"type": "ephemeral"},
+    }
+    assert "cache_control" not in blocks[1]
+    assert "TODO ID: a" in blocks[1]["text"]
+
+
+def test_legacy_layout_puts_scope_first(monkeypatch):
+    monkeypatch.setenv("PROMPT_LAYOUT", "legacy")
+    monkeypatch.setenv("PROMPT_CACHE_CONTROL", "1")
+    prompt = _system_prompt_for(ToolRegistry(VirtualFS()), todo_id="a", task_description="Find X")
+    assert isinstance(prompt, str)
+    assert prompt.index("TODO ID: a") < prompt.index("Success criteria:")
+
+
+def test_task_tool_records_subagent_latency():
+    from evaluation.metrics import MetricCollector
+
+    metrics = MetricCollector()
+    registry = ToolRegistry(VirtualFS(), metrics=metrics)
+    mock_agent = MagicMock()
+    mock_agent.invoke.return_value = {"messages": [MagicMock(content="ok")]}
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
+        with patch("agent.subagent.ChatOpenAI"):
+            build_task_tool(registry).invoke(
+                {"todo_id": "a", "task_description": "x", "tool_names": []}
+            )
+    assert metrics.to_dict()["histograms"]["subagent_seconds"]["count"] == 1
+
+
+def test_task_tool_summarizes_long_result_and_keeps_full_text(monkeypatch):
+    monkeypatch.setenv("SUBAGENT_RESULT_MAX_TOKENS", "60")
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+    full = (
+        "Revenue grew 12% to $4.2M in 2024. "
+        + "The team reviewed many ordinary details of the process. " * 40
+        + "Raw data is in data/revenue.csv."
+    )
+    mock_agent = MagicMock()
+    mock_agent.invoke.return_value = {"messages": [MagicMock(content=full)]}
+
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
+        with patch("agent.subagent.ChatOpenAI"):
+            task_tool = build_task_tool(registry)
+            result = task_tool.invoke({
+                "todo_id": "t/1",
+                "task_description": "Summarize revenue",
+                "tool_names": ["read_file"],
+            })
+
+    assert result.endswith("[Full result: results/t_1.md]")
+    assert "12%" in result and "data/revenue.csv" in result
+    assert len(result) < len(full) // 4
+    assert fs.read("results/t_1.md") == full
+    assert registry.artifact_changes() == {"results/t_1.md": full}
+
+
+def test_task_tool_returns_short_result_unchanged():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+    mock_agent = MagicMock()
+    mock_agent.invoke.return_value = {"messages": [MagicMock(content="Short answer.")]}
+
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
+        with patch("agent.subagent.ChatOpenAI"):
+            result = build_task_tool(registry).invoke({
+                "todo_id": "t1", "task_description": "x", "tool_names": [],
+            })
+    assert result == "Short answer."
+    assert fs.snapshot() == {}
+
+
+def test_task_tool_context_includes_relevant_facts_from_earlier_tasks():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+    mock_agent = MagicMock()
+    mock_agent.invoke.side_effect = [
+        {"messages": [MagicMock(content="Acme charges $20 per seat for its pricing tier.")]},
+        {"messages": [MagicMock(content="The office has a blue door.")]},
+        {"messages": [MagicMock(content="ok")]},
+    ]
+
+    with patch("agent.subagent.create_react_agent", return_value=mock_agent):
+        with patch("agent.subagent.ChatOpenAI"):
+            task_tool = build_task_tool(registry)
+            for todo_id, description in [
+                ("t1", "Research Acme pricing"),
+                ("t2", "Describe the office"),
+                ("t3", "Compare our pricing with Acme"),
+            ]:
+                task_tool.invoke({
+                    "todo_id": todo_id, "task_description": description, "tool_names": [],
+                })
+
+    _, prompt = mock_agent.invoke.call_args.args[0]["messages"][0]
+    assert "Relevant facts from earlier tasks:" in prompt
+    assert "- t1 (Research Acme pricing): Acme charges $20 per seat" in prompt
+    assert "blue door" not in prompt
+
+
+def test_executor_cache_drops_executors_of_finished_loops():
+    import asyncio
+    import gc
+
+    registry = ToolRegistry(VirtualFS())
+
+    async def lookup(cache):
+        return cache.get(["read_file"], loop=asyncio.get_running_loop())
+
+    with patch("agent.subagent.create_react_agent", side_effect=lambda **kw: MagicMock()), \
+            patch("agent.subagent.ChatOpenAI"):
+        cache = SubagentExecutorCache(registry)
+        sync_executor = cache.get(["read_file"])
+        first = asyncio.run(lookup(cache))
+        second = asyncio.run(lookup(cache))
+        gc.collect()
+
+    assert first is not second
+    assert cache.get(["read_file"]) is sync_executor
+    assert len(cache._loop_caches) == 0
@@ -1,9 +1,9 @@
 # tests/test_supervisor.py
 from unittest.mock import patch, MagicMock
-from agent.state import AgentState
+from agent.state import AgentState, append_logs, merge_token_usage, upsert_todo
 from tools.file_tools import VirtualFS
 from tools.registry import ToolRegistry
-from agent.supervisor import build_supervisor_node, should_continue
+from agent.supervisor import build_async_supervisor_node, build_supervisor_node, should_continue
 
 def make_state(**kwargs) -> AgentState:
     defaults: AgentState = {
@@ -18,10 +18,17 @@ def make_state(**kwargs) -> AgentState:
     defaults.update(kwargs)
     return defaults
 
-def test_should_continue_when_todo_pending():
+def test_should_continue_schedules_ready_todo():
     state = make_state(todo=[
         {"id": "1", "description": "task", "status": "pending", "result": None}
     ])
+    assert should_continue(state) == "schedule"
+
+def test_should_continue_when_todo_blocked():
+    state = make_state(todo=[
+        {"id": "1", "description": "task", "status": "pending", "result": None,
+         "depends_on": ["missing"]}
+    ])
     assert should_continue(state) == "continue"
 
 def test_should_continue_when_all_done_but_no_final_output():
@@ -139,3 +146,336 @@ def test_supervisor_can_execute_shared_file_tools():
         result = supervisor_node(make_state())
 
     assert result["artifacts"]["notes.txt"] == "hello"
+
+
+def test_supervisor_can_search_shared_files():
+    fs = VirtualFS()
+    fs.write("results/t1.md", "Revenue grew 12% in Q3")
+    registry = ToolRegistry(fs)
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [
+        {"name": "grep_files", "id": "tc-grep-1", "args": {"pattern": r"grew \d+%"}},
+        {"name": "glob_files", "id": "tc-glob-1", "args": {"pattern": "results/*"}},
+    ]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = mock_response
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        supervisor_node = build_supervisor_node(registry)
+        result = supervisor_node(make_state())
+
+    grep, glob = [m for m in result["messages"] if m.tool_call_id in ("tc-grep-1", "tc-glob-1")]
+    assert '"path": "results/t1.md"' in grep.content
+    assert '"paths": ["results/t1.md"]' in glob.content
+
+
+def _task_call(call_id: str, todo_id: str) -> dict:
+    return {
+        "name": "task_tool",
+        "id": call_id,
+        "args": {
+            "todo_id": todo_id,
+            "task_description": f"Work on {todo_id}",
+            "tool_names": [],
+            "context": "",
+        },
+    }
+
+
+def test_task_tool_calls_in_one_turn_run_concurrently():
+    import threading
+
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+    barrier = threading.Barrier(3, timeout=5)
+
+    class FakeTaskTool:
+        name = "task_tool"
+
+        def invoke(self, args):
+            # Only returns if all three subagents are in flight at the same time.
+            barrier.wait()
+            return f"result for {args['todo_id']}"
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [_task_call(f"tc-{i}", str(i)) for i in range(3)]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = mock_response
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        with patch("agent.supervisor.build_task_tool", return_value=FakeTaskTool()):
+            supervisor_node = build_supervisor_node(registry, max_parallel_tasks=3)
+            state = make_state(
+                todo=[
+                    {"id": str(i), "description": "work", "status": "pending", "result": None}
+                    for i in range(3)
+                ],
+                subagent_logs=[{"todo_id": "old", "prompt": "", "tools": [], "result": "", "tokens_used": 2}],
+                token_usage={"total_used": 2, "per_subagent_limit": 4096},
+            )
+            result = supervisor_node(state)
+
+    tool_messages = result["messages"][1:]
+    assert [m.tool_call_id for m in tool_messages] == ["tc-0", "tc-1", "tc-2"]
+    assert [m.content for m in tool_messages] == [f"result for {i}" for i in range(3)]
+    # The node emits deltas; the AgentState reducers fold them into the state.
+    assert [log["todo_id"] for log in result["subagent_logs"]] == ["0", "1", "2"]
+    assert all(item["status"] == "done" for item in result["todo"])
+    assert result["token_usage"] == {
+        "total_used": sum(log["tokens_used"] for log in result["subagent_logs"])
+    }
+    logs = append_logs(state["subagent_logs"], result["subagent_logs"])
+    assert [log["todo_id"] for log in logs] == ["old", "0", "1", "2"]
+    usage = merge_token_usage(state["token_usage"], result["token_usage"])
+    assert usage["total_used"] == sum(log["tokens_used"] for log in logs)
+    # The incoming state must not be mutated in place.
+    assert state["todo"][0]["status"] == "pending"
+
+
+def test_update_todo_then_task_tool_in_same_turn_keeps_new_plan():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+
+    class FakeTaskTool:
+        name = "task_tool"
+
+        def invoke(self, args):
+            return "done"
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [
+        {
+            "name": "update_todo",
+            "id": "tc-plan",
+            "args": {"items": [
+                {"id": "a", "description": "A", "status": "pending", "result": None},
+                {"id": "b", "description": "B", "status": "pending", "result": None},
+            ]},
+        },
+        _task_call("tc-a", "a"),
+    ]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = mock_response
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        with patch("agent.supervisor.build_task_tool", return_value=FakeTaskTool()):
+            supervisor_node = build_supervisor_node(registry, max_parallel_tasks=1)
+            result = supervisor_node(make_state())
+
+    assert [(item["id"], item["status"]) for item in result["todo"]] == [
+        ("a", "done"),
+        ("b", "pending"),
+    ]
+
+
+async def test_async_supervisor_node_gathers_task_calls():
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+    in_flight = {"now": 0, "peak": 0}
+
+    class FakeTaskTool:
+        name = "task_tool"
+
+        async def ainvoke(self, args):
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return f"result for {args['todo_id']}"
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [_task_call(f"tc-{i}", str(i)) for i in range(4)]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        with patch("agent.supervisor.build_task_tool", return_value=FakeTaskTool()):
+            supervisor_node = build_async_supervisor_node(registry, max_parallel_tasks=2)
+            result = await supervisor_node(make_state(todo=[
+                {"id": str(i), "description": "work", "status": "pending", "result": None}
+                for i in range(4)
+            ]))
+
+    mock_llm.invoke.assert_not_called()
+    assert in_flight["peak"] == 2
+    assert [m.tool_call_id for m in result["messages"][1:]] == [f"tc-{i}" for i in range(4)]
+    assert len(result["subagent_logs"]) == 4
+
+
+def test_supervisor_emits_only_changed_artifacts():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+    fs.write("big-report.md", "x" * 10_000)
+    registry.artifact_changes()  # already synced in an earlier step
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [
+        {"name": "write_file", "id": "tc-w", "args": {"path": "notes.txt", "content": "hi"}},
+    ]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = mock_response
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        supervisor_node = build_supervisor_node(registry)
+        result = supervisor_node(make_state(artifacts={"big-report.md": "x" * 10_000}))
+
+    assert result["artifacts"] == {"notes.txt": "hi"}
+
+
+def test_update_todo_emits_removals_for_dropped_items():
+    fs = VirtualFS()
+    registry = ToolRegistry(fs)
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [{
+        "name": "update_todo",
+        "id": "tc-replan",
+        "args": {"items": [
+            {"id": "b", "description": "B", "status": "in_progress", "result": None},
+            {"id": "c", "description": "C", "status": "pending", "result": None},
+        ]},
+    }]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = mock_response
+
+    current = [
+        {"id": "a", "description": "A", "status": "pending", "result": None},
+        {"id": "b", "description": "B", "status": "pending", "result": None},
+    ]
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        supervisor_node = build_supervisor_node(registry)
+        result = supervisor_node(make_state(todo=current))
+
+    merged = upsert_todo(current, result["todo"])
+    assert [(item["id"], item["status"]) for item in merged] == [
+        ("b", "in_progress"),
+        ("c", "pending"),
+    ]
+
+
+def test_replan_without_depends_on_makes_item_ready():
+    from agent.scheduler import ready_items
+
+    mock_llm = MagicMock()
+    mock_response = MagicMock()
+    mock_response.tool_calls = [{
+        "name": "update_todo",
+        "id": "tc-replan",
+        "args": {"items": [{"id": "b", "description": "B", "status": "pending", "result": None}]},
+    }]
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = mock_response
+
+    current = [{
+        "id": "b", "description": "B", "status": "pending", "result": None,
+        "depends_on": ["ghost"], "tools": ["read_file"], "context": "stale",
+    }]
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        supervisor_node = build_supervisor_node(ToolRegistry(VirtualFS()))
+        result = supervisor_node(make_state(todo=current))
+
+    merged = upsert_todo(current, result["todo"])
+    assert merged == [{"id": "b", "description": "B", "status": "pending", "result": None}]
+    assert [item["id"] for item in ready_items(merged)] == ["b"]
+
+
+def _history_turn(i: int):
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    return [
+        AIMessage(content="", tool_calls=[{
+            "name": "update_todo", "id": f"u{i}", "type": "tool_call", "args": {"items": []},
+        }]),
+        ToolMessage(content=f"step {i}", tool_call_id=f"u{i}"),
+    ]
+
+
+def test_supervisor_cache_control_layout_and_usage(monkeypatch):
+    from langchain_core.messages import AIMessage
+
+    monkeypatch.setenv("PROMPT_CACHE_CONTROL", "1")
+    response = AIMessage(
+        content="Done.",
+        usage_metadata={
+            "input_tokens": 1000, "output_tokens": 10, "total_tokens": 1010,
+            "input_token_details": {"cache_read": 800},
+        },
+    )
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = response
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        supervisor_node = build_supervisor_node(registry=ToolRegistry(VirtualFS()))
+        result = supervisor_node(make_state(
+            todo=[{"id": "1", "description": "x", "status": "pending", "result": None}],
+            messages=[m for i in range(2) for m in _history_turn(i)],
+        ))
+
+    prompt = mock_llm.invoke.call_args.args[0]
+    role, system = prompt[0]
+    assert role == "system" and system[0]["cache_control"] == {"type": "ephemeral"}
+    # The breakpoint closes the stable prefix; the TODO block follows it.
+    assert prompt[-2].content[0]["cache_control"] == {"type": "ephemeral"}
+    assert prompt[-1][1].startswith("Current TODO list:")
+    assert result["token_usage"] == {"cached_input_tokens": 800, "uncached_input_tokens": 200}
+    usage = merge_token_usage(make_state()["token_usage"], result["token_usage"])
+    assert usage["cached_input_tokens"] == 800 and usage["total_used"] == 0
+
+
+def test_prompt_cache_recorder_reads_usage_from_callbacks():
+    from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+    from langchain_core.messages import AIMessage
+    from agent.prompt_cache import PromptCacheRecorder
+
+    recorder = PromptCacheRecorder()
+    usage = {
+        "input_tokens": 500, "output_tokens": 5, "total_tokens": 505,
+        "input_token_details": {"cache_read": 400, "cache_creation": 50},
+    }
+    llm = FakeMessagesListChatModel(
+        responses=[AIMessage(content="a", usage_metadata=usage)] * 2,
+        callbacks=[recorder],
+        tags=["supervisor"],
+    )
+    llm.invoke("hi")
+    llm.invoke("hi again")
+
+    totals = recorder.totals()
+    assert totals["calls"] == 2
+    assert totals["cached_input_tokens"] == 800
+    assert totals["uncached_input_tokens"] == 200
+    assert totals["cache_creation_tokens"] == 100
+    assert totals["cache_hit_rate"] == 0.8
+    assert recorder.snapshot()[0]["tags"] == ("supervisor",)
+
+
+def test_supervisor_records_step_and_tool_timings():
+    from langchain_core.messages import AIMessage
+    from evaluation.metrics import MetricCollector
+
+    metrics = MetricCollector()
+    registry = ToolRegistry(VirtualFS(), metrics=metrics)
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = AIMessage(content="", tool_calls=[{
+        "name": "write_file", "id": "w1", "type": "tool_call",
+        "args": {"path": "a.md", "content": "x"},
+    }])
+
+    with patch("agent.supervisor.ChatOpenAI", return_value=mock_llm):
+        build_supervisor_node(registry)(make_state())
+
+    histograms = metrics.to_dict()["histograms"]
+    assert histograms["supervisor_step_seconds"]["count"] == 1
+    assert histograms['tool_seconds{tool="write_file"}']["count"] == 1
@@ -10,3 +10,18 @@ def test_logger_factory_returns_named_logger():
 def test_error_hierarchy():
     assert issubclass(ConfigurationError, AgentError)
     assert issubclass(ToolExecutionError, AgentError)
+
+
+def test_lru_cache_evicts_oldest_and_counts_hits():
+    from utils.cache import LRUCache
+
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get_or_create("a", lambda: 99) == 1
+    assert cache.get_or_create("d", lambda: 4) == 4
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 1)
@@ -39,3 +39,208 @@ def test_web_scrape_handles_error():
         scrape = next(t for t in tools if t.name == "web_scrape")
         result = scrape.invoke({"url": "https://bad-url.com"})
     assert "error" in result.lower()
+
+async def test_search_internet_async_uses_async_client():
+    from unittest.mock import AsyncMock
+    mock_client = MagicMock()
+    mock_client.search = AsyncMock(return_value={
+        "results": [{"title": "Python", "content": "A language", "url": "https://python.org"}]
+    })
+    with patch("tools.web_tools.AsyncTavilyClient", return_value=mock_client):
+        tools = make_web_tools()
+        search = next(t for t in tools if t.name == "search_internet")
+        result = await search.ainvoke({"query": "Python programming"})
+    assert "https://python.org" in result
+
+async def test_web_scrape_async_uses_async_app():
+    from unittest.mock import AsyncMock
+    mock_app = MagicMock()
+    mock_app.scrape_url = AsyncMock(return_value={"markdown": "# Async page"})
+    with patch("tools.web_tools.AsyncFirecrawlApp", return_value=mock_app):
+        tools = make_web_tools()
+        scrape = next(t for t in tools if t.name == "web_scrape")
+        result = await scrape.ainvoke({"url": "https://example.com"})
+    assert "Async page" in result
+
+
+class StubSearchClient:
+    def __init__(self, delay=0.0):
+        self.queries = []
+        self.delay = delay
+
+    def search(self, query, max_results=5):
+        import time
+        self.queries.append(query)
+        time.sleep(self.delay)
+        return {"results": [{"title": query, "content": "stub", "url": "https://stub.test"}]}
+
+
+def test_search_cache_normalizes_queries_and_counts_hits():
+    from tools.result_cache import ResultCache
+    client = StubSearchClient()
+    cache = ResultCache()
+    search = make_web_tools(search_client=client, search_cache=cache)[0]
+
+    first = search.invoke({"query": "Python  Web Frameworks?"})
+    second = search.invoke({"query": "python web frameworks"})
+
+    assert first == second
+    assert client.queries == ["Python  Web Frameworks?"]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_search_cache_expires_entries_after_ttl():
+    from tools.result_cache import ResultCache
+    now = {"t": 1000.0}
+    client = StubSearchClient()
+    cache = ResultCache(ttl=60, clock=lambda: now["t"])
+    search = make_web_tools(search_client=client, search_cache=cache)[0]
+
+    search.invoke({"query": "q"})
+    now["t"] += 59
+    search.invoke({"query": "q"})
+    now["t"] += 2
+    search.invoke({"query": "q"})
+
+    assert len(client.queries) == 2
+
+
+def test_search_errors_are_not_cached():
+    from tools.result_cache import ResultCache
+    client = MagicMock()
+    client.search.side_effect = [Exception("boom"), {"results": []}]
+    search = make_web_tools(search_client=client, search_cache=ResultCache())[0]
+
+    assert "error" in search.invoke({"query": "q"}).lower()
+    assert "error" not in search.invoke({"query": "q"}).lower()
+
+
+def test_search_cache_coalesces_concurrent_identical_queries():
+    from concurrent.futures import ThreadPoolExecutor
+    from tools.result_cache import ResultCache
+    client = StubSearchClient(delay=0.2)
+    cache = ResultCache()
+    search = make_web_tools(search_client=client, search_cache=cache)[0]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: search.invoke({"query": "same"}), range(4)))
+
+    assert len(set(results)) == 1
+    assert len(client.queries) == 1
+    assert cache.stats.coalesced == 3
+
+
+async def test_async_search_cache_coalesces_concurrent_identical_queries():
+    import asyncio
+    from tools.result_cache import ResultCache
+
+    class AsyncStub:
+        calls = 0
+
+        async def search(self, query, max_results=5):
+            AsyncStub.calls += 1
+            await asyncio.sleep(0.05)
+            return {"results": [{"title": "t", "content": "c", "url": "https://stub.test"}]}
+
+    search = make_web_tools(async_search_client=AsyncStub(), search_cache=ResultCache())[0]
+    results = await asyncio.gather(*(search.ainvoke({"query": "same"}) for _ in range(5)))
+
+    assert len(set(results)) == 1
+    assert AsyncStub.calls == 1
+
+
+def test_search_cache_disk_tier_survives_restart(tmp_path):
+    from tools.result_cache import ResultCache
+    path = str(tmp_path / "search.sqlite")
+    client = StubSearchClient()
+
+    make_web_tools(search_client=client, search_cache=ResultCache(disk_path=path))[0].invoke({"query": "persist"})
+    restarted = ResultCache(disk_path=path)
+    make_web_tools(search_client=client, search_cache=restarted)[0].invoke({"query": "persist"})
+
+    assert len(client.queries) == 1
+    assert restarted.stats.disk_hits == 1
+
+
+class StubScrapeClient:
+    def __init__(self, pages, delays=None):
+        import threading
+        self.pages = pages
+        self.delays = delays or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def scrape_url(self, url, params=None):
+        import time
+        with self._lock:
+            self.calls.append(url)
+        time.sleep(self.delays.get(url, 0))
+        if url not in self.pages:
+            raise Exception(f"404 for {url}")
+        return {"markdown": self.pages[url]}
+
+
+def test_normalize_url_folds_equivalent_forms():
+    from tools.scrape_cache import normalize_url
+    assert normalize_url("HTTPS://Example.com:443/a?b=2&a=1&utm_source=x#top") == (
+        "https://example.com/a?a=1&b=2"
+    )
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/") == "http://example.com:8080/"
+
+
+def test_scrape_cache_reuses_pages_and_shares_identical_content():
+    from tools.scrape_cache import ScrapeCache
+    client = StubScrapeClient({
+        "https://a.test/": "# Same page",
+        "https://mirror.test/": "# Same page",
+    })
+    cache = ScrapeCache()
+    scrape = make_web_tools(scrape_client=client, scrape_cache=cache)[1]
+
+    assert scrape.invoke({"url": "https://a.test/"}) == "# Same page"
+    assert scrape.invoke({"url": "https://A.test/#section"}) == "# Same page"
+    assert scrape.invoke({"url": "https://mirror.test/"}) == "# Same page"
+
+    assert client.calls == ["https://a.test/", "https://mirror.test/"]
+    assert len(cache.blobs._memory) == 1
+
+
+def test_web_scrape_many_runs_concurrently_in_input_order():
+    import time
+    urls = [f"https://site{i}.test/" for i in range(6)]
+    client = StubScrapeClient(
+        {url: f"page {i}" for i, url in enumerate(urls)},
+        delays={url: 0.2 for url in urls},
+    )
+    tools = make_web_tools(scrape_client=client, max_concurrent_scrapes=6)
+    scrape_many = next(t for t in tools if t.name == "web_scrape_many")
+
+    start = time.perf_counter()
+    result = scrape_many.invoke({"urls": urls + ["https://missing.test/"]})
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6
+    positions = [result.index(f"## {url}\npage {i}") for i, url in enumerate(urls)]
+    assert positions == sorted(positions)
+    assert result.rstrip().endswith("Scrape error: 404 for https://missing.test/")
+
+
+async def test_web_scrape_many_async_dedupes_and_keeps_order():
+    import asyncio
+
+    class AsyncStub:
+        calls = []
+
+        async def scrape_url(self, url, params=None):
+            AsyncStub.calls.append(url)
+            await asyncio.sleep(0.05)
+            return {"markdown": f"md:{url}"}
+
+    tools = make_web_tools(async_scrape_client=AsyncStub())
+    scrape_many = next(t for t in tools if t.name == "web_scrape_many")
+    result = await scrape_many.ainvoke({"urls": ["https://b.test/", "https://a.test/", "https://B.test/"]})
+
+    assert result.split("\n\n")[0] == "## https://b.test/\nmd:https://b.test/"
+    assert result.split("\n\n")[1].startswith("## https://a.test/")
+    assert len(AsyncStub.calls) == 2